@@ -15,7 +15,7 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
-        op.create_table(
+    op.create_table(
         'tasks',
         sa.Column('id', sa.Integer(), primary_key=True, nullable=False, autoincrement=True),
         sa.Column('task_id', sa.String(length=50), nullable=False, unique=True),
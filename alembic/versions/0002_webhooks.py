@@ -0,0 +1,41 @@
+"""
+Add task callback URLs and the webhook delivery queue.
+
+Revision ID: 0002_webhooks
+Revises: 0001_initial
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_webhooks'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('tasks', sa.Column('callback_url', sa.String(length=2048), nullable=True))
+    op.create_table(
+        'webhook_deliveries',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False, autoincrement=True),
+        sa.Column('task_id', sa.String(length=50), nullable=False),
+        sa.Column('url', sa.String(length=2048), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='PENDING'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('delivered_at', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.create_index(op.f('ix_webhook_deliveries_task_id'), 'webhook_deliveries', ['task_id'], unique=False)
+    op.create_index(op.f('ix_webhook_deliveries_status'), 'webhook_deliveries', ['status'], unique=False)
+    op.create_index(op.f('ix_webhook_deliveries_next_attempt_at'), 'webhook_deliveries', ['next_attempt_at'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_webhook_deliveries_next_attempt_at'), table_name='webhook_deliveries')
+    op.drop_index(op.f('ix_webhook_deliveries_status'), table_name='webhook_deliveries')
+    op.drop_index(op.f('ix_webhook_deliveries_task_id'), table_name='webhook_deliveries')
+    op.drop_table('webhook_deliveries')
+    op.drop_column('tasks', 'callback_url')
@@ -0,0 +1,23 @@
+"""
+Record the owning Suno account on each task.
+
+Revision ID: 0003_task_account
+Revises: 0002_webhooks
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_task_account'
+down_revision = '0002_webhooks'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('tasks', sa.Column('account', sa.String(length=100), nullable=True))
+    op.create_index(op.f('ix_tasks_account'), 'tasks', ['account'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_tasks_account'), table_name='tasks')
+    op.drop_column('tasks', 'account')
@@ -0,0 +1,35 @@
+"""
+Add client API keys with per-key limits.
+
+Revision ID: 0004_api_keys
+Revises: 0003_task_account
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_api_keys'
+down_revision = '0003_task_account'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'api_keys',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False, autoincrement=True),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('key_hash', sa.String(length=64), nullable=False),
+        sa.Column('rate_per_minute', sa.Float(), nullable=False, server_default='60'),
+        sa.Column('burst', sa.Integer(), nullable=False, server_default='10'),
+        sa.Column('max_concurrent', sa.Integer(), nullable=False, server_default='5'),
+        sa.Column('enabled', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.create_index(op.f('ix_api_keys_name'), 'api_keys', ['name'], unique=True)
+    op.create_index(op.f('ix_api_keys_key_hash'), 'api_keys', ['key_hash'], unique=True)
+
+def downgrade():
+    op.drop_index(op.f('ix_api_keys_key_hash'), table_name='api_keys')
+    op.drop_index(op.f('ix_api_keys_name'), table_name='api_keys')
+    op.drop_table('api_keys')
@@ -0,0 +1,24 @@
+"""
+Add composite indexes for keyset-paginated task listing.
+
+Revision ID: 0005_task_list_indexes
+Revises: 0004_api_keys
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0005_task_list_indexes'
+down_revision = '0004_api_keys'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_tasks_submit_time_id', 'tasks', ['submit_time', 'id'])
+    op.create_index(
+        'ix_tasks_action_status_submit_time_id', 'tasks', ['action', 'status', 'submit_time', 'id'],
+    )
+
+def downgrade():
+    op.drop_index('ix_tasks_action_status_submit_time_id', table_name='tasks')
+    op.drop_index('ix_tasks_submit_time_id', table_name='tasks')
@@ -0,0 +1,39 @@
+"""
+Add locally stored clip media.
+
+Revision ID: 0006_media_assets
+Revises: 0005_task_list_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_media_assets'
+down_revision = '0005_task_list_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'media_assets',
+        sa.Column('id', sa.Integer(), primary_key=True, nullable=False, autoincrement=True),
+        sa.Column('clip_id', sa.String(length=64), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('source_url', sa.String(length=2048), nullable=True),
+        sa.Column('created_at', sa.BigInteger(), nullable=True, server_default='0'),
+        sa.Column('last_access', sa.BigInteger(), nullable=True, server_default='0'),
+        sa.UniqueConstraint('clip_id', 'kind', name='uq_media_assets_clip_kind'),
+    )
+    op.create_index(op.f('ix_media_assets_clip_id'), 'media_assets', ['clip_id'], unique=False)
+    op.create_index(op.f('ix_media_assets_sha256'), 'media_assets', ['sha256'], unique=False)
+    op.create_index(op.f('ix_media_assets_last_access'), 'media_assets', ['last_access'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_media_assets_last_access'), table_name='media_assets')
+    op.drop_index(op.f('ix_media_assets_sha256'), table_name='media_assets')
+    op.drop_index(op.f('ix_media_assets_clip_id'), table_name='media_assets')
+    op.drop_table('media_assets')
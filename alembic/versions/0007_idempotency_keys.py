@@ -0,0 +1,30 @@
+"""
+Add submit idempotency keys.
+
+Revision ID: 0007_idempotency_keys
+Revises: 0006_media_assets
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_idempotency_keys'
+down_revision = '0006_media_assets'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key', sa.String(length=64), primary_key=True, nullable=False),
+        sa.Column('request_hash', sa.String(length=64), nullable=False),
+        sa.Column('task_id', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.BigInteger(), nullable=True, server_default='0'),
+        sa.Column('expires_at', sa.BigInteger(), nullable=True, server_default='0'),
+    )
+    op.create_index(op.f('ix_idempotency_keys_expires_at'), 'idempotency_keys', ['expires_at'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_idempotency_keys_expires_at'), table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,30 @@
+"""
+Add cached chat tool-call extractions.
+
+Revision ID: 0008_tool_calls
+Revises: 0007_idempotency_keys
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_tool_calls'
+down_revision = '0007_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'tool_calls',
+        sa.Column('key', sa.String(length=64), primary_key=True, nullable=False),
+        sa.Column('params', sa.JSON(), nullable=False),
+        sa.Column('latency_ms', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('created_at', sa.BigInteger(), nullable=True, server_default='0'),
+        sa.Column('expires_at', sa.BigInteger(), nullable=True, server_default='0'),
+    )
+    op.create_index(op.f('ix_tool_calls_expires_at'), 'tool_calls', ['expires_at'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_tool_calls_expires_at'), table_name='tool_calls')
+    op.drop_table('tool_calls')
@@ -0,0 +1,23 @@
+"""
+Flag finished tasks whose data has been compacted.
+
+Revision ID: 0009_task_compacted
+Revises: 0008_tool_calls
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009_task_compacted'
+down_revision = '0008_tool_calls'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('tasks', sa.Column('compacted', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index('ix_tasks_compacted_finish_time_id', 'tasks', ['compacted', 'finish_time', 'id'])
+
+def downgrade():
+    op.drop_index('ix_tasks_compacted_finish_time_id', table_name='tasks')
+    op.drop_column('tasks', 'compacted')
@@ -10,14 +10,57 @@ class Settings:
     port: int = int(os.getenv("PORT", "8000"))
     debug: bool = os.getenv("DEBUG", "false").lower() == "true"
     pprof_enabled: bool = os.getenv("PPROF", "false").lower() == "true"
+    # Upper bound for /debug/pprof sampling and heap windows (seconds)
+    pprof_max_seconds: float = float(os.getenv("PPROF_MAX_SECONDS", "60"))
     secret_token: str = os.getenv("SECRET_TOKEN", "")
+    # Seconds between reloads of the cached api_keys table
+    api_key_refresh_interval: float = float(os.getenv("API_KEY_REFRESH_INTERVAL", "60"))
 
     # Suno account
     session_id: str = os.getenv("SESSION_ID", "")
     cookie: str = os.getenv("COOKIE", "")
 
+    # Optional pool: JSON list of {"session_id", "cookie", "name"} objects
+    suno_accounts: str = os.getenv("SUNO_ACCOUNTS", "")
+    # Accounts below this many credits are taken out of rotation
+    account_min_credits: int = int(os.getenv("ACCOUNT_MIN_CREDITS", "10"))
+    # Consecutive token refresh failures before an account is benched, and for how long
+    account_max_auth_failures: int = int(os.getenv("ACCOUNT_MAX_AUTH_FAILURES", "3"))
+    account_cooldown: float = float(os.getenv("ACCOUNT_COOLDOWN", "300"))
+    # Refresh the Suno JWT this many seconds before it expires
+    jwt_refresh_margin: float = float(os.getenv("JWT_REFRESH_MARGIN", "10"))
+    # Lifetime assumed for JWTs without a readable exp claim
+    token_refresh_fallback: float = float(os.getenv("TOKEN_REFRESH_FALLBACK", "50"))
+    # Delay before retrying a failed keep-alive refresh
+    token_retry_interval: float = float(os.getenv("TOKEN_RETRY_INTERVAL", "5"))
+    # Seconds between billing/credit info refreshes
+    credits_refresh_interval: float = float(os.getenv("CREDITS_REFRESH_INTERVAL", "300"))
+
     # Database
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./api.db")
+    # Request-path URL; derived from DATABASE_URL (aiosqlite/asyncpg) when empty
+    async_database_url: str = os.getenv("ASYNC_DATABASE_URL", "")
+    # Connections for API requests and for the background workers (separate pools)
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_worker_pool_size: int = int(os.getenv("DB_WORKER_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    # Seconds to wait for a free connection / recycle connections older than this
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # Milliseconds SQLite waits on a locked database before raising
+    sqlite_busy_timeout: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
+    # Maintenance (retention, compaction, vacuum)
+    # Finished tasks older than this are removed; 0 keeps them forever
+    task_retention_days: float = float(os.getenv("TASK_RETENTION_DAYS", "30"))
+    # When set, removed tasks are appended to gzipped JSONL files in this directory first
+    task_archive_dir: str = os.getenv("TASK_ARCHIVE_DIR", "")
+    # Seconds after finishing before a task's data is trimmed to the served fields
+    task_compact_after: float = float(os.getenv("TASK_COMPACT_AFTER", "3600"))
+    maintenance_interval: float = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+    maintenance_batch_size: int = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+    # Local hour for the daily VACUUM/ANALYZE; -1 disables it
+    maintenance_vacuum_hour: int = int(os.getenv("MAINTENANCE_VACUUM_HOUR", "4"))
 
     # External API
     base_url: str = os.getenv("BASE_URL", "https://studio-api.suno.ai")
@@ -31,13 +74,100 @@ class Settings:
     chat_openai_base: str = os.getenv("CHAT_OPENAI_BASE", "https://api.openai.com")
     chat_openai_key: str = os.getenv("CHAT_OPENAI_KEY", "")
     chat_template_dir: str = os.getenv("CHAT_TEMPLATE_DIR", "./template")
-    # Timeout for blocking chat/lyrics generation in submit_lyrics
+    # Compiled template bytecode directory (empty = in memory); changed files are reloaded this often (0 = never)
+    chat_template_cache_dir: str = os.getenv("CHAT_TEMPLATE_CACHE_DIR", "")
+    chat_template_reload_interval: float = float(os.getenv("CHAT_TEMPLATE_RELOAD_INTERVAL", "5"))
+    # Shared OpenAI client: per-call timeout (seconds), retries and connection pool
+    chat_openai_timeout: float = float(os.getenv("CHAT_OPENAI_TIMEOUT", "120"))
+    chat_openai_max_retries: int = int(os.getenv("CHAT_OPENAI_MAX_RETRIES", "2"))
+    chat_openai_max_connections: int = int(os.getenv("CHAT_OPENAI_MAX_CONNECTIONS", "100"))
+    chat_openai_max_keepalive: int = int(os.getenv("CHAT_OPENAI_MAX_KEEPALIVE", "20"))
+    # Tool-call extraction cache (0 TTL disables it); TOOL_CACHE_DB also keeps entries in the database
+    tool_cache_size: int = int(os.getenv("TOOL_CACHE_SIZE", "1000"))
+    tool_cache_ttl: float = float(os.getenv("TOOL_CACHE_TTL", "3600"))
+    tool_cache_db: bool = os.getenv("TOOL_CACHE_DB", "false").lower() == "true"
+    tool_cache_stats_interval: float = float(os.getenv("TOOL_CACHE_STATS_INTERVAL", "300"))
+    # Timeout for chat streams and lyrics submissions with wait=true
     chat_timeout: int = int(os.getenv("CHAT_TIME_OUT", "600"))
     # Timeout for polling Suno tasks in background loops (seconds)
     poll_timeout: int = int(os.getenv("POLL_TIMEOUT", "600"))
+    # Interval queued tasks reach at POLL_BACKOFF_AGE (seconds); waiting tasks reach twice this
+    poll_interval: float = float(os.getenv("POLL_INTERVAL", "5"))
+    # Interval for streaming clips; also the poller tick granularity
+    poll_min_interval: float = float(os.getenv("POLL_MIN_INTERVAL", "1"))
+    # Upper bound for backed-off intervals
+    poll_max_interval: float = float(os.getenv("POLL_MAX_INTERVAL", "30"))
+    # Task age (seconds) at which non-streaming intervals have ramped up from POLL_MIN_INTERVAL to POLL_INTERVAL
+    poll_backoff_age: float = float(os.getenv("POLL_BACKOFF_AGE", "120"))
+    # Random +/- fraction applied to every interval
+    poll_jitter: float = float(os.getenv("POLL_JITTER", "0.2"))
+    # How often per-status interval stats are logged (seconds)
+    poll_stats_interval: float = float(os.getenv("POLL_STATS_INTERVAL", "300"))
+    # Max clip ids per upstream feed request
+    poll_batch_size: int = int(os.getenv("POLL_BATCH_SIZE", "50"))
+    # How often the clip poller flushes buffered in-progress changes (terminal states flush at once)
+    poll_write_interval: float = float(os.getenv("POLL_WRITE_INTERVAL", "2"))
+
+    # Task queue & worker pool
+    task_queue_size: int = int(os.getenv("TASK_QUEUE_SIZE", "100"))
+    task_workers: int = int(os.getenv("TASK_WORKERS", "4"))
+    # Max tasks of each action being processed at once
+    task_concurrency_music: int = int(os.getenv("TASK_CONCURRENCY_MUSIC", "200"))
+    task_concurrency_lyrics: int = int(os.getenv("TASK_CONCURRENCY_LYRICS", "4"))
+    # Minimum Retry-After (seconds) returned when the queue is full
+    queue_retry_after: int = int(os.getenv("QUEUE_RETRY_AFTER", "5"))
+
+    # Max seconds an idle task stream waits for an event before re-reading the task
+    stream_recheck_interval: float = float(os.getenv("STREAM_RECHECK_INTERVAL", "30"))
+    # Concurrent task streams / waiting chats per API key (0 = unlimited)
+    stream_max_per_key: int = int(os.getenv("STREAM_MAX_PER_KEY", "10"))
+
+    # Task lookup cache
+    task_cache_size: int = int(os.getenv("TASK_CACHE_SIZE", "10000"))
+    # TTL (seconds) for in-flight and terminal tasks
+    task_cache_ttl: float = float(os.getenv("TASK_CACHE_TTL", "5"))
+    task_cache_terminal_ttl: float = float(os.getenv("TASK_CACHE_TERMINAL_TTL", "3600"))
+
+    # Webhooks (task completion callbacks)
+    # Signs deliveries with HMAC-SHA256 when set
+    webhook_secret: str = os.getenv("WEBHOOK_SECRET", "")
+    webhook_concurrency: int = int(os.getenv("WEBHOOK_CONCURRENCY", "10"))
+    webhook_max_attempts: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    # Retry delay is base * 2^(attempt-1) seconds, capped at max
+    webhook_backoff_base: float = float(os.getenv("WEBHOOK_BACKOFF_BASE", "5"))
+    webhook_backoff_max: float = float(os.getenv("WEBHOOK_BACKOFF_MAX", "3600"))
+    webhook_timeout: float = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+    # Seconds between scans for due deliveries
+    webhook_poll_interval: float = float(os.getenv("WEBHOOK_POLL_INTERVAL", "5"))
+
+    # Submit deduplication
+    # How long an Idempotency-Key maps to its task (seconds)
+    idempotency_ttl: float = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+    # Identical song bodies without a key are merged for this long (0 = only dedupe keyed submits)
+    idempotency_hash_ttl: float = float(os.getenv("IDEMPOTENCY_HASH_TTL", "60"))
+    idempotency_cache_size: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+
+    # Local media store (downloads finished clips' audio/video/images)
+    media_enabled: bool = os.getenv("MEDIA_ENABLED", "false").lower() == "true"
+    media_dir: str = os.getenv("MEDIA_DIR", "./media")
+    # Comma-separated subset of audio,video,image
+    media_kinds: str = os.getenv("MEDIA_KINDS", "audio,video,image")
+    # Disk cap; least recently served files are evicted beyond it
+    media_max_bytes: int = int(os.getenv("MEDIA_MAX_BYTES", str(10 * 1024 ** 3)))
+    media_max_file_bytes: int = int(os.getenv("MEDIA_MAX_FILE_BYTES", str(500 * 1024 ** 2)))
+    media_concurrency: int = int(os.getenv("MEDIA_CONCURRENCY", "4"))
+    media_max_attempts: int = int(os.getenv("MEDIA_MAX_ATTEMPTS", "3"))
+    media_timeout: float = float(os.getenv("MEDIA_TIMEOUT", "120"))
+    # Prefix for rewritten URLs, e.g. https://api.example.com (empty = relative)
+    media_base_url: str = os.getenv("MEDIA_BASE_URL", "")
 
     # Networking & Logging
     proxy: str = os.getenv("PROXY", "") or None
+    # Upstream connection pool (shared by sync and async clients)
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    http_max_keepalive: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+    http_keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    http_connect_timeout: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
     log_dir: str = os.getenv("LOG_DIR", "./logs")
     rotate_logs: bool = os.getenv("ROTATE_LOGS", "false").lower() == "true"
 
@@ -1,19 +1,121 @@
 """
 Database initialization and session management using SQLAlchemy.
+
+Two engines share the same database:
+- `async_engine` / `AsyncSessionLocal` serve the request path without
+  blocking the event loop (aiosqlite for SQLite, asyncpg for PostgreSQL).
+- `engine` / `SessionLocal` back the background threads (poller, task
+  workers, webhooks), so their writes never take connections from API reads.
 """
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.utils.metrics import DB_QUERY_LATENCY
+
+# Async drivers used when DATABASE_URL names a sync one
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Derive the async driver URL from DATABASE_URL unless ASYNC_DATABASE_URL is set.
+    """
+    if settings.async_database_url:
+        return settings.async_database_url
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend in ASYNC_DRIVERS and parsed.drivername != ASYNC_DRIVERS[backend]:
+        parsed = parsed.set(drivername=ASYNC_DRIVERS[backend])
+    return parsed.render_as_string(hide_password=False)
+
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _pool_args(url: str, pool_size: int) -> dict:
+    """
+    Pool sizing for the engine; in-memory SQLite keeps SQLAlchemy's default pool.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": not _is_sqlite(url),
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    WAL lets API reads proceed while the poller writes; NORMAL sync is safe
+    under WAL, and busy_timeout waits for a lock instead of failing at once.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+    cursor.close()
+
+
+_STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA"}
+
+
+def _instrument(target, label: str) -> None:
+    """
+    Record statement latency for an engine in the suno_db_query_seconds histogram.
+    """
+    def before(conn, cursor, statement, parameters, context, executemany):
+        # Statements on one connection run one at a time
+        conn.info["query_started"] = time.perf_counter()
 
-# Create SQLAlchemy engine
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_started", None)
+        if started is None:
+            return
+        verb = statement.lstrip()[:8].split(None, 1)[0].upper() if statement.strip() else ""
+        DB_QUERY_LATENCY.observe(time.perf_counter() - started, label, verb if verb in _STATEMENT_TYPES else "OTHER")
+
+    event.listen(target, "before_cursor_execute", before)
+    event.listen(target, "after_cursor_execute", after)
+
+
+# Create SQLAlchemy engine for background workers
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
+    connect_args={"check_same_thread": False} if _is_sqlite(settings.database_url) else {},
+    **_pool_args(settings.database_url, settings.db_worker_pool_size),
 )
 
+# Async engine for the request path
+async_engine = create_async_engine(
+    async_database_url(settings.database_url),
+    **_pool_args(settings.database_url, settings.db_pool_size),
+)
+
+_instrument(engine, "worker")
+_instrument(async_engine.sync_engine, "api")
+
+if _is_sqlite(settings.database_url):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
 # Create a configured "Session" class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Rows stay readable after commit so request handlers can serialize them
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for declarative class definitions
 Base = declarative_base()
@@ -23,11 +125,12 @@ def init_db():
     Initialize database tables.
     """
     # Import models so they are registered on the metadata
-    from app.models import task  # noqa: F401
+    from app.models import task, webhook, api_key, media, idempotency, tool_call  # noqa: F401
     Base.metadata.create_all(bind=engine)
 
-def close_db():
+async def close_db():
     """
-    Close database connection/dispose engine.
+    Close database connections/dispose both engines.
     """
-    engine.dispose()
\ No newline at end of file
+    await async_engine.dispose()
+    engine.dispose()
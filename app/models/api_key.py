@@ -0,0 +1,26 @@
+"""
+SQLAlchemy model for client API keys and their limits.
+"""
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Boolean
+from app.database import Base
+
+class ApiKey(Base):
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, index=True, nullable=False)
+    # SHA-256 hex digest of the bearer token; the token itself is never stored
+    key_hash = Column(String(64), unique=True, index=True, nullable=False)
+    # Sustained requests per minute and burst size for the token bucket (0 = unlimited)
+    rate_per_minute = Column(Float, nullable=False, default=60)
+    burst = Column(Integer, nullable=False, default=10)
+    # Max tasks in flight at once (0 = unlimited)
+    max_concurrent = Column(Integer, nullable=False, default=5)
+    enabled = Column(Boolean, nullable=False, default=True)
+    created_at = Column(BigInteger, default=0)
+
+    def to_dict(self):
+        """
+        Serialize the ApiKey model to a dict of column names to values.
+        """
+        return {col.name: getattr(self, col.name) for col in self.__table__.columns}
@@ -0,0 +1,22 @@
+"""
+SQLAlchemy model for submit idempotency keys (key -> task id).
+"""
+from sqlalchemy import Column, BigInteger, String
+from app.database import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of caller, action and Idempotency-Key header (or request hash)
+    key = Column(String(64), primary_key=True)
+    # sha256 of the normalized request body, to reject key reuse with another body
+    request_hash = Column(String(64), nullable=False)
+    task_id = Column(String(255), nullable=False)
+    created_at = Column(BigInteger, default=0)
+    expires_at = Column(BigInteger, index=True, default=0)
+
+    def to_dict(self):
+        """
+        Serialize the IdempotencyKey model to a dict of column names to values.
+        """
+        return {col.name: getattr(self, col.name) for col in self.__table__.columns}
@@ -0,0 +1,28 @@
+"""
+SQLAlchemy model for locally stored clip media (audio, video, cover image).
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, UniqueConstraint
+from app.database import Base
+
+class MediaAsset(Base):
+    __tablename__ = "media_assets"
+    __table_args__ = (UniqueConstraint("clip_id", "kind", name="uq_media_assets_clip_kind"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    clip_id = Column(String(64), index=True, nullable=False)
+    # audio | video | image
+    kind = Column(String(10), nullable=False)
+    # Content hash; the file lives at <MEDIA_DIR>/<sha256[:2]>/<sha256> and may back several clips
+    sha256 = Column(String(64), index=True, nullable=False)
+    size = Column(BigInteger, nullable=False, default=0)
+    content_type = Column(String(100), nullable=True)
+    source_url = Column(String(2048), nullable=True)
+    created_at = Column(BigInteger, default=0)
+    # LRU eviction order
+    last_access = Column(BigInteger, index=True, default=0)
+
+    def to_dict(self):
+        """
+        Serialize the MediaAsset model to a dict of column names to values.
+        """
+        return {col.name: getattr(self, col.name) for col in self.__table__.columns}
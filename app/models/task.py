@@ -1,11 +1,21 @@
 """
 SQLAlchemy model for Task entity.
 """
-from sqlalchemy import Column, Integer, BigInteger, String, JSON
+from sqlalchemy import Column, Index, Integer, BigInteger, Boolean, String, JSON, false
 from app.database import Base
 
+# Statuses after which a task is no longer polled
+TERMINAL_STATUSES = ("SUCCESS", "FAILURE", "UNKNOWN")
+
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Keyset pagination for GET /suno/tasks, newest first, with and without filters
+        Index("ix_tasks_submit_time_id", "submit_time", "id"),
+        Index("ix_tasks_action_status_submit_time_id", "action", "status", "submit_time", "id"),
+        # Compaction scans only rows it has not trimmed yet, oldest finished first
+        Index("ix_tasks_compacted_finish_time_id", "compacted", "finish_time", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_id = Column(String(50), unique=True, index=True, nullable=False)
@@ -17,6 +27,12 @@ class Task(Base):
     finish_time = Column(BigInteger, index=True, default=0)
     search_item = Column(String(100), index=True, nullable=True)
     data = Column(JSON, nullable=True)
+    # Optional URL notified when the task reaches a terminal state
+    callback_url = Column(String(2048), nullable=True)
+    # Name of the Suno account that owns the task; polling uses the same credentials
+    account = Column(String(100), index=True, nullable=True)
+    # Set once maintenance has trimmed data to the served fields
+    compacted = Column(Boolean, nullable=False, default=False, server_default=false())
     
     def to_dict(self):
         """
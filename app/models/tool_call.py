@@ -0,0 +1,22 @@
+"""
+SQLAlchemy model for cached chat tool-call extractions (conversation hash -> song params).
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, JSON
+from app.database import Base
+
+class ToolCall(Base):
+    __tablename__ = "tool_calls"
+
+    # sha256 of model, messages and function specs
+    key = Column(String(64), primary_key=True)
+    params = Column(JSON, nullable=False)
+    # Duration of the LLM round trip, reported as saved on each hit
+    latency_ms = Column(Integer, default=0)
+    created_at = Column(BigInteger, default=0)
+    expires_at = Column(BigInteger, index=True, default=0)
+
+    def to_dict(self):
+        """
+        Serialize the ToolCall model to a dict of column names to values.
+        """
+        return {col.name: getattr(self, col.name) for col in self.__table__.columns}
@@ -0,0 +1,26 @@
+"""
+SQLAlchemy model for pending/finished webhook deliveries.
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, JSON
+from app.database import Base
+
+class WebhookDelivery(Base):
+    __tablename__ = "webhook_deliveries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(String(50), index=True, nullable=False)
+    url = Column(String(2048), nullable=False)
+    payload = Column(JSON, nullable=False)
+    # PENDING -> DELIVERED | FAILED
+    status = Column(String(20), index=True, nullable=False, default="PENDING")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(BigInteger, index=True, default=0)
+    last_error = Column(String, nullable=True)
+    created_at = Column(BigInteger, default=0)
+    delivered_at = Column(BigInteger, default=0)
+
+    def to_dict(self):
+        """
+        Serialize the WebhookDelivery model to a dict of column names to values.
+        """
+        return {col.name: getattr(self, col.name) for col in self.__table__.columns}
@@ -6,23 +6,25 @@ import time
 import asyncio
 from typing import Dict, Any
 
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse
-from sse_starlette.sse import EventSourceResponse
-
-# Support both v0 and v1 OpenAI SDK
-try:
-    from openai import OpenAI
-    USE_V1_SDK = True
-except (ImportError, AttributeError):
-    import openai
-    USE_V1_SDK = False
+from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import JSONResponse, Response
+
 from app.schemas.chat import GeneralOpenAIRequest
 from app.config import settings
-from app.utils.templates import templates
+from app.utils.templates import render_chunks, templates
 from app.services.suno_service import suno_service
+from app.services.tool_cache import tool_call_cache
+from app.models.task import TERMINAL_STATUSES
+from app.utils.auth import (
+    StreamSlotResponse, TaskSlot, close_stream_slot, open_stream_slot, reserve_task_slot, verify_secret_token,
+)
+from app.utils.metrics import track_stream
+from app.utils.openai_client import USE_V1_SDK, create_chat_completion
+
+router = APIRouter(dependencies=[Depends(verify_secret_token)])
 
-router = APIRouter()
+# Seconds between disconnect checks while a non-streaming chat waits for its song
+DISCONNECT_CHECK_INTERVAL = 1.0
 
 # Define OpenAI function spec for Suno tool
 FUNCTIONS = [
@@ -50,6 +52,48 @@ FUNCTIONS = [
     }
 ]
 
+async def extract_song_params(model: str, messages: list) -> dict:
+    """
+    Turn the conversation into generate_song_custom arguments with one
+    function-calling round trip. Raises ValueError when the model's reply
+    has no usable function call.
+    """
+    resp = await create_chat_completion(
+        model=model,
+        messages=messages,
+        functions=FUNCTIONS,
+        function_call="auto" if USE_V1_SDK else "required",
+        stream=False,
+    )
+    func_call = getattr(resp.choices[0].message, 'function_call', None)
+    if not func_call:
+        raise ValueError('No function call from OpenAI')
+    try:
+        return json.loads(func_call.arguments)
+    except Exception:
+        raise ValueError('Invalid function arguments')
+
+async def until_disconnected(request: Request, coro):
+    """
+    Await coro, cancelling it as soon as the client disconnects.
+    Returns (finished, result).
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_CHECK_INTERVAL)
+            if done:
+                return True, task.result()
+            if await request.is_disconnected():
+                return False, None
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
 @router.post("/completions")
 async def chat_completions(request: Request):
     body = await request.json()
@@ -62,57 +106,31 @@ async def chat_completions(request: Request):
     is_stream = req.stream or False
     model = req.model or settings.chat_openai_model
 
-    # Configure OpenAI client
-    if USE_V1_SDK:
-        client = OpenAI(api_key=settings.chat_openai_key, base_url=settings.chat_openai_base.rstrip('/'))
-    else:
-        openai.api_key = settings.chat_openai_key
-        openai.api_base = settings.chat_openai_base.rstrip('/')
-
     # Unique chat ID
     chat_id = f"chatcmpl-{request.state.request_id}"
 
     async def event_generator():
-        # Initial tool call via OpenAI
+        # Tool call via the shared OpenAI client; cancelled if the client disconnects
         try:
-            if USE_V1_SDK:
-                resp = client.chat.completions.create(
-                    model=model,
-                    messages=[msg.dict() for msg in req.messages],
-                    functions=FUNCTIONS,
-                    function_call="auto",
-                    stream=False,
-                )
-            else:
-                resp = openai.ChatCompletion.create(
-                    model=model,
-                    messages=[msg.dict() for msg in req.messages],
-                    functions=FUNCTIONS,
-                    function_call="required",
-                    stream=False,
-                )
+            messages = [msg.dict() for msg in req.messages]
+            # Repeated conversations reuse the cached arguments and skip the LLM
+            params = await tool_call_cache.get_or_extract(
+                model, messages, FUNCTIONS, lambda: extract_song_params(model, messages)
+            )
         except Exception as e:
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
             return
 
-        choice = resp.choices[0]
-        if not hasattr(choice.message, 'function_call'):
-            yield f"data: {json.dumps({'error': 'No function call from OpenAI'})}\n\n"
-            return
-
-        func_call = choice.message.function_call
-        try:
-            params = json.loads(func_call.arguments)
-        except Exception as e:
-            yield f"data: {json.dumps({'error': 'Invalid function arguments'})}\n\n"
-            return
-
         # Add model param for Suno
         params['mv'] = model
 
-        # Submit Suno task
+        # Submit Suno task; shielded so a disconnect cannot leave a paid song unrecorded.
+        # The task keeps polling in the background if the client goes away while waiting,
+        # and holds the caller's task slot until it finishes.
+        submit = asyncio.ensure_future(suno_service.submit_song(params))
+        task_slot.track(submit)
         try:
-            task_id = suno_service.submit_song(params)
+            task_id = await asyncio.shield(submit)
         except Exception as e:
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
             return
@@ -123,57 +141,66 @@ async def chat_completions(request: Request):
             msg = submit_tmpl.render()
             yield f"data: {msg}\n\n"
 
-        # Polling loop
-        first_tick = False
-        start_time = time.time()
-        while True:
-            # Timeout
-            if time.time() - start_time > settings.chat_timeout:
-                yield f"data: timeout\n\n"
-                break
-
-            # Tick
-            if not first_tick:
-                tick_tmpl = templates.get('chat_stream_tick')
-                if tick_tmpl:
-                    yield f"data: {tick_tmpl.render()}\n\n"
-            first_tick = True
-
-            # Fetch task status
-            try:
-                task = suno_service.fetch_by_id(task_id)
-            except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
-                break
-
-            status = task.get('status')
-            data = task.get('data') or []
-            # Continue until done
-            if status not in ('SUCCESS', 'FAILURE', 'UNKNOWN'):
-                await asyncio.sleep(5)
-                continue
-
-            # Final render
-            resp_tmpl = templates.get('chat_resp')
-            if resp_tmpl:
-                msg = resp_tmpl.render(Data=data)
-                yield f"data: {msg}\n\n"
-            # Done
-            yield "data: [DONE]\n\n"
-            break
+        # Tick
+        tick_tmpl = templates.get('chat_stream_tick')
+        if tick_tmpl:
+            yield f"data: {tick_tmpl.render()}\n\n"
+
+        # Wait for the poller to publish a terminal state
+        task = None
+        try:
+            async for task in suno_service.watch_task(task_id, settings.chat_timeout):
+                pass
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            return
+
+        if not task or task.get('status') not in TERMINAL_STATUSES:
+            yield f"data: timeout\n\n"
+            return
+
+        # Final render, streamed as it is generated so long clip lists start arriving at once
+        resp_tmpl = templates.get('chat_resp')
+        if resp_tmpl:
+            for chunk in render_chunks(resp_tmpl, Data=task.get('data') or []):
+                yield f"data: {chunk}\n\n"
+        # Done
+        yield "data: [DONE]\n\n"
 
+    # Same per-key task quota as /suno/submit; given back if no song gets submitted
+    task_slot = TaskSlot(reserve_task_slot(request))
+    try:
+        owner = open_stream_slot(request)
+    except HTTPException:
+        task_slot.cancel()
+        raise
     if is_stream:
-        return EventSourceResponse(event_generator(), ping=5)
+        # sse-starlette cancels the generator when the client disconnects
+        return StreamSlotResponse(
+            track_stream("/v1/chat/completions", event_generator()), owner, on_close=task_slot.cancel, ping=5
+        )
     else:
         # Collect all data chunks and return as JSON
-        full_msg = []
-        async for event in event_generator():
-            # each event is string like 'data: ...'
-            if event.startswith('data: '):
-                content = event[len('data: '):].strip()
-                if content == '[DONE]':
-                    break
-                full_msg.append(content)
+        async def collect():
+            chunks = []
+            async for event in event_generator():
+                # each event is string like 'data: ...'
+                if event.startswith('data: '):
+                    # Keep whitespace inside the message; the response is split across chunks
+                    content = event[len('data: '):].removesuffix('\n\n')
+                    if content == '[DONE]':
+                        break
+                    chunks.append(content)
+            return chunks
+
+        try:
+            finished, full_msg = await until_disconnected(request, collect())
+        finally:
+            close_stream_slot(owner)
+            task_slot.cancel()
+        if not finished:
+            # Client Closed Request; nobody is left to read a body
+            return Response(status_code=499)
         # Return as final chat completion response
         # For simplicity, return aggregated string
         return JSONResponse({
@@ -182,6 +209,6 @@ async def chat_completions(request: Request):
             'created': int(time.time()),
             'model': model,
             'choices': [
-                {'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': ''.join(full_msg)}}
+                {'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': ''.join(full_msg).strip()}}
             ]
         })
\ No newline at end of file
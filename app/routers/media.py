@@ -0,0 +1,31 @@
+"""
+Router for locally stored clip media, mounted at /suno/media.
+Unauthenticated: clip ids are unguessable, and <audio>/<img> tags cannot
+send an Authorization header.
+"""
+import os
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+
+from app.services.media import media_store
+
+router = APIRouter()
+
+@router.get("/media/{clip_id}")
+async def get_media(request: Request, clip_id: str, kind: str = Query("audio", pattern="^(audio|video|image)$")):
+    """
+    Serve a locally stored clip asset. Range requests and sendfile (where the
+    server supports it) are handled by FileResponse; the ETag is the content hash.
+    """
+    asset = media_store.lookup(clip_id, kind)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    etag = f'"{asset["sha256"]}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    path = media_store.path_for(asset["sha256"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Media not found")
+    return FileResponse(path, media_type=asset["content_type"] or "application/octet-stream", headers=headers)
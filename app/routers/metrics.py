@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.utils.auth import verify_secret_token
+from app.utils.metrics import metrics
+
+router = APIRouter(dependencies=[Depends(verify_secret_token)])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition of queue, poller, upstream, DB and stream metrics.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,76 @@
+"""
+Router for on-demand profiling, mounted at /debug/pprof when PPROF=true.
+Only the secret token is accepted.
+"""
+import asyncio
+import threading
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.config import settings
+from app.utils import profiler
+from app.utils.auth import verify_admin_token
+
+router = APIRouter(dependencies=[Depends(verify_admin_token)])
+
+# One profile or heap diff at a time; they are expensive and hold a worker thread
+_busy = threading.Lock()
+
+
+async def _run_exclusive(func, *args):
+    if not _busy.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another profile is already running")
+    try:
+        return await asyncio.to_thread(func, *args)
+    finally:
+        _busy.release()
+
+
+@router.get("/", response_class=PlainTextResponse)
+async def index():
+    """List the available profiles."""
+    return PlainTextResponse(
+        "profile?seconds=10&interval=0.01&format=collapsed|speedscope  wall-clock stack samples of all threads\n"
+        "threads                                                     stacks of all threads and asyncio tasks\n"
+        "heap?seconds=10&top=25&frames=1                             tracemalloc allocation growth\n"
+    )
+
+
+@router.get("/profile")
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval: float = Query(0.01, ge=0.001, le=1),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+):
+    """
+    Sample every thread's stack for `seconds`, including the event loop thread,
+    so stalls show up as the frames the loop was stuck in.
+    """
+    seconds = min(seconds, settings.pprof_max_seconds)
+    samples = await _run_exclusive(profiler.sample_stacks, seconds, interval)
+    if format == "speedscope":
+        return JSONResponse(
+            profiler.to_speedscope(samples, seconds, interval),
+            headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'},
+        )
+    return PlainTextResponse(profiler.to_collapsed(samples))
+
+
+@router.get("/threads", response_class=PlainTextResponse)
+async def threads():
+    """Current stacks of all threads (keep-alive, task workers, poller...) and asyncio tasks."""
+    return PlainTextResponse(
+        "=== Threads ===\n" + profiler.thread_dump() + "\n=== Asyncio tasks ===\n" + profiler.task_dump()
+    )
+
+
+@router.get("/heap", response_class=PlainTextResponse)
+async def heap(
+    seconds: float = Query(10, gt=0),
+    top: int = Query(25, ge=1, le=500),
+    frames: int = Query(1, ge=1, le=50),
+):
+    """Memory allocated and still live after `seconds`, grouped by allocation site."""
+    seconds = min(seconds, settings.pprof_max_seconds)
+    return PlainTextResponse(await _run_exclusive(profiler.heap_diff, seconds, top, frames))
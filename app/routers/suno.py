@@ -1,48 +1,183 @@
 """
 Router for Suno endpoints: submit, fetch, account.
 """
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Any, Dict, List
+import json
 
-from app.utils.auth import verify_secret_token
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.utils.auth import (
+    StreamSlotResponse, bind_task_slot, cancel_task_slot, open_stream_slot, reserve_task_slot, verify_admin_caller,
+    verify_secret_token,
+)
 from app.schemas.suno import SubmitGenSongReq, SubmitGenLyricsReq, FetchReq
+from app.services.account import NoAccountAvailable
+from app.services.cache import task_cache
+from app.services.idempotency import IdempotencyConflict, idempotency_store, request_hash, scoped_key
+from app.services.maintenance import task_maintenance
 from app.services.suno_service import suno_service
+from app.services.tasks import TaskQueueFull, queue_stats
+from app.utils.metrics import track_stream
 
 router = APIRouter(
     prefix="",
     dependencies=[Depends(verify_secret_token)],
-    responses={401: {"description": "Unauthorized"}},
+    responses={401: {"description": "Unauthorized"}, 429: {"description": "Rate limited"}},
 )
 
+# Endpoints that expose other callers' tasks or the Suno account's credentials
+admin_only = [Depends(verify_admin_caller)]
+
 def build_response(data: Any) -> Dict[str, Any]:
     return {"code": "success", "message": "", "data": data}
 
+async def run_submit(request: Request, submit, params: dict) -> str:
+    """
+    Run a submit under the caller's task quota, mapping capacity errors to 503.
+    """
+    owner = reserve_task_slot(request)
+    try:
+        task_id = await submit(params)
+    except TaskQueueFull as e:
+        cancel_task_slot(owner)
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except NoAccountAvailable as e:
+        cancel_task_slot(owner)
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(settings.queue_retry_after)},
+        )
+    except Exception:
+        cancel_task_slot(owner)
+        raise
+    bind_task_slot(owner, task_id)
+    return task_id
+
+async def run_idempotent_submit(request: Request, response: Response, action: str, submit, params: dict) -> str:
+    """
+    run_submit, deduplicated by Idempotency-Key header or, for songs, by
+    request body hash. Replays skip the task quota and the upstream call entirely.
+    """
+    key = request.headers.get("idempotency-key")
+    body_hash = request_hash(params)
+    owner = getattr(getattr(request.state, "api_key", None), "name", "")
+    if key:
+        if len(key) > 255:
+            raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+        store_key, ttl = scoped_key(owner, action, key), settings.idempotency_ttl
+    elif action == "MUSIC" and settings.idempotency_hash_ttl > 0:
+        store_key, ttl = scoped_key(owner, action, f"body:{body_hash}"), settings.idempotency_hash_ttl
+    else:
+        return await run_submit(request, submit, params)
+    try:
+        task_id, replayed = await idempotency_store.submit(
+            store_key, body_hash, ttl, lambda: run_submit(request, submit, params)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return task_id
+
 @router.post("/submit/music")
-async def submit_music(req: SubmitGenSongReq):
-    """Submit a song generation task using Suno."""
-    task_id = suno_service.submit_song(req.dict(exclude_none=True))
+async def submit_music(req: SubmitGenSongReq, request: Request, response: Response):
+    """
+    Submit a song generation task using Suno. Retries with the same
+    Idempotency-Key (or an identical body shortly after) return the same task.
+    """
+    task_id = await run_idempotent_submit(
+        request, response, "MUSIC", suno_service.submit_song, req.dict(exclude_none=True)
+    )
     return build_response(task_id)
 
 @router.post("/submit/lyrics")
-async def submit_lyrics(req: SubmitGenLyricsReq):
-    """Submit a lyrics generation task using Suno."""
-    task_id = suno_service.submit_lyrics(req.dict(exclude_none=True))
+async def submit_lyrics(req: SubmitGenLyricsReq, request: Request, response: Response, wait: bool = False):
+    """
+    Submit a lyrics generation task using Suno.
+    Returns the task id immediately, or the finished task when wait=true.
+    """
+    task_id = await run_idempotent_submit(
+        request, response, "LYRICS", suno_service.submit_lyrics, req.dict(exclude_none=True)
+    )
+    if wait:
+        return build_response(await suno_service.wait_for_task(task_id, settings.chat_timeout))
     return build_response(task_id)
 
 @router.get("/fetch/{task_id}")
 async def fetch_by_id(task_id: str):
     try:
-        result = suno_service.fetch_by_id(task_id)
+        result = await suno_service.fetch_by_id(task_id)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
     return build_response(result)
 
+@router.get("/stream/{task_id}")
+async def stream_task(task_id: str, request: Request):
+    """
+    Server-Sent Events stream of a task's state: the current state first,
+    then every update published by the poller until the task is terminal.
+    Counts against the caller's STREAM_MAX_PER_KEY while open.
+    """
+    try:
+        await suno_service.fetch_by_id(task_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def event_generator():
+        async for task in suno_service.watch_task(task_id, settings.chat_timeout):
+            yield {"event": "task", "data": json.dumps(task)}
+
+    owner = open_stream_slot(request)
+    return StreamSlotResponse(track_stream("/suno/stream", event_generator()), owner, ping=15)
+
 @router.post("/fetch")
 async def fetch_many(req: FetchReq):
-    tasks = suno_service.fetch_tasks(req.ids, req.action)
+    tasks = await suno_service.fetch_tasks(req.ids, req.action)
     return build_response(tasks)
 
-@router.get("/account")
+@router.get("/tasks", dependencies=admin_only)
+async def list_tasks(
+    action: Optional[str] = None,
+    status: Optional[str] = Query(None, description="Comma-separated statuses"),
+    since: Optional[int] = Query(None, description="Earliest submit_time (inclusive)"),
+    until: Optional[int] = Query(None, description="Latest submit_time (exclusive)"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    include_data: bool = False,
+):
+    """
+    List tasks newest first. Pass the returned next_cursor to get the next page;
+    clip/lyrics data is only included with include_data=true.
+    """
+    statuses = [value.strip() for value in status.split(",") if value.strip()] if status else None
+    try:
+        page = await suno_service.list_tasks(action, statuses, since, until, limit, cursor, include_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return build_response(page)
+
+@router.get("/queue", dependencies=admin_only)
+async def get_queue():
+    """Task queue depth, wait times and per-action in-flight counts."""
+    return build_response(queue_stats())
+
+@router.get("/cache", dependencies=admin_only)
+async def get_cache():
+    """Task cache size and hit/miss counters."""
+    return build_response(task_cache.stats())
+
+@router.get("/maintenance", dependencies=admin_only)
+async def get_maintenance():
+    """Last retention, compaction and vacuum reports."""
+    return build_response(task_maintenance.stats())
+
+@router.get("/account", dependencies=admin_only)
 async def get_account():
     info = suno_service.get_account_info()
     return build_response(info)
\ No newline at end of file
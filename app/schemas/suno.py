@@ -11,9 +11,12 @@ class SubmitGenSongReq(BaseModel):
     continue_at: Optional[float] = Field(None, alias="continue_at")
     continue_clip_id: Optional[str] = Field(None, alias="continue_clip_id")
     make_instrumental: bool = Field(False, alias="make_instrumental")
+    # Notified with the final task payload on SUCCESS/FAILURE
+    callback_url: Optional[str] = Field(None, alias="callback_url")
 
 class SubmitGenLyricsReq(BaseModel):
     prompt: str
+    callback_url: Optional[str] = Field(None, alias="callback_url")
 
 class FetchReq(BaseModel):
     ids: List[str]
@@ -1,41 +1,102 @@
 """
 Account service: maintains Suno account authentication, token refresh, and credit info.
 """
+import asyncio
+import base64
+import json
 import threading
 import time
+from typing import Dict, List, Optional
+
+import httpx
 from loguru import logger
 
 from app.config import settings
-from app.utils.http_client import do_request
+from app.models.task import TERMINAL_STATUSES
+from app.services.events import task_events
+from app.utils.http_client import do_request, do_request_async
+from app.utils.metrics import TOKEN_REFRESH
+
+
+def decode_jwt_exp(token: str) -> float:
+    """
+    Return the `exp` claim of a JWT (unverified), or 0.0 if it cannot be read.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload)).get("exp", 0))
+    except Exception:
+        return 0.0
 
 
 class AccountService:
     """
     Singleton service to manage Suno account credentials and keep-alive.
     """
-    def __init__(self):
-        self.session_id = settings.session_id
-        self.cookie = settings.cookie
+    def __init__(self, session_id: str = None, cookie: str = None, name: str = None):
+        self.session_id = settings.session_id if session_id is None else session_id
+        self.cookie = settings.cookie if cookie is None else cookie
+        # Label stored on Task rows; defaults to the session id
+        self.name = name or self.session_id
         self.jwt: str = ""
+        self.jwt_expires_at: float = 0.0
         self.last_update: float = 0.0
+        self.credits_updated: float = 0.0
         self.credits_left: int = 0
         self.monthly_limit: int = 0
         self.monthly_usage: int = 0
         self.period: str = ""
         self.is_active: bool = False
+        # Single-flight token refresh: every exchange, from a thread or the event
+        # loop, holds _refresh_lock; loop callers also share one _refresh_task
+        self._refresh_lock = threading.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Load-balancing state, maintained by AccountPool
+        self.inflight: int = 0
+        self.auth_failures: int = 0
+        self.disabled_until: float = 0.0
 
-    def update_token(self) -> None:
+    def available(self) -> bool:
         """
-        Exchange session token for JWT and refresh cookies, then update credit info.
+        Whether the account can take new tasks: not cooling down after
+        repeated auth failures and not out of credits.
+        """
+        if time.time() < self.disabled_until:
+            return False
+        if self.credits_updated and self.credits_left < settings.account_min_credits:
+            return False
+        return True
+
+    def _record_auth(self, ok: bool) -> None:
+        if ok:
+            self.auth_failures = 0
+            self.disabled_until = 0.0
+            return
+        self.auth_failures += 1
+        if self.auth_failures >= settings.account_max_auth_failures:
+            self.disabled_until = time.time() + settings.account_cooldown
+            logger.warning(f"Suno account {self.name} removed from rotation after {self.auth_failures} auth failures")
+
+    def _exchange_request(self) -> tuple:
+        """
+        Build the Clerk token exchange request (url, headers).
         """
         if not self.cookie or not self.session_id:
             raise RuntimeError("Session ID and COOKIE must be set")
         url = settings.exchange_token_url.format(self.session_id)
         headers = {"Cookie": self.cookie, "Content-Type": "application/x-www-form-urlencoded"}
-        resp = do_request("POST", url, headers=headers)
+        return url, headers
+
+    def _apply_token_response(self, resp) -> None:
+        """
+        Store the JWT from a token exchange response and merge its Set-Cookie headers.
+        """
         data = resp.json()
         # Update JWT
         self.jwt = data.get("jwt", "")
+        # Tokens without a readable exp are refreshed on the fallback interval
+        self.jwt_expires_at = decode_jwt_exp(self.jwt) or time.time() + settings.token_refresh_fallback
         # Merge Set-Cookie headers
         set_cookies = resp.headers.get_list("set-cookie") if hasattr(resp.headers, 'get_list') else resp.headers.get_all("set-cookie", default=[])
         cookies = {kv.split("=")[0].strip(): kv.split("=")[1].strip() for cookie in set_cookies for kv in [cookie.split(";", 1)[0]] if "=" in kv}
@@ -46,34 +107,172 @@ class AccountService:
                 cookies.setdefault(k, v)
         # Rebuild cookie string
         self.cookie = "; ".join(f"{k}={v}" for k, v in cookies.items())
-        # Update credit info
-        self.get_credits()
         self.last_update = time.time()
 
-    def get_credits(self) -> None:
+    def _billing_request(self) -> tuple:
         """
-        Retrieve billing info from Suno billing endpoint.
+        Build the billing info request (url, headers); auth is added by request().
         """
         url = f"{settings.base_url}/api/billing/info/"
-        headers = {"Authorization": f"Bearer {self.jwt}", "Content-Type": "application/json"}
-        resp = do_request("GET", url, headers=headers)
-        info = resp.json()
+        headers = {"Content-Type": "application/json"}
+        return url, headers
+
+    def _apply_billing_info(self, info: dict) -> None:
         self.credits_left = int(info.get("credits_left", 0))
         self.monthly_limit = int(info.get("monthly_limit", 0))
         self.monthly_usage = int(info.get("monthly_usage", 0))
         self.period = info.get("period", "")
         self.is_active = bool(info.get("is_active", False))
+        self.credits_updated = time.time()
+
+    def token_expiring(self) -> bool:
+        """
+        True when there is no JWT or it expires within JWT_REFRESH_MARGIN seconds.
+        """
+        return not self.jwt or self.jwt_expires_at - time.time() < settings.jwt_refresh_margin
+
+    def update_token(self) -> None:
+        """
+        Exchange session token for JWT and refresh cookies.
+        Blocking; used by the keep-alive thread.
+        """
+        url, headers = self._exchange_request()
+        try:
+            resp = do_request("POST", url, headers=headers)
+        except Exception:
+            TOKEN_REFRESH.inc(self.name, "failure")
+            self._record_auth(False)
+            raise
+        self._apply_token_response(resp)
+        TOKEN_REFRESH.inc(self.name, "success")
+        self._record_auth(True)
+
+    async def update_token_async(self) -> None:
+        """
+        Async counterpart of update_token for use from request handlers.
+        """
+        url, headers = self._exchange_request()
+        try:
+            resp = await do_request_async("POST", url, headers=headers)
+        except Exception:
+            TOKEN_REFRESH.inc(self.name, "failure")
+            self._record_auth(False)
+            raise
+        self._apply_token_response(resp)
+        TOKEN_REFRESH.inc(self.name, "success")
+        self._record_auth(True)
+
+    def refresh_token(self, stale_jwt: str) -> None:
+        """
+        Refresh the JWT unless another thread already replaced `stale_jwt`.
+        Concurrent callers wait for a single exchange.
+        """
+        with self._refresh_lock:
+            if self.jwt != stale_jwt and not self.token_expiring():
+                return
+            self.update_token()
+
+    async def _refresh_token_locked(self, stale_jwt: str) -> None:
+        # Wait for the thread lock off the loop, so a keep-alive or poller
+        # exchange in progress is never raced; re-check once it is ours
+        await asyncio.to_thread(self._refresh_lock.acquire)
+        try:
+            if self.jwt != stale_jwt and not self.token_expiring():
+                return
+            await self.update_token_async()
+        finally:
+            self._refresh_lock.release()
+
+    async def refresh_token_async(self, stale_jwt: str) -> None:
+        """
+        Async single-flight refresh: concurrent callers share one exchange,
+        which also waits for any refresh running on another thread.
+        """
+        if self.jwt != stale_jwt and not self.token_expiring():
+            return
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh_token_locked(stale_jwt))
+        await asyncio.shield(self._refresh_task)
+
+    def ensure_token(self) -> None:
+        """
+        Refresh the JWT first if it is missing or about to expire.
+        """
+        if self.token_expiring():
+            self.refresh_token(self.jwt)
+
+    async def ensure_token_async(self) -> None:
+        if self.token_expiring():
+            await self.refresh_token_async(self.jwt)
+
+    @staticmethod
+    def _with_auth(jwt: str, headers: Optional[dict]) -> dict:
+        merged = dict(headers or {})
+        merged["Authorization"] = f"Bearer {jwt}"
+        return merged
+
+    def request(self, method: str, url: str, *, headers: dict = None, **kwargs) -> httpx.Response:
+        """
+        Authenticated Suno request for background threads. On a 401 the JWT is
+        refreshed once (shared with other callers) and the request retried.
+        """
+        self.ensure_token()
+        jwt = self.jwt
+        try:
+            return do_request(method, url, headers=self._with_auth(jwt, headers), **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 401:
+                raise
+        self.refresh_token(jwt)
+        return do_request(method, url, headers=self._with_auth(self.jwt, headers), **kwargs)
+
+    async def request_async(self, method: str, url: str, *, headers: dict = None, **kwargs) -> httpx.Response:
+        """
+        Async counterpart of request for use inside request handlers.
+        """
+        await self.ensure_token_async()
+        jwt = self.jwt
+        try:
+            return await do_request_async(method, url, headers=self._with_auth(jwt, headers), **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 401:
+                raise
+        await self.refresh_token_async(jwt)
+        return await do_request_async(method, url, headers=self._with_auth(self.jwt, headers), **kwargs)
+
+    def get_credits(self) -> None:
+        """
+        Retrieve billing info from Suno billing endpoint.
+        """
+        url, headers = self._billing_request()
+        resp = self.request("GET", url, headers=headers)
+        self._apply_billing_info(resp.json())
+
+    async def get_credits_async(self) -> None:
+        """
+        Async counterpart of get_credits.
+        """
+        url, headers = self._billing_request()
+        resp = await self.request_async("GET", url, headers=headers)
+        self._apply_billing_info(resp.json())
 
     def keep_alive_loop(self) -> None:
         """
-        Background loop to refresh token periodically.
+        Background loop: refresh the JWT shortly before it expires and the
+        credit info every CREDITS_REFRESH_INTERVAL seconds, sleeping in between.
         """
         while True:
             try:
-                self.update_token()
+                self.ensure_token()
+                if time.time() - self.credits_updated >= settings.credits_refresh_interval:
+                    self.get_credits()
+                next_token = self.jwt_expires_at - settings.jwt_refresh_margin
+                next_credits = self.credits_updated + settings.credits_refresh_interval
+                delay = min(next_token, next_credits) - time.time()
             except Exception as e:
-                logger.error(f"Suno Keep-alive failed: {e}")
-            time.sleep(5)
+                logger.error(f"Suno Keep-alive failed for {self.name}: {e}")
+                delay = settings.token_retry_interval
+            time.sleep(max(1.0, delay))
 
     def get_account_info(self) -> dict:
         """
@@ -83,7 +282,9 @@ class AccountService:
             "session_id": self.session_id,
             "cookie": self.cookie,
             "jwt": self.jwt,
+            "jwt_expires_at": self.jwt_expires_at,
             "last_update": self.last_update,
+            "credits_updated": self.credits_updated,
             "credits_left": self.credits_left,
             "monthly_limit": self.monthly_limit,
             "monthly_usage": self.monthly_usage,
@@ -91,12 +292,141 @@ class AccountService:
             "is_active": self.is_active,
         }
 
+    def get_utilization(self) -> dict:
+        """
+        Load-balancing view of the account, without credentials.
+        """
+        return {
+            "name": self.name,
+            "available": self.available(),
+            "inflight": self.inflight,
+            "credits_left": self.credits_left,
+            "monthly_limit": self.monthly_limit,
+            "monthly_usage": self.monthly_usage,
+            "is_active": self.is_active,
+            "auth_failures": self.auth_failures,
+            "disabled_until": self.disabled_until,
+            "jwt_expires_at": self.jwt_expires_at,
+        }
+
+
+class NoAccountAvailable(RuntimeError):
+    """
+    Raised when every Suno account is exhausted or failing auth.
+    """
+
+
+class AccountPool:
+    """
+    Pool of Suno accounts. Submits go to the available account with the most
+    credits left and the fewest in-flight tasks; polling reuses the account
+    recorded on the task.
+    """
+    def __init__(self, accounts: List[AccountService]):
+        if not accounts:
+            accounts = [AccountService()]
+        self.accounts = accounts
+        self._by_name: Dict[str, AccountService] = {acc.name: acc for acc in accounts}
+        self._lock = threading.Lock()
+        # task_id -> account name, for tasks holding an in-flight slot
+        self._assigned: Dict[str, str] = {}
+
+    @classmethod
+    def from_settings(cls) -> "AccountPool":
+        """
+        Build the pool from SUNO_ACCOUNTS (a JSON list of {"session_id", "cookie",
+        "name"?}), falling back to the single SESSION_ID/COOKIE account.
+        """
+        accounts = []
+        if settings.suno_accounts:
+            for entry in json.loads(settings.suno_accounts):
+                accounts.append(AccountService(entry["session_id"], entry["cookie"], entry.get("name")))
+        return cls(accounts)
+
+    @property
+    def primary(self) -> AccountService:
+        return self.accounts[0]
+
+    def get(self, name: Optional[str]) -> AccountService:
+        """
+        Account by name; unknown or missing names fall back to the primary account.
+        """
+        return self._by_name.get(name) or self.primary
+
+    def acquire(self) -> AccountService:
+        """
+        Pick an account for a new task and count it as in flight.
+        Raises NoAccountAvailable if every account is out of rotation.
+        """
+        with self._lock:
+            candidates = [acc for acc in self.accounts if acc.available()]
+            if not candidates:
+                raise NoAccountAvailable("No Suno account available")
+            # Credits are refreshed only every few minutes, so weigh them by current
+            # load; otherwise every submit would pile onto the richest account
+            account = max(candidates, key=lambda acc: (acc.credits_left / (acc.inflight + 1), -acc.inflight))
+            account.inflight += 1
+            return account
+
+    def assign(self, task_id: str, account: AccountService) -> None:
+        """
+        Attach an acquired in-flight slot to a task so it is released when the task finishes.
+        """
+        with self._lock:
+            self._assigned[task_id] = account.name
+
+    def track(self, task_id: str, name: Optional[str]) -> None:
+        """
+        Count a resumed task against its account's in-flight total.
+        """
+        account = self.get(name)
+        with self._lock:
+            if task_id in self._assigned:
+                return
+            account.inflight += 1
+            self._assigned[task_id] = account.name
+
+    def release(self, account: AccountService) -> None:
+        """
+        Give back a slot that was acquired but never assigned to a task.
+        """
+        with self._lock:
+            account.inflight = max(0, account.inflight - 1)
+
+    def finish(self, task_id: str) -> None:
+        """
+        Release the in-flight slot held by a task, if any.
+        """
+        with self._lock:
+            name = self._assigned.pop(task_id, None)
+            if name is not None:
+                account = self.get(name)
+                account.inflight = max(0, account.inflight - 1)
+
+    def on_task_event(self, task: dict) -> None:
+        if task.get("status") in TERMINAL_STATUSES:
+            self.finish(task["task_id"])
+
+    def get_account_info(self) -> dict:
+        """
+        Primary account details plus per-account utilization.
+        """
+        info = self.primary.get_account_info()
+        info["accounts"] = [acc.get_utilization() for acc in self.accounts]
+        return info
+
+    def start_keepalive(self) -> None:
+        for account in self.accounts:
+            thread = threading.Thread(target=account.keep_alive_loop, name=f"keepalive-{account.name}", daemon=True)
+            thread.start()
+
+
 # Singleton instance
-account_service = AccountService()
+account_pool = AccountPool.from_settings()
+task_events.add_listener(account_pool.on_task_event)
 
 def start_account_keepalive():
     """
-    Start background thread for token refresh.
+    Start one background token refresh thread per account.
     """
-    thread = threading.Thread(target=account_service.keep_alive_loop, daemon=True)
-    thread.start()
\ No newline at end of file
+    account_pool.start_keepalive()
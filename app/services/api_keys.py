@@ -0,0 +1,166 @@
+"""
+Client API keys: an in-memory cache of the api_keys table plus the per-key
+rate limiter, in-flight task quota and open stream quota.
+
+Create a key with:
+    python -m app.services.api_keys create <name> [--rate 60] [--burst 10] [--max-concurrent 5]
+"""
+import argparse
+import asyncio
+import hashlib
+import secrets
+import threading
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.api_key import ApiKey
+from app.models.task import TERMINAL_STATUSES
+from app.services.events import task_events
+from app.utils.metrics import SSE_STREAMS_BY_KEY
+from app.utils.ratelimit import ConcurrencyQuota, RateLimiter
+
+
+def hash_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ApiKeyInfo:
+    """
+    Cached limits for one API key.
+    """
+    __slots__ = ("name", "rate_per_minute", "burst", "max_concurrent")
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_concurrent: int):
+        self.name = name
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+
+
+class ApiKeyStore:
+    """
+    Enabled API keys keyed by token hash, reloaded from the database every
+    API_KEY_REFRESH_INTERVAL seconds so lookups never hit the database.
+    """
+    def __init__(self):
+        self._keys: Dict[str, ApiKeyInfo] = {}
+        self._lock = threading.Lock()
+        # None until the first load at startup; keys are ignored before that
+        self._loaded_at: Optional[float] = None
+        # Consecutive failed loads and when the last one failed, for retry backoff
+        self._failures = 0
+        self._failed_at: Optional[float] = None
+        # Single-flight guard: concurrent requests share one background reload
+        self._reload_task: Optional[asyncio.Future] = None
+
+    def load(self) -> None:
+        db = SessionLocal()
+        try:
+            rows = db.query(ApiKey).filter(ApiKey.enabled.is_(True)).all()
+            keys = {
+                row.key_hash: ApiKeyInfo(row.name, row.rate_per_minute, row.burst, row.max_concurrent)
+                for row in rows
+            }
+        except Exception as e:
+            self._failures += 1
+            self._failed_at = time.time()
+            logger.error(f"Failed to load API keys (attempt {self._failures}): {e}")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            self._keys = keys
+            self._loaded_at = time.time()
+            self._failures = 0
+            self._failed_at = None
+
+    def is_stale(self) -> bool:
+        if self._failed_at is not None:
+            # Retry a failed load with exponential backoff, capped at the refresh interval
+            delay = min(2 ** self._failures, settings.api_key_refresh_interval)
+            return time.time() - self._failed_at > delay
+        return self._loaded_at is not None and time.time() - self._loaded_at > settings.api_key_refresh_interval
+
+    def available(self) -> bool:
+        """
+        False when keys could not be read and none were ever loaded; callers
+        must then fail closed instead of treating the server as keyless.
+        """
+        return self._loaded_at is not None or self._failed_at is None
+
+    async def reload_if_stale(self) -> None:
+        """
+        Reload in a worker thread once API_KEY_REFRESH_INTERVAL has passed.
+        Requests arriving during the reload await the same one.
+        """
+        if not self.is_stale():
+            return
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.ensure_future(asyncio.to_thread(self.load))
+        await asyncio.shield(self._reload_task)
+
+    def has_keys(self) -> bool:
+        return bool(self._keys)
+
+    def lookup(self, token: str) -> Optional[ApiKeyInfo]:
+        return self._keys.get(hash_key(token))
+
+
+def create_api_key(name: str, rate_per_minute: float = 60, burst: int = 10, max_concurrent: int = 5) -> str:
+    """
+    Store a new API key and return its token. Only the hash is persisted.
+    """
+    token = f"sk-{secrets.token_urlsafe(32)}"
+    db = SessionLocal()
+    try:
+        db.add(ApiKey(
+            name=name,
+            key_hash=hash_key(token),
+            rate_per_minute=rate_per_minute,
+            burst=burst,
+            max_concurrent=max_concurrent,
+            enabled=True,
+            created_at=int(time.time()),
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return token
+
+
+# Singleton instances
+api_key_store = ApiKeyStore()
+rate_limiter = RateLimiter()
+task_quota = ConcurrencyQuota()
+# Open SSE streams / long-polling chats per key
+stream_quota = ConcurrencyQuota()
+
+SSE_STREAMS_BY_KEY.set_function(lambda: {(name,): count for name, count in stream_quota.counts().items()})
+
+
+def _release_finished(task: dict) -> None:
+    if task.get("status") in TERMINAL_STATUSES:
+        task_quota.finish(task["task_id"])
+
+
+task_events.add_listener(_release_finished)
+
+
+if __name__ == "__main__":
+    from app.database import init_db
+
+    parser = argparse.ArgumentParser(description="Manage client API keys")
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create", help="create a key and print its token")
+    create.add_argument("name")
+    create.add_argument("--rate", type=float, default=60, help="requests per minute (0 = unlimited)")
+    create.add_argument("--burst", type=int, default=10)
+    create.add_argument("--max-concurrent", type=int, default=5, help="in-flight tasks (0 = unlimited)")
+    args = parser.parse_args()
+
+    init_db()
+    print(create_api_key(args.name, args.rate, args.burst, args.max_concurrent))
@@ -0,0 +1,88 @@
+"""
+In-process caches: a bounded LRU with per-entry TTL, and the task cache that
+sits in front of SunoService.fetch_by_id / fetch_tasks.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.config import settings
+from app.models.task import TERMINAL_STATUSES
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a TTL.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (expires_at, value)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value, or None on a miss or expired entry.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Insert or replace a value, evicting the least recently used entries when full.
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Serialized task dicts keyed by task_id
+task_cache = TTLCache(settings.task_cache_size, settings.task_cache_ttl)
+
+
+def cache_task(task: dict) -> None:
+    """
+    Write a serialized task through to the cache; terminal tasks never
+    change again, so they are kept much longer than in-flight ones.
+    """
+    ttl = settings.task_cache_terminal_ttl if task.get("status") in TERMINAL_STATUSES else settings.task_cache_ttl
+    task_cache.set(task["task_id"], task, ttl)
@@ -0,0 +1,95 @@
+"""
+In-process pub/sub for task state changes.
+
+Writers (the clip poller, the lyrics loop, submits) publish the serialized
+task after each commit; async readers (chat streams, /suno/stream) await
+those events instead of polling the database.
+"""
+import asyncio
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+
+class Subscription:
+    """
+    Async handle for the events of a single task. Use as an async context manager.
+    """
+    def __init__(self, bus: "TaskEventBus", task_id: str):
+        self.bus = bus
+        self.task_id = task_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def get(self, timeout: Optional[float] = None) -> dict:
+        """
+        Wait for the next task state. Raises asyncio.TimeoutError on timeout.
+        """
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.bus.unsubscribe(self)
+
+
+class TaskEventBus:
+    """
+    Thread-safe fan-out of task updates to asyncio subscribers and sync listeners.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._listeners: List[Callable[[dict], None]] = []
+
+    def subscribe(self, task_id: str) -> Subscription:
+        """
+        Subscribe to updates for task_id. Must be called from a running event loop.
+        """
+        sub = Subscription(self, task_id)
+        with self._lock:
+            self._subscribers.setdefault(task_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.task_id)
+            if subs is None:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.task_id]
+
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        """
+        Register a synchronous callback invoked on the publishing thread for every update.
+        """
+        self._listeners.append(listener)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, task: dict) -> None:
+        """
+        Deliver a task update to every subscriber of its task_id. Safe to call from any thread.
+        """
+        with self._lock:
+            subs = list(self._subscribers.get(task["task_id"], ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.queue.put_nowait, task)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                self.unsubscribe(sub)
+        for listener in self._listeners:
+            try:
+                listener(task)
+            except Exception as e:
+                logger.error(f"Task event listener failed for {task.get('task_id')}: {e}")
+
+
+# Singleton instance
+task_events = TaskEventBus()
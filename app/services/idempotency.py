@@ -0,0 +1,149 @@
+"""
+Submit deduplication: a retried or concurrent identical submit gets the first
+submit's task id back instead of generating (and paying for) it again.
+
+Keys come from the Idempotency-Key header or, for song submits without one,
+from a hash of the normalized request body (with a shorter TTL). Completed submits are kept in a
+TTLCache backed by the idempotency_keys table, so replays survive restarts
+and are seen by other workers. Submits still running are shared through a
+future that concurrent duplicates await.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.idempotency import IdempotencyKey
+from app.services.cache import TTLCache
+
+
+class IdempotencyConflict(ValueError):
+    """
+    Raised when an idempotency key is reused with a different request body.
+    """
+
+
+def request_hash(params: dict) -> str:
+    """
+    sha256 of a submit body with empty fields dropped and strings trimmed.
+    """
+    normalized = {
+        name: value.strip() if isinstance(value, str) else value
+        for name, value in params.items()
+        if value not in (None, "")
+    }
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def scoped_key(owner: str, action: str, key: str) -> str:
+    """
+    Storage key for a client-supplied key; callers never see each other's keys.
+    """
+    return hashlib.sha256(f"{owner}\n{action}\n{key}".encode()).hexdigest()
+
+
+def _consume(future: asyncio.Future) -> None:
+    # Nobody may be waiting; don't log "exception was never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+class IdempotencyStore:
+    """
+    key -> (request hash, task id) for completed submits, plus in-flight submits.
+    """
+    def __init__(self):
+        self._cache = TTLCache(settings.idempotency_cache_size, settings.idempotency_ttl)
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    @staticmethod
+    async def _load(key: str) -> Optional[Tuple[str, str, int]]:
+        async with AsyncSessionLocal() as db:
+            row = await db.get(IdempotencyKey, key)
+            if row is None or row.expires_at <= time.time():
+                return None
+            return row.request_hash, row.task_id, row.expires_at
+
+    @staticmethod
+    async def _save(key: str, req_hash: str, task_id: str, ttl: float) -> None:
+        now = int(time.time())
+        async with AsyncSessionLocal() as db:
+            await db.merge(IdempotencyKey(
+                key=key, request_hash=req_hash, task_id=task_id,
+                created_at=now, expires_at=int(now + ttl),
+            ))
+            await db.commit()
+
+    async def lookup(self, key: str) -> Optional[Tuple[str, str]]:
+        """
+        (request hash, task id) of a completed submit, from memory or the database.
+        """
+        found = self._cache.get(key)
+        if found is not None:
+            return found
+        row = await self._load(key)
+        if row is None:
+            return None
+        req_hash, task_id, expires_at = row
+        self._cache.set(key, (req_hash, task_id), ttl=expires_at - time.time())
+        return req_hash, task_id
+
+    async def submit(self, key: str, req_hash: str, ttl: float, submit: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+        """
+        Run submit() once per key. Returns (task id, replayed); duplicates
+        arriving while the first submit runs wait for its result or error.
+        Raises IdempotencyConflict when the key was used for another body.
+        """
+        while True:
+            found = await self.lookup(key)
+            if found is not None:
+                if found[0] != req_hash:
+                    raise IdempotencyConflict("Idempotency key was already used with a different request")
+                return found[1], True
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            if inflight[0] != req_hash:
+                raise IdempotencyConflict("Idempotency key is in use by a different request")
+            try:
+                return await asyncio.shield(inflight[1]), True
+            except asyncio.CancelledError:
+                if not inflight[1].cancelled():
+                    raise
+                # The first caller went away before submitting; take over
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume)
+        self._inflight[key] = (req_hash, future)
+        try:
+            task_id = await submit()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._cache.set(key, (req_hash, task_id), ttl=ttl)
+            future.set_result(task_id)
+        finally:
+            self._inflight.pop(key, None)
+        try:
+            await self._save(key, req_hash, task_id, ttl)
+        except Exception as e:
+            # The task exists upstream; losing only cross-restart replay beats failing the submit
+            logger.error(f"Failed to persist idempotency key for task {task_id}: {e}")
+        return task_id, False
+
+
+# Singleton instance
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,285 @@
+"""
+Scheduled maintenance for the tasks table (APScheduler):
+
+- retention: finished tasks older than TASK_RETENTION_DAYS are deleted in
+  batches, after being appended to a gzipped JSONL file when
+  TASK_ARCHIVE_DIR is set; old settled webhook deliveries go with them.
+- compaction: finished tasks keep only the clip/lyrics fields the API serves.
+- VACUUM/ANALYZE once a day at MAINTENANCE_VACUUM_HOUR (local time). If
+  songs are being polled, VACUUM is retried every few minutes until that
+  hour is over; skipped runs are counted in the vacuum report.
+
+Each run logs rows removed and bytes reclaimed; the last reports are
+available from maintenance_stats().
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from loguru import logger
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models.task import Task as TaskModel, TERMINAL_STATUSES
+from app.models.idempotency import IdempotencyKey
+from app.models.tool_call import ToolCall
+from app.models.webhook import WebhookDelivery
+from app.services.cache import task_cache
+from app.services.poller import clip_poller
+from app.services.suno_service import LYRICS_DIGEST_FIELDS, SONG_DIGEST_FIELDS
+
+# Fields kept on finished tasks; everything else in the upstream payload is dropped
+COMPACT_CLIP_FIELDS = SONG_DIGEST_FIELDS + ("created_at",)
+COMPACT_METADATA_FIELDS = ("tags", "prompt", "gpt_description_prompt", "duration", "error_message")
+COMPACT_LYRICS_FIELDS = LYRICS_DIGEST_FIELDS
+# Seconds between VACUUM attempts while tasks are in flight
+VACUUM_RETRY_INTERVAL = 300
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, separators=(",", ":"), default=str)) if value is not None else 0
+
+
+def compact_data(action: str, data):
+    """
+    Return the served subset of a finished task's data.
+    """
+    if action == "LYRICS" and isinstance(data, dict):
+        return {key: data[key] for key in COMPACT_LYRICS_FIELDS if key in data}
+    if not isinstance(data, list):
+        return data
+    clips = []
+    for clip in data:
+        if not isinstance(clip, dict):
+            clips.append(clip)
+            continue
+        compact = {key: clip[key] for key in COMPACT_CLIP_FIELDS if key in clip}
+        if isinstance(compact.get("metadata"), dict):
+            compact["metadata"] = {
+                key: value for key, value in compact["metadata"].items()
+                if key in COMPACT_METADATA_FIELDS and value is not None
+            }
+        clips.append(compact)
+    return clips
+
+
+class TaskMaintenance:
+    """
+    Retention, compaction and vacuum jobs for the tasks table.
+    """
+    def __init__(self):
+        self._scheduler: Optional[BackgroundScheduler] = None
+        self._reports = {}
+        self._vacuum_skips = 0
+
+    def purge_expired(self) -> dict:
+        """
+        Delete (or archive, then delete) finished tasks past the retention window.
+        """
+        report = {"rows_removed": 0, "rows_archived": 0, "bytes_removed": 0, "deliveries_removed": 0}
+        if settings.task_retention_days <= 0:
+            return report
+        cutoff = int(time.time() - settings.task_retention_days * 86400)
+        archive_path = None
+        if settings.task_archive_dir:
+            os.makedirs(settings.task_archive_dir, exist_ok=True)
+            archive_path = os.path.join(settings.task_archive_dir, f"tasks-{time.strftime('%Y-%m-%d')}.jsonl.gz")
+
+        while True:
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(TaskModel)
+                    .filter(TaskModel.status.in_(TERMINAL_STATUSES), TaskModel.submit_time < cutoff)
+                    .order_by(TaskModel.id)
+                    .limit(settings.maintenance_batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                if archive_path:
+                    # Each batch is its own gzip member; readers see one continuous stream
+                    with gzip.open(archive_path, "at", encoding="utf-8") as archive:
+                        for row in rows:
+                            archive.write(json.dumps(row.to_dict(), default=str) + "\n")
+                    report["rows_archived"] += len(rows)
+                ids = [row.id for row in rows]
+                report["bytes_removed"] += sum(_json_size(row.data) for row in rows)
+                task_ids = [row.task_id for row in rows]
+                db.query(TaskModel).filter(TaskModel.id.in_(ids)).delete(synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+            report["rows_removed"] += len(ids)
+            for task_id in task_ids:
+                task_cache.delete(task_id)
+
+        db = SessionLocal()
+        try:
+            report["deliveries_removed"] = (
+                db.query(WebhookDelivery)
+                .filter(WebhookDelivery.status != "PENDING", WebhookDelivery.created_at < cutoff)
+                .delete(synchronize_session=False)
+            )
+            report["idempotency_keys_removed"] = (
+                db.query(IdempotencyKey)
+                .filter(IdempotencyKey.expires_at < int(time.time()))
+                .delete(synchronize_session=False)
+            )
+            report["tool_calls_removed"] = (
+                db.query(ToolCall)
+                .filter(ToolCall.expires_at < int(time.time()))
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        return report
+
+    def compact_finished(self) -> dict:
+        """
+        Shrink data of tasks finished more than TASK_COMPACT_AFTER seconds ago.
+        """
+        report = {"rows_compacted": 0, "bytes_reclaimed": 0}
+        cutoff = int(time.time() - settings.task_compact_after)
+        while True:
+            db = SessionLocal()
+            try:
+                # Rows are flagged once trimmed, so every run (and restart) only sees new ones
+                rows = (
+                    db.query(TaskModel)
+                    .filter(
+                        TaskModel.compacted.is_(False),
+                        TaskModel.status.in_(TERMINAL_STATUSES),
+                        TaskModel.finish_time > 0,
+                        TaskModel.finish_time < cutoff,
+                    )
+                    .order_by(TaskModel.finish_time, TaskModel.id)
+                    .limit(settings.maintenance_batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                changed = []
+                for row in rows:
+                    row.compacted = True
+                    compact = compact_data(row.action, row.data)
+                    saved = _json_size(row.data) - _json_size(compact)
+                    if saved > 0:
+                        row.data = compact
+                        report["bytes_reclaimed"] += saved
+                        changed.append(row.task_id)
+                db.commit()
+            finally:
+                db.close()
+            report["rows_compacted"] += len(changed)
+            for task_id in changed:
+                task_cache.delete(task_id)
+        return report
+
+    @staticmethod
+    def _database_bytes(conn) -> Optional[int]:
+        if engine.dialect.name == "sqlite":
+            pages = conn.execute(text("PRAGMA page_count")).scalar()
+            return pages * conn.execute(text("PRAGMA page_size")).scalar()
+        if engine.dialect.name == "postgresql":
+            return conn.execute(text("SELECT pg_total_relation_size('tasks')")).scalar()
+        return None
+
+    def vacuum(self) -> dict:
+        """
+        VACUUM and ANALYZE the database. VACUUM is skipped while songs are
+        being polled, since it locks SQLite for its whole duration.
+        """
+        report = {"vacuumed": False, "skipped": False, "bytes_reclaimed": 0}
+        busy = clip_poller.inflight_count() > 0
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            before = self._database_bytes(conn)
+            if busy:
+                logger.info("Skipping VACUUM, tasks are in flight")
+                self._vacuum_skips += 1
+                report["skipped"] = True
+            elif engine.dialect.name == "sqlite":
+                conn.execute(text("VACUUM"))
+                report["vacuumed"] = True
+            elif engine.dialect.name == "postgresql":
+                conn.execute(text("VACUUM tasks"))
+                report["vacuumed"] = True
+            if engine.dialect.name in ("sqlite", "postgresql"):
+                conn.execute(text("ANALYZE"))
+            after = self._database_bytes(conn)
+        if before is not None and after is not None:
+            report["bytes_reclaimed"] = max(0, before - after)
+        report["skipped_total"] = self._vacuum_skips
+        return report
+
+    def _run(self, name: str, job) -> Optional[dict]:
+        started = time.time()
+        try:
+            report = job()
+        except Exception as e:
+            logger.error(f"Maintenance job {name} failed: {e}")
+            return None
+        report["duration"] = round(time.time() - started, 3)
+        report["finished_at"] = int(time.time())
+        self._reports[name] = report
+        logger.info(f"Maintenance {name}: {report}")
+        return report
+
+    def run_cleanup(self) -> None:
+        self._run("retention", self.purge_expired)
+        self._run("compaction", self.compact_finished)
+
+    def run_vacuum(self) -> None:
+        report = self._run("vacuum", self.vacuum)
+        if not report or not report["skipped"] or not self._scheduler:
+            return
+        retry_at = datetime.now() + timedelta(seconds=VACUUM_RETRY_INTERVAL)
+        if retry_at.hour != settings.maintenance_vacuum_hour:
+            logger.warning("VACUUM skipped for today, tasks stayed in flight through the maintenance hour")
+            return
+        self._scheduler.add_job(
+            self.run_vacuum, "date", run_date=retry_at,
+            id="task-vacuum-retry", replace_existing=True,
+        )
+
+    def stats(self) -> dict:
+        return dict(self._reports)
+
+    def start(self) -> None:
+        """
+        Schedule cleanup every MAINTENANCE_INTERVAL seconds and vacuum daily at quiet hours.
+        """
+        scheduler = BackgroundScheduler(daemon=True)
+        scheduler.add_job(
+            self.run_cleanup, "interval", seconds=settings.maintenance_interval,
+            id="task-cleanup", max_instances=1, coalesce=True,
+        )
+        if settings.maintenance_vacuum_hour >= 0:
+            scheduler.add_job(
+                self.run_vacuum, "cron", hour=settings.maintenance_vacuum_hour,
+                id="task-vacuum", max_instances=1, coalesce=True,
+            )
+        scheduler.start()
+        self._scheduler = scheduler
+
+    def stop(self) -> None:
+        if self._scheduler:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+
+# Singleton instance
+task_maintenance = TaskMaintenance()
+
+
+def start_maintenance():
+    """
+    Start the maintenance scheduler.
+    """
+    task_maintenance.start()
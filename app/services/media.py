@@ -0,0 +1,328 @@
+"""
+Content-addressed local media store for finished clips (MEDIA_ENABLED=true).
+
+When a MUSIC task reaches SUCCESS its clips' audio/video/image URLs are
+streamed to disk in chunks (bounded by MEDIA_CONCURRENCY, never buffered
+whole), hashed on the fly and stored at <MEDIA_DIR>/<sha[:2]>/<sha>, so
+identical files are kept once. The media_assets table maps (clip_id, kind)
+to a hash; an in-memory index of it lets fetch_by_id swap CDN URLs for
+/suno/media URLs without a query. Disk usage is capped at MEDIA_MAX_BYTES
+by evicting the least recently served files.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import httpx
+from loguru import logger
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.media import MediaAsset
+from app.services.events import task_events
+
+# Clip field holding the upstream URL for each media kind
+MEDIA_FIELDS = {"audio": "audio_url", "video": "video_url", "image": "image_url"}
+CHUNK_SIZE = 64 * 1024
+# Seconds between writes of last_access times back to the database
+ACCESS_FLUSH_INTERVAL = 60
+
+
+class MediaTooLarge(RuntimeError):
+    """
+    Raised when a download exceeds MEDIA_MAX_FILE_BYTES.
+    """
+
+
+class MediaStore:
+    """
+    Background downloader, index and LRU cap for locally stored clip media.
+    """
+    def __init__(self):
+        # (clip_id, kind) -> {"sha256", "size", "content_type"}
+        self._index: Dict[Tuple[str, str], dict] = {}
+        # sha256 -> size / last serve time, for the disk cap
+        self._sizes: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._touched: Set[str] = set()
+        # Downloads queued or running, so a clip is fetched once
+        self._pending: Set[Tuple[str, str]] = set()
+        self._jobs: Set[asyncio.Task] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def path_for(sha256: str) -> str:
+        return os.path.join(settings.media_dir, sha256[:2], sha256)
+
+    @staticmethod
+    def local_url(clip_id: str, kind: str) -> str:
+        return f"{settings.media_base_url.rstrip('/')}/suno/media/{clip_id}?kind={kind}"
+
+    def disk_usage(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._runner is not None,
+            "assets": len(self._index),
+            "files": len(self._sizes),
+            "bytes": self.disk_usage(),
+            "max_bytes": settings.media_max_bytes,
+            "pending": len(self._pending),
+        }
+
+    def _load(self) -> None:
+        db = SessionLocal()
+        try:
+            rows = db.query(MediaAsset).all()
+        finally:
+            db.close()
+        for row in rows:
+            self._remember(row.clip_id, row.kind, row.sha256, row.size, row.content_type, row.last_access or row.created_at)
+
+    def _remember(self, clip_id: str, kind: str, sha256: str, size: int, content_type: Optional[str], accessed: float) -> None:
+        self._index[(clip_id, kind)] = {"sha256": sha256, "size": size, "content_type": content_type}
+        self._sizes[sha256] = size
+        self._last_access[sha256] = max(self._last_access.get(sha256, 0), accessed or 0)
+
+    def lookup(self, clip_id: str, kind: str) -> Optional[dict]:
+        """
+        Stored asset for a clip, marking it recently used.
+        """
+        asset = self._index.get((clip_id, kind))
+        if asset is not None:
+            self._last_access[asset["sha256"]] = time.time()
+            self._touched.add(asset["sha256"])
+        return asset
+
+    def localize(self, task: dict) -> dict:
+        """
+        Return the task with CDN URLs replaced by local ones for every stored asset.
+        The input (possibly a cached dict) is not modified.
+        """
+        data = task.get("data")
+        if not self._index or not isinstance(data, list):
+            return task
+        clips = []
+        for clip in data:
+            if isinstance(clip, dict) and clip.get("id"):
+                local = {
+                    field: self.local_url(clip["id"], kind)
+                    for kind, field in MEDIA_FIELDS.items()
+                    if (clip["id"], kind) in self._index
+                }
+                if local:
+                    clip = {**clip, **local}
+            clips.append(clip)
+        return {**task, "data": clips}
+
+    def _on_task_event(self, task: dict) -> None:
+        if task.get("status") == "SUCCESS" and task.get("action") == "MUSIC" and self._loop:
+            self._loop.call_soon_threadsafe(self._enqueue, task.get("data"))
+
+    def _enqueue(self, clips) -> None:
+        kinds = [kind for kind in settings.media_kinds.split(",") if kind in MEDIA_FIELDS]
+        for clip in clips if isinstance(clips, list) else []:
+            if not isinstance(clip, dict) or not clip.get("id"):
+                continue
+            for kind in kinds:
+                url = clip.get(MEDIA_FIELDS[kind])
+                key = (clip["id"], kind)
+                if url and key not in self._index and key not in self._pending:
+                    self._pending.add(key)
+                    self._queue.put_nowait((clip["id"], kind, url))
+
+    @staticmethod
+    def _write_chunk(out, hasher, chunk: bytes) -> None:
+        hasher.update(chunk)
+        out.write(chunk)
+
+    @classmethod
+    def _store(cls, tmp_path: str, sha256: str) -> None:
+        final = cls.path_for(sha256)
+        if os.path.exists(final):
+            # Same content already stored for another clip
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            os.replace(tmp_path, final)
+
+    @staticmethod
+    def _discard(tmp_path: str) -> None:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    async def _fetch(self, url: str) -> Tuple[str, int, Optional[str]]:
+        """
+        Stream url into a temp file while hashing it, then move it to its
+        content-addressed path. Returns (sha256, size, content type).
+        All file I/O runs in worker threads, off the event loop.
+        """
+        tmp_dir = os.path.join(settings.media_dir, "tmp")
+        fd, tmp_path = await asyncio.to_thread(tempfile.mkstemp, dir=tmp_dir)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            out = os.fdopen(fd, "wb")
+            try:
+                async with self._client.stream("GET", url) as resp:
+                    resp.raise_for_status()
+                    content_type = resp.headers.get("content-type")
+                    async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > settings.media_max_file_bytes:
+                            raise MediaTooLarge(f"{url} exceeds {settings.media_max_file_bytes} bytes")
+                        await asyncio.to_thread(self._write_chunk, out, hasher, chunk)
+            finally:
+                await asyncio.to_thread(out.close)
+            sha256 = hasher.hexdigest()
+            await asyncio.to_thread(self._store, tmp_path, sha256)
+            return sha256, size, content_type
+        except BaseException:
+            await asyncio.to_thread(self._discard, tmp_path)
+            raise
+
+    @staticmethod
+    def _record(clip_id: str, kind: str, sha256: str, size: int, content_type: Optional[str], url: str) -> None:
+        now = int(time.time())
+        db = SessionLocal()
+        try:
+            db.query(MediaAsset).filter_by(clip_id=clip_id, kind=kind).delete(synchronize_session=False)
+            db.add(MediaAsset(
+                clip_id=clip_id, kind=kind, sha256=sha256, size=size, content_type=content_type,
+                source_url=url[:2048], created_at=now, last_access=now,
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    async def _download(self, clip_id: str, kind: str, url: str) -> None:
+        try:
+            async with self._semaphore:
+                for attempt in range(1, settings.media_max_attempts + 1):
+                    try:
+                        sha256, size, content_type = await self._fetch(url)
+                        break
+                    except MediaTooLarge as e:
+                        logger.warning(f"Skipping {kind} of clip {clip_id}: {e}")
+                        return
+                    except (httpx.HTTPError, OSError) as e:
+                        if attempt == settings.media_max_attempts:
+                            logger.warning(f"Failed to download {kind} of clip {clip_id}: {e}")
+                            return
+                        await asyncio.sleep(2 ** attempt)
+            await asyncio.to_thread(self._record, clip_id, kind, sha256, size, content_type, url)
+            self._remember(clip_id, kind, sha256, size, content_type, time.time())
+            await self.evict()
+        except Exception as e:
+            logger.error(f"Media download for clip {clip_id} ({kind}) failed: {e}")
+        finally:
+            self._pending.discard((clip_id, kind))
+
+    async def evict(self) -> List[str]:
+        """
+        Drop least recently served files until usage is under MEDIA_MAX_BYTES.
+        Returns the evicted hashes.
+        """
+        total = self.disk_usage()
+        if total <= settings.media_max_bytes:
+            return []
+        victims = []
+        for sha256 in sorted(self._sizes, key=lambda sha: self._last_access.get(sha, 0)):
+            if total <= settings.media_max_bytes:
+                break
+            total -= self._sizes.pop(sha256)
+            self._last_access.pop(sha256, None)
+            self._touched.discard(sha256)
+            victims.append(sha256)
+        for key in [key for key, asset in self._index.items() if asset["sha256"] in victims]:
+            del self._index[key]
+        await asyncio.to_thread(self._delete, victims)
+        logger.info(f"Evicted {len(victims)} media files, {total} bytes in use")
+        return victims
+
+    def _delete(self, hashes: List[str]) -> None:
+        db = SessionLocal()
+        try:
+            db.query(MediaAsset).filter(MediaAsset.sha256.in_(hashes)).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        for sha256 in hashes:
+            try:
+                os.remove(self.path_for(sha256))
+            except FileNotFoundError:
+                pass
+
+    def _flush_access(self, touched: Dict[str, float]) -> None:
+        db = SessionLocal()
+        try:
+            for sha256, accessed in touched.items():
+                db.query(MediaAsset).filter_by(sha256=sha256).update({"last_access": int(accessed)})
+            db.commit()
+        finally:
+            db.close()
+
+    async def run(self) -> None:
+        """
+        Start downloads as clips are queued; persist LRU times once a minute.
+        """
+        last_flush = time.time()
+        while True:
+            try:
+                clip_id, kind, url = await asyncio.wait_for(self._queue.get(), ACCESS_FLUSH_INTERVAL)
+                job = asyncio.create_task(self._download(clip_id, kind, url))
+                self._jobs.add(job)
+                job.add_done_callback(self._jobs.discard)
+            except asyncio.TimeoutError:
+                pass
+            if self._touched and time.time() - last_flush >= ACCESS_FLUSH_INTERVAL:
+                touched = {sha: self._last_access[sha] for sha in self._touched if sha in self._last_access}
+                self._touched.clear()
+                last_flush = time.time()
+                try:
+                    await asyncio.to_thread(self._flush_access, touched)
+                except Exception as e:
+                    logger.error(f"Failed to persist media access times: {e}")
+
+    def start(self) -> None:
+        """
+        Load the index and start the downloader on the running event loop.
+        """
+        os.makedirs(os.path.join(settings.media_dir, "tmp"), exist_ok=True)
+        self._load()
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(settings.media_concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.media_timeout, connect=settings.http_connect_timeout),
+            limits=httpx.Limits(max_connections=settings.media_concurrency),
+            follow_redirects=True,
+            proxy=settings.proxy or None,
+        )
+        task_events.add_listener(self._on_task_event)
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        for job in [self._runner, *self._jobs]:
+            if job:
+                job.cancel()
+        for job in [self._runner, *self._jobs]:
+            if job:
+                try:
+                    await job
+                except asyncio.CancelledError:
+                    pass
+        if self._client:
+            await self._client.aclose()
+
+
+# Singleton instance
+media_store = MediaStore()
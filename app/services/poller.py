@@ -0,0 +1,289 @@
+"""
+Batched clip poller: tracks every in-flight MUSIC task and refreshes all of
+their clips with as few upstream feed calls as possible per tick.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import update
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.task import Task as TaskModel, TERMINAL_STATUSES
+from app.services.account import AccountService, account_pool
+from app.services.cache import cache_task
+from app.services.events import task_events
+from app.services.polling import aggregate_status, polling_policy
+from app.services.suno_service import SONG_DIGEST_FIELDS, payload_digest, suno_service
+from app.services.webhooks import add_delivery
+from app.utils.metrics import POLL_ITERATIONS, POLL_TICK
+
+
+class ClipPoller:
+    """
+    Keeps a set of in-flight MUSIC task ids and polls Suno for all of them at once.
+
+    Each tracked task's state lives in memory after its row is loaded once.
+    A tick only records tasks whose client-visible fields changed, and those
+    changes are written behind in one batched UPDATE every POLL_WRITE_INTERVAL
+    seconds, or immediately when a task reaches a terminal state.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # task_id -> {"started", "next_poll", "on_done", "task", "digest", "account", "callback_url"}
+        self._inflight: Dict[str, dict] = {}
+        # task_id -> latest serialized task not yet written to the database
+        self._pending: Dict[str, dict] = {}
+        self._last_flush = 0.0
+
+    def track(self, task_id: str, on_done: Optional[Callable[[str], None]] = None) -> None:
+        """
+        Start polling a task. on_done is called once the task leaves the poller.
+        """
+        now = time.time()
+        with self._lock:
+            self._inflight[task_id] = {"started": now, "next_poll": now, "on_done": on_done, "task": None, "polls": 0}
+
+    def inflight_count(self) -> int:
+        return len(self._inflight)
+
+    def status_counts(self) -> Dict[str, int]:
+        """
+        Tracked tasks by last known status (NOT_START until the row is loaded).
+        """
+        counts: Dict[str, int] = {}
+        for entry in list(self._inflight.values()):
+            status = entry["task"]["status"] if entry["task"] else "NOT_START"
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def _untrack(self, task_id: str) -> None:
+        with self._lock:
+            entry = self._inflight.pop(task_id, None)
+        if entry:
+            POLL_ITERATIONS.observe(entry["polls"], "MUSIC")
+        if entry and entry["on_done"]:
+            try:
+                entry["on_done"](task_id)
+            except Exception as e:
+                logger.error(f"on_done callback failed for task {task_id}: {e}")
+
+    @staticmethod
+    def _clip_ids(task: dict) -> List[str]:
+        if not isinstance(task["data"], list):
+            return []
+        return [clip["id"] for clip in task["data"] if isinstance(clip, dict) and clip.get("id")]
+
+    @staticmethod
+    def _load(entries: Dict[str, dict]) -> List[str]:
+        """
+        Load the rows of newly tracked tasks in one query. Returns ids not found.
+        """
+        db = SessionLocal()
+        try:
+            tasks = db.query(TaskModel).filter(TaskModel.task_id.in_(list(entries))).all()
+        finally:
+            db.close()
+        for task in tasks:
+            entry = entries[task.task_id]
+            entry["task"] = suno_service.serialize_task(task)
+            entry["digest"] = payload_digest(task.data, SONG_DIGEST_FIELDS)
+            entry["account"] = task.account
+            entry["callback_url"] = task.callback_url
+        return [task_id for task_id, entry in entries.items() if entry["task"] is None]
+
+    @staticmethod
+    def fetch_clips(clip_ids: List[str], account: AccountService) -> Dict[str, dict]:
+        """
+        Fetch clips owned by `account` from the Suno feed in chunks of POLL_BATCH_SIZE ids.
+        Chunks that fail are skipped and retried on the next tick.
+        """
+        clips: Dict[str, dict] = {}
+        size = max(1, settings.poll_batch_size)
+        for i in range(0, len(clip_ids), size):
+            chunk = clip_ids[i:i + size]
+            url = f"{settings.base_url}/api/feed/?ids={','.join(chunk)}"
+            try:
+                resp = account.request("GET", url)
+                data = resp.json()
+            except Exception as e:
+                logger.error(f"Error fetching clip feed ({len(chunk)} ids): {e}")
+                continue
+            # The feed returns a bare list; tolerate a {"clips": [...]} wrapper too
+            items = data.get("clips", []) if isinstance(data, dict) else data
+            for clip in items or []:
+                if isinstance(clip, dict) and clip.get("id"):
+                    clips[clip["id"]] = clip
+        return clips
+
+    @staticmethod
+    def fetch_task_clips(task_id: str, account: AccountService) -> Optional[List[dict]]:
+        """
+        Fallback for tasks whose clip ids are unknown: poll the task endpoint directly.
+        """
+        url = f"{settings.base_url}/api/clips/{task_id}"
+        try:
+            resp = account.request("GET", url)
+            return resp.json().get("clips", [])
+        except Exception as e:
+            logger.error(f"Error polling task {task_id}: {e}")
+            return None
+
+    def tick(self) -> None:
+        """
+        Run one polling round over every tracked task that is due, then flush
+        buffered changes if a task finished or the write interval elapsed.
+        """
+        now = time.time()
+        with self._lock:
+            snapshot = {tid: entry for tid, entry in self._inflight.items() if entry["next_poll"] <= now}
+        if snapshot:
+            with POLL_TICK.time():
+                self._poll(snapshot, now)
+        self.flush()
+
+    def _poll(self, snapshot: Dict[str, dict], now: float) -> None:
+        unloaded = {tid: entry for tid, entry in snapshot.items() if entry["task"] is None}
+        if unloaded:
+            try:
+                missing = self._load(unloaded)
+            except Exception as e:
+                logger.error(f"Error loading tasks for clip poller: {e}")
+                return
+            for task_id in missing:
+                logger.warning(f"Task {task_id} not found in database")
+                del snapshot[task_id]
+                self._untrack(task_id)
+
+        active: Dict[str, dict] = {}
+        for task_id, entry in snapshot.items():
+            task = entry["task"]
+            if task["status"] in TERMINAL_STATUSES:
+                # Finished already; waiting for its write to land
+                if task_id not in self._pending:
+                    self._untrack(task_id)
+            elif now - (task["submit_time"] or entry["started"]) > settings.poll_timeout:
+                logger.error(f"Polling timeout for song task {task_id}")
+                self._record(entry, dict(task, status="FAILURE", fail_reason="Polling timeout",
+                                         finish_time=int(now)))
+            else:
+                active[task_id] = entry
+
+        # One batched feed lookup per account for every known clip id
+        clip_ids_by_account: Dict[Optional[str], List[str]] = {}
+        for entry in active.values():
+            clip_ids_by_account.setdefault(entry["account"], []).extend(self._clip_ids(entry["task"]))
+        clips_by_id: Dict[str, dict] = {}
+        for name, clip_ids in clip_ids_by_account.items():
+            if clip_ids:
+                clips_by_id.update(self.fetch_clips(clip_ids, account_pool.get(name)))
+
+        for task_id, entry in active.items():
+            entry["polls"] += 1
+            age = now - (entry["task"]["submit_time"] or entry["started"])
+            ids = self._clip_ids(entry["task"])
+            if ids:
+                clips = [clips_by_id[cid] for cid in ids if cid in clips_by_id]
+                if len(clips) != len(ids):
+                    # Chunk failed or clips not visible yet; retry later
+                    clips = None
+            else:
+                clips = self.fetch_task_clips(task_id, account_pool.get(entry["account"]))
+            if clips is None:
+                entry["next_poll"] = now + polling_policy.next_interval("unknown", age)
+                continue
+            # Work on a copy so dicts already handed to the cache and subscribers never change
+            task = dict(entry["task"])
+            finished = suno_service.apply_song_clips(task, clips)
+            self._record(entry, task)
+            if finished:
+                continue
+            status = aggregate_status(clip.get("status") for clip in clips)
+            entry["next_poll"] = now + polling_policy.next_interval(status, age)
+
+    def _record(self, entry: dict, task: dict) -> None:
+        """
+        Buffer a task's new state, unless nothing a client can see has changed.
+        """
+        previous = entry["task"]
+        digest = payload_digest(task["data"], SONG_DIGEST_FIELDS)
+        if (
+            digest == entry["digest"]
+            and task["status"] == previous["status"]
+            and task["start_time"] == previous["start_time"]
+        ):
+            return
+        entry["task"] = task
+        entry["digest"] = digest
+        self._pending[task["task_id"]] = task
+
+    def flush(self, force: bool = False) -> None:
+        """
+        Write buffered task states in one transaction, together with webhook
+        deliveries for tasks that finished. Failed flushes are retried next tick.
+        """
+        if not self._pending:
+            return
+        pending = list(self._pending.values())
+        finished = [task for task in pending if task["status"] in TERMINAL_STATUSES]
+        if not (force or finished or time.time() - self._last_flush >= settings.poll_write_interval):
+            return
+
+        db = SessionLocal()
+        try:
+            db.execute(update(TaskModel), [
+                {
+                    "id": task["id"],
+                    "status": task["status"],
+                    "fail_reason": task["fail_reason"],
+                    "start_time": task["start_time"],
+                    "finish_time": task["finish_time"],
+                    "data": task["data"],
+                }
+                for task in pending
+            ])
+            for task in finished:
+                entry = self._inflight.get(task["task_id"])
+                add_delivery(db, task["task_id"], entry and entry["callback_url"], task)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error flushing {len(pending)} clip poller updates: {e}")
+            return
+        finally:
+            db.close()
+
+        self._last_flush = time.time()
+        for task in pending:
+            self._pending.pop(task["task_id"], None)
+            cache_task(task)
+            task_events.publish(task)
+        for task in finished:
+            self._untrack(task["task_id"])
+
+    def run(self) -> None:
+        """
+        Background loop: tick every POLL_MIN_INTERVAL seconds; each task is
+        only polled when its own interval from the polling policy is due.
+        """
+        while True:
+            started = time.time()
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Clip poller failed: {e}")
+            time.sleep(max(0.0, settings.poll_min_interval - (time.time() - started)))
+
+
+# Singleton instance
+clip_poller = ClipPoller()
+
+
+def start_clip_poller():
+    """
+    Start the background clip poller thread.
+    """
+    thread = threading.Thread(target=clip_poller.run, name="clip-poller", daemon=True)
+    thread.start()
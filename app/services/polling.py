@@ -0,0 +1,94 @@
+"""
+Polling policy: picks the next poll interval from the upstream status and the
+age of a task, with jitter and a cap, and keeps per-status interval stats.
+"""
+import random
+import threading
+import time
+from typing import Iterable
+
+from loguru import logger
+
+from app.config import settings
+
+# Upstream statuses from least to most advanced
+STATUS_ORDER = ("waiting", "submitted", "queued", "running", "streaming", "complete")
+
+
+def aggregate_status(statuses: Iterable[str]) -> str:
+    """
+    Collapse per-clip statuses into the most advanced one that is not complete,
+    so one streaming clip keeps the whole task on the fast path.
+    """
+    statuses = [s for s in statuses if s]
+    if not statuses:
+        return "waiting"
+    pending = [s for s in statuses if s != "complete"]
+    if not pending:
+        return "complete"
+    return max(pending, key=lambda s: STATUS_ORDER.index(s) if s in STATUS_ORDER else 0)
+
+
+def task_upstream_status(data) -> str:
+    """
+    Upstream status of a stored task payload: a clip list (MUSIC) or a
+    single lyrics dict (LYRICS).
+    """
+    if isinstance(data, list):
+        return aggregate_status(clip.get("status") for clip in data if isinstance(clip, dict))
+    if isinstance(data, dict):
+        return data.get("status") or "waiting"
+    return "waiting"
+
+
+class PollingPolicy:
+    """
+    Status- and age-aware poll intervals. Every task starts at the minimum
+    interval, since short generations finish within seconds; then:
+    - streaming/complete: stay at the minimum interval, results are imminent
+    - queued/running: ramp up to POLL_INTERVAL at POLL_BACKOFF_AGE, and beyond
+    - waiting/submitted/unknown: ramp up twice as fast
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # status -> [count, total_interval]
+        self._stats = {}
+        self._last_log = time.time()
+
+    def next_interval(self, status: str, age: float) -> float:
+        """
+        Seconds to wait before polling a task in `status` that is `age` seconds old.
+        """
+        base = settings.poll_min_interval
+        if status not in ("streaming", "complete"):
+            target = settings.poll_interval if status in ("queued", "running") else settings.poll_interval * 2
+            # Fresh tasks are polled quickly; long-queued ones less and less often
+            base += max(0.0, target - base) * max(0.0, age) / settings.poll_backoff_age
+        interval = min(base, settings.poll_max_interval)
+        interval *= 1 + random.uniform(-settings.poll_jitter, settings.poll_jitter)
+        interval = max(settings.poll_min_interval, interval)
+        self._record(status, interval)
+        return interval
+
+    def _record(self, status: str, interval: float) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(status, [0, 0.0])
+            entry[0] += 1
+            entry[1] += interval
+            if time.time() - self._last_log < settings.poll_stats_interval:
+                return
+            stats, self._stats = self._stats, {}
+            self._last_log = time.time()
+        summary = ", ".join(f"{s}: n={n} avg={total / n:.2f}s" for s, (n, total) in sorted(stats.items()))
+        logger.info(f"Poll intervals by status: {summary}")
+
+    def stats(self) -> dict:
+        """
+        Per-status interval counts and averages since the last log line.
+        """
+        with self._lock:
+            return {s: {"count": n, "avg_interval": total / n} for s, (n, total) in self._stats.items()}
+
+
+# Singleton instance
+polling_policy = PollingPolicy()
@@ -1,17 +1,78 @@
 """
 Core Suno API operations: submit tasks, fetch results, and loop polling.
 """
+import asyncio
+import base64
+import hashlib
+import json
 import time
 from loguru import logger
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import SessionLocal
-from app.models.task import Task as TaskModel
-from app.services.account import account_service
-from app.utils.http_client import do_request
+from app.database import AsyncSessionLocal, SessionLocal
+from app.models.task import Task as TaskModel, TERMINAL_STATUSES
+from app.services.account import account_pool
+from app.services.cache import cache_task, task_cache
+from app.services.events import task_events
+from app.services.media import media_store
+from app.services.polling import polling_policy
+from app.services.webhooks import add_delivery
+from app.utils.metrics import POLL_ITERATIONS
+
+
+# Fields that matter to clients; other upstream churn does not trigger a write
+SONG_DIGEST_FIELDS = (
+    "id", "status", "title", "model_name", "audio_url", "video_url",
+    "image_url", "image_large_url", "metadata",
+)
+LYRICS_DIGEST_FIELDS = ("id", "status", "title", "text")
+
+
+def payload_digest(data, fields) -> str:
+    """
+    Stable digest of the client-relevant fields of a clip list or lyrics payload.
+    """
+    items = data if isinstance(data, list) else [data]
+    relevant = [
+        {field: item.get(field) for field in fields} if isinstance(item, dict) else item
+        for item in items
+    ]
+    encoded = json.dumps(relevant, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def encode_cursor(submit_time: int, row_id: int) -> str:
+    """
+    Opaque keyset cursor for the last row of a task listing page.
+    """
+    return base64.urlsafe_b64encode(f"{submit_time}:{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Inverse of encode_cursor. Raises ValueError on malformed cursors.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        submit_time, row_id = raw.split(":", 1)
+        return int(submit_time), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+# Lyrics task id -> last known status, for tasks currently polled by loop_fetch_lyrics
+lyrics_inflight: Dict[str, str] = {}
+
+
+# Columns returned by list_tasks; "data" is only loaded on request
+LIST_COLUMNS = (
+    "id", "task_id", "action", "status", "fail_reason",
+    "submit_time", "start_time", "finish_time", "search_item",
+)
 
 
 class SunoService:
@@ -19,280 +80,348 @@ class SunoService:
     Service for submitting and polling Suno tasks.
     """
     @staticmethod
-    def submit_song(params: dict) -> str:
+    async def submit_song(params: dict) -> str:
+        # Import here to avoid circular import at module load
+        from app.services.tasks import add_task, ensure_capacity
+        # Reject early instead of spending credits on a task we cannot poll
+        ensure_capacity()
+        # Not part of the upstream request
+        callback_url = params.pop("callback_url", None)
         # Build request
         url = f"{settings.base_url}/api/generate/v2/"
         # Ensure mv parameter
         if not params.get("mv"):
             params["mv"] = "chirp-v3-0"
-        # Send request
-        resp = do_request("POST", url, json=params)
-        data = resp.json()
-        # Check status
-        if data.get("status") != "complete":
-            raise RuntimeError(f"generateSong failed: {data}")
-        # Prepare task entry
-        task_id = data.get("id") or data.get("batch_id") or str(int(time.time() * 1000))
-        songs = data.get("clips", [])
-
-        # Persist task
-        db: Session = SessionLocal()
+        # Send request with the least-loaded account; its slot is given back on any failure
+        account = account_pool.acquire()
         try:
-            task = TaskModel(
+            resp = await account.request_async("POST", url, json=params)
+            data = resp.json()
+            # Check status
+            if data.get("status") != "complete":
+                raise RuntimeError(f"generateSong failed: {data}")
+            # Prepare task entry
+            task_id = data.get("id") or data.get("batch_id") or str(int(time.time() * 1000))
+            songs = data.get("clips", [])
+
+            # Persist task
+            await SunoService._insert_task(TaskModel(
                 task_id=task_id,
                 action="MUSIC",
                 status="NOT_START",
                 submit_time=int(time.time()),
                 data=songs,
-            )
-            db.add(task)
-            db.commit()
-        finally:
-            db.close()
-        # Enqueue for background polling
-        # Import here to avoid circular import at module load
-        from app.services.tasks import add_task
-        add_task(task_id, "MUSIC")
+                callback_url=callback_url,
+                account=account.name,
+            ))
+        except BaseException:
+            account_pool.release(account)
+            raise
+        account_pool.assign(task_id, account)
+        # Credits are spent: poll it even if the queue filled up since ensure_capacity()
+        add_task(task_id, "MUSIC", force=True)
         return task_id
 
     @staticmethod
-    def submit_lyrics(params: dict) -> str:
+    async def submit_lyrics(params: dict) -> str:
+        """
+        Submit a lyrics generation and return its id right away; the
+        background task pipeline polls it to completion.
+        """
+        from app.services.tasks import add_task, ensure_capacity
+        ensure_capacity()
+        callback_url = params.pop("callback_url", None)
         # Submit lyrics generation
         url = f"{settings.base_url}/api/generate/lyrics/"
-        resp = do_request("POST", url, json=params)
-        data = resp.json()
-        lyric_id = data.get("id")
-        if not lyric_id:
-            raise RuntimeError(f"generateLyrics failed: {data}")
-
-        # Poll until complete or timeout
-        start = time.time()
-        status = None
-        text = None
-        while True:
-            if time.time() - start > settings.chat_timeout:
-                raise RuntimeError("lyrics generation timeout")
-            poll_url = f"{settings.base_url}/api/generate/lyrics/{lyric_id}"
-            poll_resp = do_request("GET", poll_url)
-            info = poll_resp.json()
-            status = info.get("status")
-            text = info.get("text")
-            if status == "complete" or text:
-                break
-            time.sleep(5)
-
-        # Persist task
-        db: Session = SessionLocal()
+        account = account_pool.acquire()
         try:
-            task = TaskModel(
+            resp = await account.request_async("POST", url, json=params)
+            data = resp.json()
+            lyric_id = data.get("id")
+            if not lyric_id:
+                raise RuntimeError(f"generateLyrics failed: {data}")
+
+            # Persist task
+            await SunoService._insert_task(TaskModel(
                 task_id=lyric_id,
                 action="LYRICS",
-                status="SUCCESS",
-                submit_time=int(start),
-                start_time=int(start),
-                finish_time=int(time.time()),
-                data={"id": lyric_id, "status": status, "text": text},
-            )
-            db.add(task)
-            db.commit()
-        finally:
-            db.close()
+                status="NOT_START",
+                submit_time=int(time.time()),
+                data=data,
+                callback_url=callback_url,
+                account=account.name,
+            ))
+        except BaseException:
+            account_pool.release(account)
+            raise
+        account_pool.assign(lyric_id, account)
+        # Credits are spent: poll it even if the queue filled up since ensure_capacity()
+        add_task(lyric_id, "LYRICS", force=True)
         return lyric_id
 
     @staticmethod
-    def fetch_by_id(task_id: str) -> dict:
-        db: Session = SessionLocal()
-        try:
-            task = db.query(TaskModel).filter_by(task_id=task_id).first()
+    async def watch_task(task_id: str, timeout: float) -> AsyncIterator[dict]:
+        """
+        Yield the current task state, then every published update, until the
+        task is terminal or the timeout expires. Idle watchers only wake up for
+        a STREAM_RECHECK_INTERVAL database read, which also covers updates
+        committed by another process.
+        """
+        start = time.time()
+        async with task_events.subscribe(task_id) as events:
+            # Read after subscribing so an update between the two is not lost
+            task = await SunoService.fetch_by_id(task_id)
+            yield task
+            while task["status"] not in TERMINAL_STATUSES:
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    return
+                try:
+                    task = await events.get(min(remaining, settings.stream_recheck_interval))
+                except asyncio.TimeoutError:
+                    latest = await SunoService.fetch_by_id(task_id)
+                    if latest == task:
+                        continue
+                    task = latest
+                yield task
+
+    @staticmethod
+    async def wait_for_task(task_id: str, timeout: float) -> dict:
+        """
+        Await a task reaching a terminal state without blocking the event loop.
+        Returns the latest task state once it is terminal or the timeout expires.
+        """
+        task = None
+        async for task in SunoService.watch_task(task_id, timeout):
+            pass
+        return task
+
+    @staticmethod
+    def serialize_task(task: TaskModel) -> dict:
+        """
+        Return a clean dictionary instead of __dict__.
+        """
+        return {
+            "id": task.id,
+            "task_id": task.task_id,
+            "action": task.action,
+            "status": task.status,
+            "fail_reason": task.fail_reason,
+            "submit_time": task.submit_time,
+            "start_time": task.start_time,
+            "finish_time": task.finish_time,
+            "search_item": task.search_item,
+            "data": task.data,
+        }
+
+    @staticmethod
+    async def fetch_by_id(task_id: str) -> dict:
+        cached = task_cache.get(task_id)
+        if cached is not None:
+            return media_store.localize(dict(cached))
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(TaskModel).filter_by(task_id=task_id))
+            task = result.scalars().first()
             if not task:
                 raise KeyError(f"Task {task_id} not found")
-            # Return a clean dictionary instead of __dict__
-            return {
-                "id": task.id,
-                "task_id": task.task_id,
-                "action": task.action,
-                "status": task.status,
-                "fail_reason": task.fail_reason,
-                "submit_time": task.submit_time,
-                "start_time": task.start_time,
-                "finish_time": task.finish_time,
-                "search_item": task.search_item,
-                "data": task.data,
-            }
-        finally:
-            db.close()
+            result = SunoService.serialize_task(task)
+        cache_task(result)
+        return media_store.localize(dict(result))
 
     @staticmethod
-    def fetch_tasks(ids: List[str], action: str) -> List[dict]:
-        db: Session = SessionLocal()
-        try:
-            q = db.query(TaskModel).filter(TaskModel.task_id.in_(ids))
-            if action:
-                q = q.filter_by(action=action)
-            tasks = q.all()
-            # Return clean dictionaries
-            return [
-                {
-                    "id": t.id,
-                    "task_id": t.task_id,
-                    "action": t.action,
-                    "status": t.status,
-                    "fail_reason": t.fail_reason,
-                    "submit_time": t.submit_time,
-                    "start_time": t.start_time,
-                    "finish_time": t.finish_time,
-                    "search_item": t.search_item,
-                    "data": t.data,
-                }
-                for t in tasks
-            ]
-        finally:
-            db.close()
+    async def fetch_tasks(ids: List[str], action: str) -> List[dict]:
+        found = {}
+        missing = []
+        for task_id in ids:
+            cached = task_cache.get(task_id)
+            if cached is None:
+                missing.append(task_id)
+            else:
+                found[task_id] = cached
+        if missing:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(TaskModel).filter(TaskModel.task_id.in_(missing)))
+                for t in result.scalars():
+                    found[t.task_id] = SunoService.serialize_task(t)
+            for task_id in missing:
+                if task_id in found:
+                    cache_task(found[task_id])
+        # Keep the caller's order and apply the action filter on the merged result
+        return [
+            media_store.localize(dict(found[task_id]))
+            for task_id in dict.fromkeys(ids)
+            if task_id in found and (not action or found[task_id]["action"] == action)
+        ]
+
+    @staticmethod
+    async def list_tasks(
+        action: Optional[str] = None,
+        statuses: Optional[List[str]] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        include_data: bool = False,
+    ) -> dict:
+        """
+        List tasks newest first with keyset pagination over (submit_time, id).
+        Only the listed columns are selected, plus data when include_data is set.
+        Returns {"items": [...], "next_cursor": str or None}.
+        """
+        names = LIST_COLUMNS + ("data",) if include_data else LIST_COLUMNS
+        query = select(*(getattr(TaskModel, name) for name in names))
+        if action:
+            query = query.where(TaskModel.action == action)
+        if statuses:
+            query = query.where(TaskModel.status.in_(statuses))
+        if since is not None:
+            query = query.where(TaskModel.submit_time >= since)
+        if until is not None:
+            query = query.where(TaskModel.submit_time < until)
+        if cursor:
+            last_time, last_id = decode_cursor(cursor)
+            query = query.where(or_(
+                TaskModel.submit_time < last_time,
+                and_(TaskModel.submit_time == last_time, TaskModel.id < last_id),
+            ))
+        # Fetch one extra row to know whether another page exists
+        query = query.order_by(TaskModel.submit_time.desc(), TaskModel.id.desc()).limit(limit + 1)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query)).all()
+        items = [dict(row._mapping) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["submit_time"] or 0, last["id"])
+        return {"items": items, "next_cursor": next_cursor}
 
     @staticmethod
     def get_account_info() -> dict:
-        return account_service.get_account_info()
+        return account_pool.get_account_info()
     
-    def loop_fetch_song(self, task_id: str) -> None:
+    @staticmethod
+    def apply_song_clips(task: dict, clips: List[dict]) -> bool:
         """
-        Poll the task record by querying Suno API until it reaches a terminal state.
+        Update a serialized MUSIC task in place from the latest clip list
+        returned by Suno. Returns True when the task reached a terminal state.
         """
-        db = SessionLocal()
-        # start time for polling timeout
-        start_poll = time.time()
-        while True:
-            try:
-                # timeout to avoid infinite polling
-                if time.time() - start_poll > settings.poll_timeout:
-                    logger.error(f"Polling timeout for song task {task_id}")
-                    # mark task as failure due to timeout
-                    task = db.query(TaskModel).filter_by(task_id=task_id).first()
-                    if task:
-                        task.status = "FAILURE"
-                        task.fail_reason = "Polling timeout"
-                        task.finish_time = int(time.time())
-                        db.commit()
-                    break
-                # Get task from database
-                task = db.query(TaskModel).filter_by(task_id=task_id).first()
-                if not task:
-                    logger.warning(f"Task {task_id} not found in database")
-                    break
-
-                # Poll Suno API for updates
-                url = f"{settings.base_url}/api/clips/{task_id}"
-                try:
-                    resp = do_request("GET", url)
-                    data = resp.json()
-                    clips = data.get("clips", [])
+        now = int(time.time())
+        if clips and all(clip.get("status") == "complete" for clip in clips):
+            task.update(status="SUCCESS", data=clips, finish_time=now)
+            return True
+        if any(clip.get("status") == "error" for clip in clips):
+            task.update(status="FAILURE", fail_reason="Suno API reported error", data=clips, finish_time=now)
+            return True
+        if not task["start_time"] and any(clip.get("status") != "waiting" for clip in clips):
+            # First time seeing activity
+            task.update(status="PROCESSING", start_time=now)
+        # Update data even while in progress
+        task["data"] = clips
+        return False
 
-                    # Update task status based on API response
-                    if clips and all(clip.get("status") == "complete" for clip in clips):
-                        task.status = "SUCCESS"
-                        task.data = clips
-                        task.finish_time = int(time.time())
-                        db.commit()
-                        break
-                    elif any(clip.get("status") == "error" for clip in clips):
-                        task.status = "FAILURE"
-                        task.fail_reason = "Suno API reported error"
-                        task.data = clips
-                        db.commit()
-                        break
-                    elif not task.start_time and any(clip.get("status") != "waiting" for clip in clips):
-                        # First time seeing activity
-                        task.status = "PROCESSING"
-                        task.start_time = int(time.time())
-                        db.commit()
-
-                    # Update data even while in progress
-                    task.data = clips
-                    db.commit()
-                except Exception as e:
-                    logger.error(f"Error polling task {task_id}: {e}")
-                    # Continue polling
-
-                # Check terminal status
-                if task.status in ("SUCCESS", "FAILURE", "UNKNOWN"):
-                    break
+    @staticmethod
+    async def _insert_task(task: TaskModel) -> None:
+        """
+        Persist a newly submitted task on the async engine, then write it
+        through to the cache and notify watchers.
+        """
+        async with AsyncSessionLocal() as db:
+            db.add(task)
+            await db.flush()
+            result = SunoService.serialize_task(task)
+            await db.commit()
+        cache_task(result)
+        task_events.publish(result)
 
-                # Wait before next poll
-                time.sleep(5)
-            except Exception as e:
-                logger.error(f"Error in loop_fetch_song for {task_id}: {e}")
-                time.sleep(5)
-        db.close()
+    @staticmethod
+    def _commit_task(db: Session, task: TaskModel) -> None:
+        """
+        Commit pending changes to a task (staging its webhook if it just
+        finished), write the new state through to the cache and publish it
+        to watchers.
+        """
+        result = SunoService.serialize_task(task)
+        if result["status"] in TERMINAL_STATUSES:
+            add_delivery(db, task.task_id, task.callback_url, result)
+        db.commit()
+        cache_task(result)
+        task_events.publish(result)
 
     def loop_fetch_lyrics(self, task_id: str) -> None:
         """
         Poll the lyrics task record by querying Suno API until it reaches a terminal state.
+        The row is loaded once and only written when the lyrics or status change.
         """
-        db = SessionLocal()
-        # start time for polling timeout
-        start_poll = time.time()
-        while True:
-            try:
+        # Keep the loaded row usable across commits instead of re-querying every tick
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            task = db.query(TaskModel).filter_by(task_id=task_id).first()
+            if not task:
+                logger.warning(f"Lyrics task {task_id} not found in database")
+                return
+            # start time for polling timeout; resumed tasks keep their original window
+            start_poll = task.submit_time or time.time()
+            digest = payload_digest(task.data, LYRICS_DIGEST_FIELDS)
+            status = None
+            polls = 0
+            while task.status not in TERMINAL_STATUSES:
+                lyrics_inflight[task_id] = task.status
                 # timeout to avoid infinite polling
                 if time.time() - start_poll > settings.poll_timeout:
                     logger.error(f"Polling timeout for lyrics task {task_id}")
-                    # mark task as failure due to timeout
-                    task = db.query(TaskModel).filter_by(task_id=task_id).first()
-                    if task:
-                        task.status = "FAILURE"
-                        task.fail_reason = "Polling timeout"
-                        task.finish_time = int(time.time())
-                        db.commit()
-                    break
-                # Get task from database
-                task = db.query(TaskModel).filter_by(task_id=task_id).first()
-                if not task:
-                    logger.warning(f"Lyrics task {task_id} not found in database")
+                    task.status = "FAILURE"
+                    task.fail_reason = "Polling timeout"
+                    task.finish_time = int(time.time())
+                    self._commit_task(db, task)
                     break
 
                 # Poll Suno API for updates
                 url = f"{settings.base_url}/api/generate/lyrics/{task_id}"
+                polls += 1
                 try:
-                    resp = do_request("GET", url)
+                    resp = account_pool.get(task.account).request("GET", url)
                     data = resp.json()
                     status = data.get("status")
-                    text = data.get("text")
+                    new_digest = payload_digest(data, LYRICS_DIGEST_FIELDS)
+                    changed = new_digest != digest
 
                     # Update task status based on API response
-                    if status == "complete" or text:
+                    now = int(time.time())
+                    if status == "complete" or data.get("text"):
                         task.status = "SUCCESS"
-                        task.data = data
-                        task.finish_time = int(time.time())
-                        db.commit()
-                        break
+                        task.finish_time = now
+                        changed = True
                     elif status == "error":
                         task.status = "FAILURE"
                         task.fail_reason = data.get("fail_reason") or "Suno API reported error"
-                        task.data = data
-                        db.commit()
-                        break
+                        task.finish_time = now
+                        changed = True
                     elif not task.start_time and status != "waiting":
                         # First time seeing activity
                         task.status = "PROCESSING"
-                        task.start_time = int(time.time())
-                        db.commit()
+                        task.start_time = now
+                        changed = True
 
-                    # Update data even while in progress
-                    task.data = data
-                    db.commit()
+                    # One write per actual change
+                    if changed:
+                        task.data = data
+                        self._commit_task(db, task)
+                        digest = new_digest
                 except Exception as e:
+                    db.rollback()
                     logger.error(f"Error polling lyrics task {task_id}: {e}")
                     # Continue polling
 
-                # Check terminal status
-                if task.status in ("SUCCESS", "FAILURE", "UNKNOWN"):
+                if task.status in TERMINAL_STATUSES:
                     break
-
                 # Wait before next poll
-                time.sleep(5)
-            except Exception as e:
-                logger.error(f"Error in loop_fetch_lyrics for {task_id}: {e}")
-                time.sleep(5)
-        db.close()
+                time.sleep(polling_policy.next_interval(status or "waiting", time.time() - start_poll))
+            POLL_ITERATIONS.observe(polls, "LYRICS")
+        except Exception as e:
+            logger.error(f"Error in loop_fetch_lyrics for {task_id}: {e}")
+        finally:
+            lyrics_inflight.pop(task_id, None)
+            db.close()
 
 
 # Singleton instance
@@ -1,47 +1,281 @@
 """
-Task queue and background worker for processing Suno tasks.
+Task queue and background worker pool for processing Suno tasks.
 """
+import math
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
-from queue import Queue
+from queue import Queue, Full
 
 from app.database import SessionLocal
-from app.models.task import Task as TaskModel
-from app.services.suno_service import suno_service
+from app.models.task import Task as TaskModel, TERMINAL_STATUSES
+from app.services.suno_service import lyrics_inflight, suno_service
+from app.services.poller import clip_poller, start_clip_poller
+from app.services.webhooks import add_delivery
+from app.services.account import account_pool
 from app.config import settings
+from app.utils.metrics import QUEUE_DEPTH, QUEUE_WAIT, TASKS_INFLIGHT
 
-# Queue for task processing
-task_queue = Queue(maxsize=100)
+# Queue for task processing: items are (task_id, action, enqueued_at)
+task_queue = Queue(maxsize=settings.task_queue_size)
 
-def add_task(task_id: str, action: str):
+# Per-action concurrency limits; a slot is held until the task is finished
+action_slots = {
+    "MUSIC": threading.BoundedSemaphore(settings.task_concurrency_music),
+    "LYRICS": threading.BoundedSemaphore(settings.task_concurrency_lyrics),
+}
+
+# Queue wait statistics (seconds between enqueue and dispatch)
+_stats_lock = threading.Lock()
+_stats = {"enqueued": 0, "dispatched": 0, "rejected": 0, "wait_total": 0.0, "wait_max": 0.0, "last_wait": 0.0}
+_inflight = {action: 0 for action in action_slots}
+
+# Tasks taken off the queue while their action had no free slot: (task_id, enqueued_at).
+# Workers park them instead of blocking, so one saturated action never stalls the others.
+_parked = {action: deque() for action in action_slots}
+_parked_lock = threading.Lock()
+
+# Lyrics are polled synchronously, so they run on their own threads rather than on the workers
+_lyrics_pool = ThreadPoolExecutor(max_workers=max(1, settings.task_concurrency_lyrics), thread_name_prefix="lyrics")
+
+
+def backlog() -> int:
+    """
+    Tasks accepted but not yet dispatched: queued plus parked.
+    """
+    with _parked_lock:
+        parked = sum(len(items) for items in _parked.values())
+    return task_queue.qsize() + parked
+
+
+def _inflight_by_status() -> dict:
+    counts = {("MUSIC", status): n for status, n in clip_poller.status_counts().items()}
+    for status in list(lyrics_inflight.values()):
+        counts[("LYRICS", status)] = counts.get(("LYRICS", status), 0) + 1
+    return counts
+
+
+QUEUE_DEPTH.set_function(backlog)
+TASKS_INFLIGHT.set_function(_inflight_by_status)
+
+
+class TaskQueueFull(RuntimeError):
     """
-    Add a task to the processing queue.
+    Raised when the task queue cannot accept more work.
     """
-    task_queue.put((task_id, action))
+    def __init__(self, retry_after: int):
+        super().__init__(f"Task queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def retry_after_hint() -> int:
+    """
+    Seconds a client should wait before resubmitting, based on observed queue wait.
+    """
+    with _stats_lock:
+        avg_wait = _stats["wait_total"] / _stats["dispatched"] if _stats["dispatched"] else 0.0
+    return max(settings.queue_retry_after, math.ceil(avg_wait))
+
+
+def ensure_capacity() -> None:
+    """
+    Fail fast before doing upstream work if the queue is already full.
+    """
+    if backlog() >= task_queue.maxsize:
+        with _stats_lock:
+            _stats["rejected"] += 1
+        raise TaskQueueFull(retry_after_hint())
+
+
+def add_task(task_id: str, action: str, force: bool = False):
+    """
+    Add a task to the processing queue without blocking.
+    Raises TaskQueueFull when the queue is at capacity, unless force is set:
+    then the task is parked for dispatch directly. Use force for tasks that
+    already exist upstream, which must be polled no matter what.
+    """
+    try:
+        if backlog() >= task_queue.maxsize:
+            raise Full
+        task_queue.put_nowait((task_id, action, time.time()))
+    except Full:
+        if not force:
+            with _stats_lock:
+                _stats["rejected"] += 1
+            raise TaskQueueFull(retry_after_hint())
+        logger.warning(f"Task queue full, dispatching {action} task {task_id} directly")
+        _park(task_id, action, time.time())
+    with _stats_lock:
+        _stats["enqueued"] += 1
+
+
+def queue_stats() -> dict:
+    """
+    Snapshot of queue depth, wait times and per-action in-flight counts.
+    """
+    with _stats_lock:
+        dispatched = _stats["dispatched"]
+        return {
+            "depth": task_queue.qsize(),
+            "parked": {action: len(items) for action, items in _parked.items()},
+            "capacity": task_queue.maxsize,
+            "workers": settings.task_workers,
+            "enqueued": _stats["enqueued"],
+            "dispatched": dispatched,
+            "rejected": _stats["rejected"],
+            "wait_avg": _stats["wait_total"] / dispatched if dispatched else 0.0,
+            "wait_max": _stats["wait_max"],
+            "wait_last": _stats["last_wait"],
+            "inflight": dict(_inflight),
+            "limits": {
+                "MUSIC": settings.task_concurrency_music,
+                "LYRICS": settings.task_concurrency_lyrics,
+            },
+        }
+
+
+def _release(action: str) -> None:
+    with _stats_lock:
+        _inflight[action] -= 1
+    action_slots[action].release()
+    _drain(action)
+
+
+def _record_dispatch(action: str, enqueued_at: float) -> None:
+    wait = time.time() - enqueued_at
+    QUEUE_WAIT.observe(wait, action)
+    with _stats_lock:
+        _stats["dispatched"] += 1
+        _stats["wait_total"] += wait
+        _stats["wait_max"] = max(_stats["wait_max"], wait)
+        _stats["last_wait"] = wait
+        _inflight[action] += 1
+
+
+def _run_lyrics(task_id: str) -> None:
+    try:
+        suno_service.loop_fetch_lyrics(task_id)
+    except Exception as e:
+        logger.error(f"Error processing task {task_id} (LYRICS): {e}")
+    finally:
+        _release("LYRICS")
+
+
+def _start(task_id: str, action: str, enqueued_at: float) -> None:
+    """
+    Run a task whose action slot is already held; the slot is released when it finishes.
+    """
+    _record_dispatch(action, enqueued_at)
+    try:
+        if action == "MUSIC":
+            # Hand off to the batched poller
+            clip_poller.track(task_id, on_done=lambda _tid: _release("MUSIC"))
+        else:
+            _lyrics_pool.submit(_run_lyrics, task_id)
+    except Exception as e:
+        logger.error(f"Error processing task {task_id} ({action}): {e}")
+        _release(action)
+
+
+def _drain(action: str) -> None:
+    """
+    Start parked tasks of an action, oldest first, while it has free slots.
+    """
+    while True:
+        with _parked_lock:
+            if not _parked[action] or not action_slots[action].acquire(blocking=False):
+                return
+            task_id, enqueued_at = _parked[action].popleft()
+        _start(task_id, action, enqueued_at)
+
+
+def _park(task_id: str, action: str, enqueued_at: float) -> None:
+    with _parked_lock:
+        _parked[action].append((task_id, enqueued_at))
+    _drain(action)
+
 
 def task_worker():
     """
-    Background worker that processes tasks from the queue.
+    Background worker that moves tasks from the queue to their action's
+    slots. It never waits for a slot: tasks of a saturated action are parked
+    and started as soon as one of its running tasks finishes.
     """
     while True:
-        task_id, action = task_queue.get()
+        task_id, action, enqueued_at = task_queue.get()
         try:
-            if action == "MUSIC":
-                suno_service.loop_fetch_song(task_id)
-            elif action == "LYRICS":
-                # Lyrics tasks fetch logic can be similar to song polling
-                suno_service.loop_fetch_lyrics(task_id)
-            else:
+            if action not in action_slots:
                 logger.warning(f"Unknown task action: {action}")
+                continue
+            _park(task_id, action, enqueued_at)
         except Exception as e:
             logger.error(f"Error processing task {task_id} ({action}): {e}")
         finally:
             task_queue.task_done()
 
+
+def recover_tasks() -> None:
+    """
+    Resume non-terminal tasks left over from a previous process.
+    Tasks still inside the poll window are re-enqueued; older ones are
+    marked as failed in a single bulk update.
+    """
+    now = int(time.time())
+    cutoff = now - settings.poll_timeout
+    db = SessionLocal()
+    try:
+        pending_filter = TaskModel.status.notin_(TERMINAL_STATUSES)
+        # Stale tasks with a callback still get their FAILURE webhook
+        for task in (
+            db.query(TaskModel)
+            .filter(pending_filter, TaskModel.submit_time < cutoff, TaskModel.callback_url.isnot(None))
+            .all()
+        ):
+            payload = suno_service.serialize_task(task)
+            payload.update(status="FAILURE", fail_reason="Polling interrupted by restart", finish_time=now)
+            add_delivery(db, task.task_id, task.callback_url, payload)
+        stale = (
+            db.query(TaskModel)
+            .filter(pending_filter, TaskModel.submit_time < cutoff)
+            .update(
+                {
+                    TaskModel.status: "FAILURE",
+                    TaskModel.fail_reason: "Polling interrupted by restart",
+                    TaskModel.finish_time: now,
+                },
+                synchronize_session=False,
+            )
+        )
+        pending = (
+            db.query(TaskModel.task_id, TaskModel.action, TaskModel.account)
+            .filter(pending_filter, TaskModel.submit_time >= cutoff)
+            .order_by(TaskModel.submit_time)
+            .all()
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    # Blocking put is fine here: this runs in its own thread while workers drain the queue
+    for task_id, action, account in pending:
+        account_pool.track(task_id, account)
+        task_queue.put((task_id, action, time.time()))
+        with _stats_lock:
+            _stats["enqueued"] += 1
+    if stale or pending:
+        logger.info(f"Task recovery: resumed {len(pending)} task(s), failed {stale} stale task(s)")
+
+
 def start_task_worker():
     """
-    Start the background task worker thread.
+    Start the background task worker pool and the clip poller, then resume
+    any tasks interrupted by the previous shutdown.
     """
-    thread = threading.Thread(target=task_worker, daemon=True)
-    thread.start()
\ No newline at end of file
+    start_clip_poller()
+    for i in range(max(1, settings.task_workers)):
+        thread = threading.Thread(target=task_worker, name=f"task-worker-{i}", daemon=True)
+        thread.start()
+    thread = threading.Thread(target=recover_tasks, name="task-recovery", daemon=True)
+    thread.start()
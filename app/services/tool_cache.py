@@ -0,0 +1,127 @@
+"""
+Cache of chat tool-call extractions: a conversation's generate_song_custom
+arguments, keyed by a hash of model, messages and function specs.
+
+Integrations that resend the same prompt skip the OpenAI round trip. Entries
+live in a TTLCache and, with TOOL_CACHE_DB=true, in the tool_calls table so
+they survive restarts and are shared by workers. Hit rate and the LLM time
+saved are logged every TOOL_CACHE_STATS_INTERVAL seconds.
+"""
+import copy
+import hashlib
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.tool_call import ToolCall
+from app.services.cache import TTLCache
+from app.utils.metrics import TOOL_CACHE_LOOKUPS
+
+
+def tool_call_key(model: str, messages: list, functions: list) -> str:
+    encoded = json.dumps([model, messages, functions], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ToolCallCache:
+    """
+    key -> (params, LLM latency in seconds), in memory and optionally in the database.
+    """
+    def __init__(self):
+        self._cache = TTLCache(settings.tool_cache_size, settings.tool_cache_ttl)
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._last_log = time.monotonic()
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    @staticmethod
+    async def _load(key: str) -> Optional[tuple]:
+        async with AsyncSessionLocal() as db:
+            row = await db.get(ToolCall, key)
+            if row is None or row.expires_at <= time.time():
+                return None
+            return row.params, (row.latency_ms or 0) / 1000, row.expires_at
+
+    @staticmethod
+    async def _save(key: str, params: dict, latency: float) -> None:
+        now = int(time.time())
+        async with AsyncSessionLocal() as db:
+            await db.merge(ToolCall(
+                key=key, params=params, latency_ms=int(latency * 1000),
+                created_at=now, expires_at=int(now + settings.tool_cache_ttl),
+            ))
+            await db.commit()
+
+    async def _lookup(self, key: str) -> Optional[tuple]:
+        entry = self._cache.get(key)
+        if entry is None and settings.tool_cache_db:
+            row = await self._load(key)
+            if row is not None:
+                params, latency, expires_at = row
+                entry = (params, latency)
+                self._cache.set(key, entry, ttl=expires_at - time.time())
+        return entry
+
+    async def get_or_extract(self, model: str, messages: list, functions: list,
+                             extract: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Cached params for the conversation, or extract() them and cache the result.
+        Returns a copy the caller may modify. Errors from extract() are not cached.
+        """
+        if settings.tool_cache_ttl <= 0:
+            return await extract()
+        key = tool_call_key(model, messages, functions)
+        entry = await self._lookup(key)
+        if entry is not None:
+            params, latency = entry
+            self.hits += 1
+            self.saved_seconds += latency
+            TOOL_CACHE_LOOKUPS.inc("hit")
+            self._maybe_log()
+            return copy.deepcopy(params)
+
+        started = time.perf_counter()
+        params = await extract()
+        latency = time.perf_counter() - started
+        self.misses += 1
+        TOOL_CACHE_LOOKUPS.inc("miss")
+        self._cache.set(key, (copy.deepcopy(params), latency))
+        if settings.tool_cache_db:
+            try:
+                await self._save(key, params, latency)
+            except Exception as e:
+                logger.warning(f"Failed to persist tool-call cache entry: {e}")
+        self._maybe_log()
+        return params
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": self._cache.stats()["size"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+    def _maybe_log(self) -> None:
+        now = time.monotonic()
+        if now - self._last_log < settings.tool_cache_stats_interval:
+            return
+        self._last_log = now
+        stats = self.stats()
+        logger.info(
+            f"Tool-call cache: {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%}), {stats['saved_seconds']:.1f}s of LLM time saved"
+        )
+
+
+# Singleton instance
+tool_call_cache = ToolCallCache()
@@ -0,0 +1,211 @@
+"""
+Webhook delivery: when a task with a callback_url reaches a terminal state,
+its final payload is POSTed to that URL.
+
+Deliveries are written to the webhook_deliveries table in the same
+transaction that finishes the task (so they survive restarts), then sent by
+an asyncio dispatcher with bounded concurrency, HMAC signing and
+exponential-backoff retries.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import time
+from typing import Optional
+
+import httpx
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.task import TERMINAL_STATUSES
+from app.models.webhook import WebhookDelivery
+from app.services.events import task_events
+
+
+def add_delivery(db: Session, task_id: str, callback_url: Optional[str], payload: dict) -> None:
+    """
+    Stage a delivery for a finished task in the caller's transaction.
+    No-op when the task has no callback_url.
+    """
+    if not callback_url:
+        return
+    now = int(time.time())
+    db.add(WebhookDelivery(
+        task_id=task_id,
+        url=callback_url,
+        payload=payload,
+        status="PENDING",
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    ))
+
+
+def sign_payload(body: bytes, timestamp: int) -> str:
+    """
+    HMAC-SHA256 over "<timestamp>.<body>" with WEBHOOK_SECRET.
+    """
+    message = f"{timestamp}.".encode() + body
+    return hmac.new(settings.webhook_secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def backoff_delay(attempts: int) -> float:
+    """
+    Exponential backoff with +/-20% jitter, capped at WEBHOOK_BACKOFF_MAX.
+    """
+    delay = min(settings.webhook_backoff_base * (2 ** max(0, attempts - 1)), settings.webhook_backoff_max)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class WebhookDispatcher:
+    """
+    Background sender for pending webhook deliveries.
+    """
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _on_task_event(self, task: dict) -> None:
+        # Wake the dispatcher as soon as a task finishes instead of waiting for the next scan
+        if task.get("status") in TERMINAL_STATUSES and self._loop and self._wakeup:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    @staticmethod
+    def _claim_due(limit: int) -> list:
+        """
+        Load due deliveries and lease them so another process does not send them concurrently.
+        Each lease is a conditional UPDATE that only succeeds while the row is
+        still due, so when two dispatchers pick the same row only one of them keeps it.
+        """
+        now = int(time.time())
+        lease = now + int(settings.webhook_timeout) + 1
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(WebhookDelivery)
+                .filter(WebhookDelivery.status == "PENDING", WebhookDelivery.next_attempt_at <= now)
+                .order_by(WebhookDelivery.next_attempt_at)
+                .limit(limit)
+                .all()
+            )
+            claimed = []
+            for row in rows:
+                won = (
+                    db.query(WebhookDelivery)
+                    .filter(
+                        WebhookDelivery.id == row.id,
+                        WebhookDelivery.status == "PENDING",
+                        WebhookDelivery.next_attempt_at <= now,
+                    )
+                    .update({WebhookDelivery.next_attempt_at: lease}, synchronize_session=False)
+                )
+                if won:
+                    claimed.append(row.to_dict())
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    @staticmethod
+    def _record_result(delivery_id: int, error: Optional[str]) -> None:
+        db = SessionLocal()
+        try:
+            row = db.get(WebhookDelivery, delivery_id)
+            if row is None:
+                return
+            row.attempts += 1
+            now = int(time.time())
+            if error is None:
+                row.status = "DELIVERED"
+                row.delivered_at = now
+                row.last_error = None
+            else:
+                row.last_error = error[:500]
+                if row.attempts >= settings.webhook_max_attempts:
+                    row.status = "FAILED"
+                    logger.error(f"Webhook for task {row.task_id} failed after {row.attempts} attempts: {error}")
+                else:
+                    row.next_attempt_at = now + int(backoff_delay(row.attempts))
+            db.commit()
+        finally:
+            db.close()
+
+    async def _deliver(self, delivery: dict, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            body = json.dumps(delivery["payload"], separators=(",", ":")).encode()
+            timestamp = int(time.time())
+            headers = {
+                "Content-Type": "application/json",
+                "X-Webhook-Id": str(delivery["id"]),
+                "X-Webhook-Timestamp": str(timestamp),
+            }
+            if settings.webhook_secret:
+                headers["X-Webhook-Signature"] = f"sha256={sign_payload(body, timestamp)}"
+            error = None
+            try:
+                resp = await self._client.post(delivery["url"], content=body, headers=headers)
+                if resp.status_code >= 300:
+                    error = f"HTTP {resp.status_code}"
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+            if error:
+                logger.warning(f"Webhook delivery {delivery['id']} for task {delivery['task_id']} failed: {error}")
+            await asyncio.to_thread(self._record_result, delivery["id"], error)
+
+    async def run(self) -> None:
+        """
+        Scan for due deliveries every WEBHOOK_POLL_INTERVAL seconds, or sooner when a task finishes.
+        Only as many rows as there are free senders are claimed, so a leased
+        delivery never waits for the semaphore long enough for its lease to expire.
+        """
+        semaphore = asyncio.Semaphore(settings.webhook_concurrency)
+        pending = set()
+        while True:
+            try:
+                free = settings.webhook_concurrency - len(pending)
+                due = await asyncio.to_thread(self._claim_due, free) if free > 0 else []
+                for delivery in due:
+                    job = asyncio.create_task(self._deliver(delivery, semaphore))
+                    pending.add(job)
+                    job.add_done_callback(pending.discard)
+            except Exception as e:
+                logger.error(f"Webhook dispatcher scan failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.webhook_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """
+        Start the dispatcher on the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._client = httpx.AsyncClient(
+            timeout=settings.webhook_timeout,
+            limits=httpx.Limits(max_connections=settings.webhook_concurrency),
+            proxy=settings.proxy or None,
+        )
+        task_events.add_listener(self._on_task_event)
+        self._runner = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+        if self._client:
+            await self._client.aclose()
+
+
+# Singleton instance
+webhook_dispatcher = WebhookDispatcher()
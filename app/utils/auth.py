@@ -1,16 +1,34 @@
 """
-Secret token authentication dependency.
+Secret token / API key authentication and admission control dependencies.
 """
-from fastapi import Header, HTTPException, status
+import asyncio
+import hmac
+import math
+from typing import Callable, Optional
+
+from fastapi import Header, HTTPException, Request, status
+from sse_starlette.sse import EventSourceResponse
 from app.config import settings
+from app.services.api_keys import api_key_store, rate_limiter, stream_quota, task_quota
 
-async def verify_secret_token(authorization: str = Header(None)) -> None:
+async def verify_secret_token(request: Request, authorization: str = Header(None)) -> None:
     """
-    Verify that the Authorization header matches the configured secret token.
-    If no secret_token is set, allow all requests.
+    Verify that the Authorization header carries the configured secret token
+    or a known API key, and apply the key's rate limit.
+    If no secret_token is set and no API keys exist, allow all requests.
+    While the keys table has never been read successfully, requests that
+    would need it get 503 rather than being let through or refused as 401.
+    The secret token is an admin credential and is never rate limited.
     """
+    request.state.api_key = None
+    await api_key_store.reload_if_stale()
     secret = settings.secret_token
-    if not secret:
+    if not secret and not api_key_store.has_keys():
+        if not api_key_store.available():
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="API keys could not be loaded",
+            )
         return
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
@@ -18,8 +36,154 @@ async def verify_secret_token(authorization: str = Header(None)) -> None:
             detail="Unauthorized",
         )
     token = authorization.split(" ", 1)[1]
-    if token != secret:
+    if secret and hmac.compare_digest(token.encode(), secret.encode()):
+        return
+    key = api_key_store.lookup(token)
+    if key is None and not api_key_store.available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="API keys could not be loaded",
+        )
+    if key is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Unauthorized",
-        )
\ No newline at end of file
+        )
+    allowed, retry_after = rate_limiter.check(key.name, key.rate_per_minute, key.burst)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+    request.state.api_key = key
+
+def reserve_task_slot(request: Request) -> Optional[str]:
+    """
+    Reserve one in-flight task for the calling API key before any upstream call.
+    Returns the key name to bind or cancel later, or None for unlimited callers.
+    """
+    key = getattr(request.state, "api_key", None)
+    if key is None:
+        return None
+    if not task_quota.reserve(key.name, key.max_concurrent):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many tasks in flight (limit {key.max_concurrent})",
+            headers={"Retry-After": str(settings.queue_retry_after)},
+        )
+    return key.name
+
+def bind_task_slot(owner: Optional[str], task_id: str) -> None:
+    """
+    Attach a reserved slot to the created task; it is freed when the task finishes.
+    """
+    if owner is not None:
+        task_quota.assign(owner, task_id)
+
+def cancel_task_slot(owner: Optional[str]) -> None:
+    """
+    Give back a reserved slot after a failed submit.
+    """
+    if owner is not None:
+        task_quota.cancel(owner)
+
+class TaskSlot:
+    """
+    A reserved task slot that is settled exactly once, for submits that may
+    outlive the request (a shielded submit keeps running after a disconnect).
+    """
+    def __init__(self, owner: Optional[str]):
+        self.owner = owner
+        self._settled = False
+
+    def track(self, submit: asyncio.Future) -> None:
+        """
+        Hand the slot to a running submit: bound to its task id when it
+        succeeds, given back when it fails.
+        """
+        self._settled = True
+        submit.add_done_callback(self._on_submitted)
+
+    def _on_submitted(self, submit: asyncio.Future) -> None:
+        if submit.cancelled() or submit.exception() is not None:
+            cancel_task_slot(self.owner)
+        else:
+            bind_task_slot(self.owner, submit.result())
+
+    def cancel(self) -> None:
+        """
+        Give the slot back unless a submit already took it over.
+        """
+        if not self._settled:
+            self._settled = True
+            cancel_task_slot(self.owner)
+
+def open_stream_slot(request: Request) -> Optional[str]:
+    """
+    Count an open stream against the calling API key's STREAM_MAX_PER_KEY.
+    Returns the key name to pass to close_stream_slot, or None for uncapped callers.
+    """
+    key = getattr(request.state, "api_key", None)
+    if key is None:
+        return None
+    if not stream_quota.reserve(key.name, settings.stream_max_per_key):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many open streams (limit {settings.stream_max_per_key})",
+            headers={"Retry-After": str(settings.queue_retry_after)},
+        )
+    return key.name
+
+def close_stream_slot(owner: Optional[str]) -> None:
+    if owner is not None:
+        stream_quota.cancel(owner)
+
+class StreamSlotResponse(EventSourceResponse):
+    """
+    EventSourceResponse that gives back the caller's stream slot when the
+    response is over, however it ends: also when the body generator never
+    starts (client gone before the first event, failed response start).
+    """
+    def __init__(self, content, owner: Optional[str], on_close: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(content, **kwargs)
+        self.owner = owner
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            close_stream_slot(self.owner)
+            if self.on_close is not None:
+                self.on_close()
+
+async def verify_admin_caller(request: Request) -> None:
+    """
+    Admin-only routes behind verify_secret_token: API keys are refused and
+    only the secret token is accepted. In open mode (no SECRET_TOKEN and no
+    API keys) every caller is an admin, as for every other route.
+    """
+    if getattr(request.state, "api_key", None) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This endpoint requires the admin token",
+        )
+
+async def verify_admin_token(authorization: str = Header(None)) -> None:
+    """
+    Require the configured secret token itself; API keys are not accepted.
+    Refuses every request when no SECRET_TOKEN is set.
+    """
+    secret = settings.secret_token
+    if not secret:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="SECRET_TOKEN must be set to use this endpoint",
+        )
+    token = authorization.split(" ", 1)[1] if authorization and authorization.startswith("Bearer ") else ""
+    if not hmac.compare_digest(token.encode(), secret.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unauthorized",
+        )
@@ -1,8 +1,17 @@
 """
 HTTP client wrapper using httpx for Suno API external calls.
+
+Two clients share the same defaults: a synchronous one for the background
+threads (keep-alive, task polling) and an async one for request handlers, so
+upstream round trips never block the event loop.
 """
+import re
+import time
+from urllib.parse import urlsplit
+
 import httpx
 from app.config import settings
+from app.utils.metrics import UPSTREAM_LATENCY
 
 # Default headers for Suno API requests
 DEFAULT_HEADERS = {
@@ -17,21 +26,91 @@ DEFAULT_HEADERS = {
     "Accept": "*/*",
 }
 
-# Initialize HTTPX client
+# Connection pool limits shared by both clients
+LIMITS = httpx.Limits(
+    max_connections=settings.http_max_connections,
+    max_keepalive_connections=settings.http_max_keepalive,
+    keepalive_expiry=settings.http_keepalive_expiry,
+)
+
+# Connect quickly, but allow long reads for slow generation endpoints
+TIMEOUT = httpx.Timeout(settings.chat_timeout, connect=settings.http_connect_timeout)
+
+# Initialize HTTPX clients
 client = httpx.Client(
-    timeout=settings.chat_timeout,
+    timeout=TIMEOUT,
+    limits=LIMITS,
     headers=DEFAULT_HEADERS,
-    proxies=settings.proxy or None,
+    proxy=settings.proxy or None,
 )
 
-def do_request(method: str, url: str, *, headers: dict = None, data: bytes = None, json: object = None) -> httpx.Response:
+async_client = httpx.AsyncClient(
+    timeout=TIMEOUT,
+    limits=LIMITS,
+    headers=DEFAULT_HEADERS,
+    proxy=settings.proxy or None,
+)
+
+
+# Path segments that identify a resource (clip/task/session ids) rather than an endpoint
+_ID_SEGMENT = re.compile(r"^(?=.*\d)[\w-]{8,}$")
+
+
+def endpoint_label(url: str) -> str:
     """
-    Send an HTTP request to the specified URL, merging default headers with provided ones.
-    Raises httpx.HTTPError on network/HTTP issues.
+    Metric label for a request URL: its path with id segments replaced by {id}.
     """
+    path = urlsplit(url).path
+    return "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in path.split("/")) or "/"
+
+
+def _observe(method: str, url: str, started: float, status: str) -> None:
+    UPSTREAM_LATENCY.observe(time.perf_counter() - started, method, endpoint_label(url), status)
+
+
+def _merge_headers(headers: dict = None) -> dict:
     merged_headers = DEFAULT_HEADERS.copy()
     if headers:
         merged_headers.update(headers)
-    response = client.request(method, url, headers=merged_headers, content=data, json=json)
+    return merged_headers
+
+
+def do_request(method: str, url: str, *, headers: dict = None, data: bytes = None, json: object = None) -> httpx.Response:
+    """
+    Send an HTTP request to the specified URL, merging default headers with provided ones.
+    Blocking; only use from background threads.
+    Raises httpx.HTTPError on network/HTTP issues.
+    """
+    started = time.perf_counter()
+    try:
+        response = client.request(method, url, headers=_merge_headers(headers), content=data, json=json)
+    except httpx.HTTPError:
+        _observe(method, url, started, "error")
+        raise
+    _observe(method, url, started, str(response.status_code))
     response.raise_for_status()
-    return response
\ No newline at end of file
+    return response
+
+
+async def do_request_async(method: str, url: str, *, headers: dict = None, data: bytes = None, json: object = None) -> httpx.Response:
+    """
+    Async counterpart of do_request for use inside request handlers.
+    Raises httpx.HTTPError on network/HTTP issues.
+    """
+    started = time.perf_counter()
+    try:
+        response = await async_client.request(method, url, headers=_merge_headers(headers), content=data, json=json)
+    except httpx.HTTPError:
+        _observe(method, url, started, "error")
+        raise
+    _observe(method, url, started, str(response.status_code))
+    response.raise_for_status()
+    return response
+
+
+async def close_http_clients() -> None:
+    """
+    Close both HTTP clients and release pooled connections.
+    """
+    await async_client.aclose()
+    client.close()
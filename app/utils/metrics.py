@@ -0,0 +1,233 @@
+"""
+Minimal Prometheus text-format metrics.
+
+Hot paths never take a lock: every thread updates its own shard of each
+metric (created once per thread), and shards are only summed when /metrics
+is scraped. Histograms use fixed bucket bounds chosen at definition time.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers fast cache/DB hits through slow upstream generation calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """
+    Base class: per-thread shards of {label values tuple: state}.
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            # Once per thread, never on the steady-state path
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _snapshots(self) -> List[dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """
+    Monotonic counter.
+    """
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def samples(self):
+        totals: Dict[tuple, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return [(self.name, _format_labels(self.labelnames, labels), value) for labels, value in sorted(totals.items())]
+
+
+class Gauge(Counter):
+    """
+    Gauge updated with inc/dec from any thread, or computed at scrape time
+    by a callback returning a number or {label values tuple: number}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable] = None
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function: Callable) -> None:
+        self._function = function
+
+    def samples(self):
+        if self._function is None:
+            return super().samples()
+        try:
+            value = self._function()
+        except Exception:
+            return []
+        values = value if isinstance(value, dict) else {(): value}
+        return [(self.name, _format_labels(self.labelnames, labels), v) for labels, v in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """
+    Histogram with fixed bucket upper bounds.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts (last slot is +Inf), then sum and count
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        totals: Dict[tuple, list] = {}
+        for shard in self._snapshots():
+            for labels, state in shard.items():
+                state = list(state)
+                merged = totals.get(labels)
+                totals[labels] = state if merged is None else [a + b for a, b in zip(merged, state)]
+        samples = []
+        for labels, state in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                samples.append((f"{self.name}_bucket", _format_labels(self.labelnames, labels, le), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, labels), state[-2]))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, labels), state[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together in the Prometheus text format.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = MetricsRegistry()
+
+# Task queue & poller
+QUEUE_DEPTH = metrics.gauge("suno_task_queue_depth", "Tasks waiting in the task queue.")
+QUEUE_WAIT = metrics.histogram("suno_task_queue_wait_seconds", "Time tasks spent queued before dispatch.", ("action",), WAIT_BUCKETS)
+TASKS_INFLIGHT = metrics.gauge("suno_tasks_inflight", "Tasks being polled, by action and last known status.", ("action", "status"))
+POLL_ITERATIONS = metrics.histogram("suno_poll_iterations", "Upstream polls needed per task until it left the poller.", ("action",), COUNT_BUCKETS)
+POLL_TICK = metrics.histogram("suno_poll_tick_seconds", "Duration of one clip poller round.")
+
+# Upstream Suno API
+UPSTREAM_LATENCY = metrics.histogram(
+    "suno_upstream_request_seconds", "Upstream request latency by endpoint and status code.",
+    ("method", "endpoint", "status"),
+)
+TOKEN_REFRESH = metrics.counter("suno_token_refresh_total", "JWT refresh attempts by account and outcome.", ("account", "outcome"))
+
+# Database
+DB_QUERY_LATENCY = metrics.histogram("suno_db_query_seconds", "Database statement latency by engine and statement type.", ("engine", "statement"))
+
+# Chat
+TOOL_CACHE_LOOKUPS = metrics.counter("suno_tool_cache_lookups_total", "Chat tool-call cache lookups by outcome.", ("outcome",))
+
+# Streams
+SSE_STREAMS_ACTIVE = metrics.gauge("suno_sse_streams_active", "Open SSE streams by endpoint.", ("endpoint",))
+SSE_STREAMS_TOTAL = metrics.counter("suno_sse_streams_total", "SSE streams opened by endpoint.", ("endpoint",))
+SSE_STREAMS_BY_KEY = metrics.gauge("suno_sse_streams_open", "Open SSE streams and waiting chats by API key.", ("key",))
+
+
+async def track_stream(endpoint: str, events):
+    """
+    Wrap an SSE event generator so it is counted in the stream metrics while open.
+    """
+    SSE_STREAMS_TOTAL.inc(endpoint)
+    SSE_STREAMS_ACTIVE.inc(endpoint)
+    try:
+        async for event in events:
+            yield event
+    finally:
+        SSE_STREAMS_ACTIVE.dec(endpoint)
@@ -0,0 +1,71 @@
+"""
+Shared OpenAI client for the chat router.
+
+One AsyncOpenAI client, and so one connection pool, is created at startup and
+reused by every chat request. Calls are awaited, so an LLM round trip never
+blocks the event loop, and it is cancelled together with the request awaiting it.
+"""
+import httpx
+
+from app.config import settings
+
+# Support both v0 and v1 OpenAI SDK
+try:
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    USE_V1_SDK = True
+except (ImportError, AttributeError):
+    import openai
+    USE_V1_SDK = False
+
+_client = None
+
+
+def _create_client():
+    return AsyncOpenAI(
+        api_key=settings.chat_openai_key,
+        base_url=settings.chat_openai_base.rstrip('/'),
+        timeout=settings.chat_openai_timeout,
+        max_retries=settings.chat_openai_max_retries,
+        http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(
+            max_connections=settings.chat_openai_max_connections,
+            max_keepalive_connections=settings.chat_openai_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )),
+    )
+
+
+def init_openai_client() -> None:
+    """
+    Create the shared client at startup. Without CHAT_OPENAI_KEY it is left
+    to the first chat request, which then reports the missing key.
+    """
+    global _client
+    if not USE_V1_SDK:
+        openai.api_key = settings.chat_openai_key
+        openai.api_base = settings.chat_openai_base.rstrip('/')
+        return
+    if _client is None and settings.chat_openai_key:
+        _client = _create_client()
+
+
+def get_openai_client():
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+async def create_chat_completion(**kwargs):
+    """
+    Non-blocking chat.completions.create on whichever SDK is installed.
+    """
+    if USE_V1_SDK:
+        return await get_openai_client().chat.completions.create(**kwargs)
+    return await openai.ChatCompletion.acreate(**kwargs)
+
+
+async def close_openai_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
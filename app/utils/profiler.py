@@ -0,0 +1,154 @@
+"""
+On-demand profiling helpers behind the /debug/pprof endpoints (PPROF=true).
+
+- sample_stacks: wall-clock sampler over every thread via sys._current_frames(),
+  run on its own thread so the event loop it observes keeps running.
+- thread_dump / task_dump: current stacks of all threads and asyncio tasks.
+- heap_diff: tracemalloc snapshot diff over a window.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Frame key: (function, filename, line of the function definition)
+Frame = Tuple[str, str, int]
+
+
+def _thread_names() -> Dict[int, str]:
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """
+    Root-first stack of a frame.
+    """
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+
+def sample_stacks(duration: float, interval: float) -> Dict[Tuple[str, Tuple[Frame, ...]], int]:
+    """
+    Sample the stacks of all other threads every `interval` seconds for
+    `duration` seconds. Returns {(thread name, stack): sample count}.
+    Blocking; call it from a worker thread.
+    """
+    me = threading.get_ident()
+    names = _thread_names()
+    samples: Counter = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            if ident not in names:
+                names = _thread_names()
+            samples[(names.get(ident, str(ident)), _stack(frame))] += 1
+        time.sleep(interval)
+    return dict(samples)
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({filename}:{line})"
+
+
+def to_collapsed(samples: Dict[Tuple[str, Tuple[Frame, ...]], int]) -> str:
+    """
+    Brendan Gregg's collapsed format ("thread;root;...;leaf count"), for flamegraph.pl and friends.
+    """
+    lines = [
+        ";".join([thread] + [_frame_label(frame) for frame in stack]) + f" {count}"
+        for (thread, stack), count in samples.items()
+    ]
+    return "\n".join(sorted(lines)) + "\n"
+
+
+def to_speedscope(samples: Dict[Tuple[str, Tuple[Frame, ...]], int], duration: float, interval: float) -> dict:
+    """
+    speedscope file format: one sampled profile per thread, weights in seconds.
+    """
+    frames: List[dict] = []
+    index: Dict[Frame, int] = {}
+    profiles: Dict[str, dict] = {}
+    for (thread, stack), count in samples.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            ids.append(index[frame])
+        profile = profiles.setdefault(thread, {
+            "type": "sampled", "name": thread, "unit": "seconds",
+            "startValue": 0, "endValue": duration, "samples": [], "weights": [],
+        })
+        profile["samples"].append(ids)
+        profile["weights"].append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [profiles[name] for name in sorted(profiles)],
+        "name": f"suno-api wall-clock profile ({duration:g}s)",
+        "exporter": "suno-api pprof",
+    }
+
+
+def thread_dump() -> str:
+    """
+    Current stack of every thread, like a JVM thread dump.
+    """
+    frames = sys._current_frames()
+    parts = []
+    for thread in sorted(threading.enumerate(), key=lambda t: t.name):
+        frame = frames.get(thread.ident)
+        header = f'Thread "{thread.name}" ident={thread.ident} daemon={thread.daemon}'
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "  <no frame>\n"
+        parts.append(f"{header}\n{stack}")
+    return "\n".join(parts)
+
+
+def task_dump() -> str:
+    """
+    Current stack of every asyncio task on the running loop.
+    """
+    parts = []
+    for task in sorted(asyncio.all_tasks(), key=lambda t: t.get_name()):
+        stack = "".join(
+            "".join(traceback.format_stack(frame, limit=1)) for frame in task.get_stack()
+        ) or "  <not started>\n"
+        parts.append(f'Task "{task.get_name()}" {task.get_coro()!r}\n{stack}')
+    return "\n".join(parts)
+
+
+def heap_diff(duration: float, top: int, frames: int) -> str:
+    """
+    Allocations that grew over `duration` seconds, grouped by source line.
+    tracemalloc is started if needed and stopped again afterwards.
+    Blocking; call it from a worker thread.
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(duration)
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    stats = after.compare_to(before, "traceback" if frames > 1 else "lineno")
+    lines = [f"traced memory: current={current} peak={peak} bytes; top {top} of {len(stats)} sites"]
+    for stat in stats[:top]:
+        lines.append(str(stat))
+        if frames > 1:
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+    return "\n".join(lines) + "\n"
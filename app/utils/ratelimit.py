@@ -0,0 +1,97 @@
+"""
+In-memory rate limiting primitives: token buckets and concurrency quotas.
+"""
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: float = 1.0) -> Tuple[bool, float]:
+        """
+        Take `amount` tokens. Returns (allowed, seconds until enough tokens are available).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return True, 0.0
+            return False, (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class RateLimiter:
+    """
+    One token bucket per client name, created on first use.
+    """
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def check(self, name: str, rate_per_minute: float, burst: int) -> Tuple[bool, float]:
+        """
+        Consume one request for `name`. A zero rate means unlimited.
+        """
+        if rate_per_minute <= 0:
+            return True, 0.0
+        rate = rate_per_minute / 60.0
+        capacity = max(1, burst)
+        bucket = self._buckets.get(name)
+        if bucket is None or bucket.rate != rate or bucket.capacity != capacity:
+            with self._lock:
+                bucket = self._buckets.get(name)
+                if bucket is None or bucket.rate != rate or bucket.capacity != capacity:
+                    bucket = self._buckets[name] = TokenBucket(rate, capacity)
+        return bucket.consume()
+
+
+class ConcurrencyQuota:
+    """
+    Per-client count of in-flight tasks. Slots are reserved before the
+    upstream call, bound to a task id on success and released when it finishes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        # task_id -> client name
+        self._owners: Dict[str, str] = {}
+
+    def reserve(self, name: str, limit: int) -> bool:
+        with self._lock:
+            count = self._counts.get(name, 0)
+            if limit > 0 and count >= limit:
+                return False
+            self._counts[name] = count + 1
+            return True
+
+    def cancel(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] = max(0, self._counts.get(name, 0) - 1)
+
+    def assign(self, name: str, task_id: str) -> None:
+        with self._lock:
+            self._owners[task_id] = name
+
+    def finish(self, task_id: str) -> None:
+        with self._lock:
+            name = self._owners.pop(task_id, None)
+            if name is not None:
+                self._counts[name] = max(0, self._counts.get(name, 0) - 1)
+
+    def count(self, name: str) -> int:
+        return self._counts.get(name, 0)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
@@ -1,36 +1,203 @@
 """
 Load YAML-based templates for chat rendering.
+
+Every *.yaml / *.yml file under CHAT_TEMPLATE_DIR maps template names to
+Jinja source. All templates are compiled by one shared Environment with a
+bytecode cache (on disk under CHAT_TEMPLATE_CACHE_DIR, otherwise in memory),
+so unchanged templates are not recompiled on reload. A background thread
+re-reads the directory when a file's mtime changes; requests keep using the
+previous templates until the new set is ready. Files or templates that fail
+to load are logged, and the last good version is kept.
 """
 import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
 import yaml
-from jinja2 import Template
+from jinja2 import BytecodeCache, Environment, FileSystemBytecodeCache, FunctionLoader, Template, TemplateError
+from loguru import logger
+
 from app.config import settings
 
-# Mapping of template name to Jinja2 Template
-templates = {}
 
-def load_templates():
+class MemoryBytecodeCache(BytecodeCache):
     """
-    Walk through the configured template directory, parse YAML files,
-    and compile each string as a Jinja2 template.
-    """
-    base_dir = settings.chat_template_dir
-    if not base_dir or not os.path.isdir(base_dir):
-        return
-    for root, _, files in os.walk(base_dir):
-        for file in files:
-            if not file.lower().endswith(('.yaml', '.yml')):
-                continue
-            path = os.path.join(root, file)
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                data = yaml.safe_load(content)
-                if not isinstance(data, dict):
+    Process-local bytecode cache, keyed by template name and source checksum.
+    """
+    def __init__(self):
+        self._data: Dict[str, bytes] = {}
+
+    def load_bytecode(self, bucket) -> None:
+        code = self._data.get(bucket.key)
+        if code is not None:
+            bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket) -> None:
+        self._data[bucket.key] = bucket.bytecode_to_string()
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class TemplateRegistry:
+    """
+    name -> compiled Template, rebuilt from the template directory when it changes.
+    """
+    def __init__(self):
+        # path -> {name: source} of the last successfully parsed version of each file
+        self._files: Dict[str, Dict[str, str]] = {}
+        self._mtimes: Dict[str, float] = {}
+        # name -> (source, path)
+        self._sources: Dict[str, Tuple[str, str]] = {}
+        self._templates: Dict[str, Template] = {}
+        self._reload_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        cache_dir = settings.chat_template_cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.env = Environment(
+            loader=FunctionLoader(self._get_source),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir) if cache_dir else MemoryBytecodeCache(),
+            auto_reload=True,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            keep_trailing_newline=True,
+        )
+
+    def _get_source(self, name: str):
+        entry = self._sources.get(name)
+        if entry is None:
+            return None
+        source, path = entry
+        # Lets the Environment keep its compiled copy until the source changes
+        return source, path, lambda: self._sources.get(name, (None,))[0] == source
+
+    def get(self, name: str) -> Optional[Template]:
+        return self._templates.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    @staticmethod
+    def _scan(base_dir: str) -> Dict[str, float]:
+        found = {}
+        if not base_dir or not os.path.isdir(base_dir):
+            return found
+        for root, _, files in os.walk(base_dir):
+            for file in files:
+                if file.lower().endswith(('.yaml', '.yml')):
+                    path = os.path.join(root, file)
+                    try:
+                        found[path] = os.stat(path).st_mtime
+                    except OSError:
+                        continue
+        return found
+
+    @staticmethod
+    def _parse(path: str) -> Dict[str, str]:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+        if data is None:
+            return {}
+        if not isinstance(data, dict):
+            raise ValueError("top level must be a mapping of template names to strings")
+        sources = {}
+        for name, tmpl in data.items():
+            if isinstance(tmpl, str) and tmpl.strip():
+                sources[str(name)] = tmpl
+            else:
+                logger.warning(f"Skipping template {name!r} in {path}: not a non-empty string")
+        return sources
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Re-read the template directory if any file was added, removed or
+        modified (or always with force). Returns True if templates were rebuilt.
+        """
+        with self._reload_lock:
+            mtimes = self._scan(settings.chat_template_dir)
+            if not force and mtimes == self._mtimes:
+                return False
+            files = {}
+            for path, mtime in mtimes.items():
+                if not force and self._mtimes.get(path) == mtime and path in self._files:
+                    files[path] = self._files[path]
                     continue
-                for name, tmpl in data.items():
-                    if isinstance(tmpl, str) and tmpl.strip():
-                        templates[name] = Template(tmpl)
-            except Exception:
-                # Skip invalid or unparsable files
-                continue
\ No newline at end of file
+                try:
+                    files[path] = self._parse(path)
+                except Exception as e:
+                    logger.error(f"Failed to load template file {path}: {e}")
+                    if path in self._files:
+                        files[path] = self._files[path]
+
+            sources = {}
+            for path in sorted(files):
+                for name, source in files[path].items():
+                    if name in sources:
+                        logger.warning(f"Template {name!r} in {path} overrides the one in {sources[name][1]}")
+                    sources[name] = (source, path)
+            previous = self._templates
+            self._sources = sources
+            templates = {}
+            for name, (_, path) in sources.items():
+                try:
+                    templates[name] = self.env.get_template(name)
+                except TemplateError as e:
+                    logger.error(f"Failed to compile template {name!r} in {path}: {e}")
+                    if name in previous:
+                        templates[name] = previous[name]
+            self._files = files
+            self._mtimes = mtimes
+            self._templates = templates
+            logger.info(f"Loaded {len(templates)} chat templates from {len(files)} files")
+            return True
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(settings.chat_template_reload_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Template reload failed: {e}")
+
+    def start_watcher(self) -> None:
+        """
+        Poll the template directory for changes on a daemon thread.
+        """
+        if settings.chat_template_reload_interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="template-reloader", daemon=True)
+        self._thread.start()
+
+
+# Singleton instance
+templates = TemplateRegistry()
+
+
+def load_templates():
+    """
+    Compile the configured templates and start watching them for changes.
+    """
+    templates.reload(force=True)
+    templates.start_watcher()
+
+
+def render_chunks(template: Template, min_size: int = 1024, **context):
+    """
+    Render incrementally with Template.generate(), yielding pieces of at
+    least min_size characters (the last one may be shorter).
+    """
+    buffer = []
+    size = 0
+    for piece in template.generate(**context):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= min_size:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,234 @@
+"""
+Local stand-in for the Suno and Clerk endpoints the API calls, for tests and benchmarks.
+
+Run it with:
+    python -m bench.fake_suno --port 8900 --latency 0.05 --stages queued:1,streaming:3,complete:6
+
+then point the API at it:
+    BASE_URL=http://127.0.0.1:8900
+    EXCHANGE_TOKEN_URL=http://127.0.0.1:8900/v1/client/sessions/{}/tokens
+
+Clip status progression, latency and error rate are configurable; every
+endpoint call is counted and exposed at GET /_stats (POST /_reset clears it).
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request, Response
+
+
+def parse_stages(spec: str) -> List[Tuple[str, float]]:
+    """
+    "queued:1,streaming:3,complete:6" -> [("submitted", 0), ("queued", 1.0), ...]
+    Each status applies from the given number of seconds after submission.
+    """
+    stages = [("submitted", 0.0)]
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        status, _, at = part.partition(":")
+        stages.append((status, float(at or 0)))
+    return sorted(stages, key=lambda stage: stage[1])
+
+
+class FakeSunoConfig:
+    """
+    Behaviour of the fake upstream; defaults come from FAKE_SUNO_* environment variables.
+    """
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        stages: str = "queued:1,streaming:3,complete:6",
+        error_rate: float = 0.0,
+        clips_per_song: int = 2,
+        token_ttl: float = 3600,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.stages = parse_stages(stages)
+        self.error_rate = error_rate
+        self.clips_per_song = clips_per_song
+        self.token_ttl = token_ttl
+
+    @classmethod
+    def from_env(cls) -> "FakeSunoConfig":
+        return cls(
+            latency=float(os.getenv("FAKE_SUNO_LATENCY", "0")),
+            jitter=float(os.getenv("FAKE_SUNO_JITTER", "0")),
+            stages=os.getenv("FAKE_SUNO_STAGES", "queued:1,streaming:3,complete:6"),
+            error_rate=float(os.getenv("FAKE_SUNO_ERROR_RATE", "0")),
+            clips_per_song=int(os.getenv("FAKE_SUNO_CLIPS", "2")),
+            token_ttl=float(os.getenv("FAKE_SUNO_TOKEN_TTL", "3600")),
+        )
+
+
+def fake_jwt(ttl: float) -> str:
+    """
+    Unsigned JWT whose exp claim the account service can read.
+    """
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+    return f"{encode({'alg': 'none'})}.{encode({'exp': int(time.time() + ttl)})}.fake"
+
+
+def create_app(config: Optional[FakeSunoConfig] = None) -> FastAPI:
+    config = config or FakeSunoConfig.from_env()
+    app = FastAPI(title="Fake Suno")
+    app.state.config = config
+    calls: Counter = Counter()
+    # clip id -> clip state; task id -> clip ids; lyrics id -> state
+    clips: Dict[str, dict] = {}
+    tasks: Dict[str, List[str]] = {}
+    lyrics: Dict[str, dict] = {}
+
+    async def delay(endpoint: str) -> None:
+        calls[endpoint] += 1
+        latency = config.latency + random.uniform(-config.jitter, config.jitter)
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+    def status_at(created: float, failed: bool) -> str:
+        elapsed = time.time() - created
+        status = "submitted"
+        for name, at in config.stages:
+            if elapsed >= at:
+                status = name
+        if failed and status == config.stages[-1][0]:
+            return "error"
+        return status
+
+    def render_clip(clip_id: str) -> dict:
+        state = clips[clip_id]
+        status = status_at(state["created"], state["failed"])
+        done = status == "complete"
+        return {
+            "id": clip_id,
+            "status": status,
+            "title": state["title"],
+            "model_name": state["mv"],
+            "created_at": state["created_at"],
+            "audio_url": f"https://cdn.example.com/{clip_id}.mp3" if status in ("streaming", "complete") else "",
+            "video_url": f"https://cdn.example.com/{clip_id}.mp4" if done else "",
+            "image_url": f"https://cdn.example.com/{clip_id}.png" if done else "",
+            "image_large_url": f"https://cdn.example.com/{clip_id}_large.png" if done else "",
+            "metadata": {
+                "tags": state["tags"],
+                "prompt": state["prompt"],
+                "duration": 120.0 if done else None,
+                "error_message": "Fake failure" if status == "error" else None,
+            },
+        }
+
+    @app.post("/v1/client/sessions/{session_id}/tokens")
+    async def exchange_token(session_id: str, response: Response):
+        await delay("token")
+        response.set_cookie("__client", f"fake-{session_id}")
+        return {"jwt": fake_jwt(config.token_ttl)}
+
+    @app.get("/api/billing/info/")
+    async def billing_info():
+        await delay("billing")
+        return {
+            "credits_left": 1_000_000, "monthly_limit": 1_000_000, "monthly_usage": 0,
+            "period": "bench", "is_active": True,
+        }
+
+    @app.post("/api/generate/v2/")
+    async def generate_song(request: Request):
+        await delay("generate")
+        params = json.loads(await request.body() or b"{}")
+        task_id = uuid.uuid4().hex
+        now = time.time()
+        failed = random.random() < config.error_rate
+        ids = []
+        for _ in range(config.clips_per_song):
+            clip_id = str(uuid.uuid4())
+            clips[clip_id] = {
+                "created": now,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+                "failed": failed,
+                "title": params.get("title") or "Fake song",
+                "tags": params.get("tags") or "",
+                "prompt": params.get("prompt") or "",
+                "mv": params.get("mv") or "chirp-v3-0",
+            }
+            ids.append(clip_id)
+        tasks[task_id] = ids
+        return {"id": task_id, "status": "complete", "clips": [render_clip(cid) for cid in ids]}
+
+    @app.get("/api/feed/")
+    async def feed(ids: str = ""):
+        await delay("feed")
+        return [render_clip(cid) for cid in ids.split(",") if cid in clips]
+
+    @app.get("/api/clips/{task_id}")
+    async def task_clips(task_id: str):
+        await delay("clips")
+        if task_id not in tasks:
+            raise HTTPException(status_code=404, detail="Not found")
+        return {"clips": [render_clip(cid) for cid in tasks[task_id]]}
+
+    @app.post("/api/generate/lyrics/")
+    async def generate_lyrics(request: Request):
+        await delay("generate_lyrics")
+        params = json.loads(await request.body() or b"{}")
+        lyric_id = uuid.uuid4().hex
+        lyrics[lyric_id] = {
+            "created": time.time(),
+            "failed": random.random() < config.error_rate,
+            "prompt": params.get("prompt") or "",
+        }
+        return {"id": lyric_id}
+
+    @app.get("/api/generate/lyrics/{lyric_id}")
+    async def get_lyrics(lyric_id: str):
+        await delay("lyrics")
+        state = lyrics.get(lyric_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        status = status_at(state["created"], state["failed"])
+        done = status == "complete"
+        return {
+            "id": lyric_id,
+            "status": status,
+            "title": "Fake lyrics" if done else "",
+            "text": f"[Verse]\n{state['prompt']}" if done else "",
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": dict(calls), "songs": len(tasks), "lyrics": len(lyrics)}
+
+    @app.post("/_reset")
+    async def reset():
+        calls.clear()
+        return {"ok": True}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake Suno upstream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds on top of latency")
+    parser.add_argument("--stages", default="queued:1,streaming:3,complete:6",
+                        help="status:seconds-after-submit list")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of tasks that end in error")
+    parser.add_argument("--clips", type=int, default=2, help="clips per song")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(FakeSunoConfig(args.latency, args.jitter, args.stages, args.error_rate, args.clips)),
+        host=args.host, port=args.port, log_level="warning",
+    )
@@ -0,0 +1,221 @@
+"""
+End-to-end benchmark: submit -> poll -> persist against the fake Suno upstream.
+
+For each concurrency level the API is started fresh (own SQLite database)
+as a subprocess pointed at bench.fake_suno, N songs are submitted at once,
+and each one is followed over /suno/stream until it finishes. Reported per
+level:
+- submit throughput and latency
+- time-to-result (submit -> terminal state)
+- upstream calls per task (from the fake's counters)
+- DB writes per task (INSERT/UPDATE/DELETE from /metrics)
+
+Usage:
+    python -m bench.run_bench --levels 10,100,1000 --stages queued:1,streaming:3,complete:6 --latency 0.05
+    python -m bench.run_bench --levels 10 --output bench_output.txt --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WRITE_STATEMENTS = {"INSERT", "UPDATE", "DELETE"}
+_DB_COUNT = re.compile(r'^suno_db_query_seconds_count\{engine="(\w+)",statement="(\w+)"\} (\S+)$')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args: List[str], env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    log = open(log_path, "ab")
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env={**os.environ, **env}, stdout=log, stderr=log)
+
+
+def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def db_writes(metrics_text: str) -> float:
+    total = 0.0
+    for line in metrics_text.splitlines():
+        match = _DB_COUNT.match(line)
+        if match and match.group(2) in WRITE_STATEMENTS:
+            total += float(match.group(3))
+    return total
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_task(client: httpx.AsyncClient, api: str, index: int) -> dict:
+    result = {"ok": False, "status": None, "submit": None, "result": None}
+    started = time.perf_counter()
+    try:
+        resp = await client.post(f"{api}/suno/submit/music", json={"prompt": f"bench song {index}", "tags": "bench"})
+        resp.raise_for_status()
+        task_id = resp.json()["data"]
+        result["submit"] = time.perf_counter() - started
+        async with client.stream("GET", f"{api}/suno/stream/{task_id}") as stream:
+            async for line in stream.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                task = json.loads(line[5:].strip())
+                result["status"] = task["status"]
+                if task["status"] in ("SUCCESS", "FAILURE", "UNKNOWN"):
+                    break
+        result["result"] = time.perf_counter() - started
+        result["ok"] = result["status"] == "SUCCESS"
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+async def run_level(api: str, fake: str, concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency + 10, max_keepalive_connections=concurrency + 10)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(900, connect=30), limits=limits) as client:
+        await client.post(f"{fake}/_reset")
+        writes_before = db_writes((await client.get(f"{api}/metrics")).text)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(run_task(client, api, i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        # Let the poller's last write-behind flush land before reading counters
+        await asyncio.sleep(1)
+        calls = (await client.get(f"{fake}/_stats")).json()["calls"]
+        writes = db_writes((await client.get(f"{api}/metrics")).text) - writes_before
+
+    submits = [r["submit"] for r in results if r["submit"] is not None]
+    finished = [r["result"] for r in results if r["result"] is not None]
+    polls = sum(count for name, count in calls.items() if name not in ("token", "billing"))
+    return {
+        "concurrency": concurrency,
+        "succeeded": sum(r["ok"] for r in results),
+        "failed": sum(not r["ok"] for r in results),
+        "errors": sorted({r["error"] for r in results if r.get("error")})[:5],
+        "wall_seconds": round(elapsed, 3),
+        "submit_per_second": round(len(submits) / max(submits), 2) if submits else 0.0,
+        "submit_p50": round(percentile(submits, 50), 4),
+        "submit_p95": round(percentile(submits, 95), 4),
+        "result_p50": round(percentile(finished, 50), 3),
+        "result_p95": round(percentile(finished, 95), 3),
+        "result_max": round(max(finished), 3) if finished else 0.0,
+        "result_mean": round(statistics.fmean(finished), 3) if finished else 0.0,
+        "upstream_calls": calls,
+        "upstream_calls_per_task": round(polls / concurrency, 2),
+        "db_writes_per_task": round(writes / concurrency, 2),
+    }
+
+
+def format_table(rows: List[dict]) -> str:
+    columns = [
+        ("concurrency", "N"), ("succeeded", "ok"), ("failed", "fail"),
+        ("submit_per_second", "submit/s"), ("submit_p95", "submit p95"),
+        ("result_p50", "result p50"), ("result_p95", "result p95"), ("result_max", "result max"),
+        ("upstream_calls_per_task", "upstream/task"), ("db_writes_per_task", "db writes/task"),
+    ]
+    widths = [max(len(title), *(len(str(row[key])) for row in rows)) for key, title in columns]
+    lines = ["  ".join(title.rjust(w) for (_, title), w in zip(columns, widths))]
+    for row in rows:
+        lines.append("  ".join(str(row[key]).rjust(w) for (key, _), w in zip(columns, widths)))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> List[dict]:
+    parser = argparse.ArgumentParser(description="Benchmark the API against a fake Suno upstream")
+    parser.add_argument("--levels", default="10,100,1000", help="comma-separated concurrent task counts")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--stages", default="queued:1,streaming:3,complete:6", help="fake clip status timeline")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the API under test")
+    parser.add_argument("--output", help="append the result table to this file (e.g. bench_output.txt)")
+    parser.add_argument("--json", help="write the full results as JSON to this file")
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+
+    workdir = tempfile.mkdtemp(prefix="suno-bench-")
+    fake_port = free_port()
+    fake = f"http://127.0.0.1:{fake_port}"
+    fake_proc = start_server(
+        ["-m", "bench.fake_suno", "--port", str(fake_port), "--latency", str(args.latency),
+         "--jitter", str(args.jitter), "--stages", args.stages, "--error-rate", str(args.error_rate)],
+        {}, os.path.join(workdir, "fake_suno.log"),
+    )
+    rows = []
+    try:
+        wait_ready(f"{fake}/_stats")
+        for level in levels:
+            api_port = free_port()
+            api = f"http://127.0.0.1:{api_port}"
+            env = {
+                "BASE_URL": fake,
+                "EXCHANGE_TOKEN_URL": f"{fake}/v1/client/sessions/{{}}/tokens",
+                "SESSION_ID": "bench-session",
+                "COOKIE": "__client=bench",
+                "SUNO_ACCOUNTS": "",
+                "SECRET_TOKEN": "",
+                "DATABASE_URL": f"sqlite:///{os.path.join(workdir, f'bench-{level}.db')}",
+                "ASYNC_DATABASE_URL": "",
+                "LOG_DIR": workdir,
+                "TASK_QUEUE_SIZE": str(max(100, level * 2)),
+                "TASK_CONCURRENCY_MUSIC": str(max(200, level * 2)),
+                "DB_POOL_SIZE": str(max(10, min(level, 50))),
+                "MAINTENANCE_VACUUM_HOUR": "-1",
+            }
+            env.update(item.split("=", 1) for item in args.env)
+            api_proc = start_server(
+                ["-m", "uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning"],
+                env, os.path.join(workdir, f"api-{level}.log"),
+            )
+            try:
+                wait_ready(f"{api}/ping")
+                row = asyncio.run(run_level(api, fake, level))
+            finally:
+                api_proc.terminate()
+                api_proc.wait(timeout=30)
+            rows.append(row)
+            print(f"N={level}: {row['succeeded']} ok, {row['failed']} failed in {row['wall_seconds']}s", flush=True)
+    finally:
+        fake_proc.terminate()
+        fake_proc.wait(timeout=30)
+
+    table = format_table(rows)
+    header = (f"# {time.strftime('%Y-%m-%d %H:%M:%S')} levels={args.levels} latency={args.latency} "
+              f"stages={args.stages} error_rate={args.error_rate} (logs: {workdir})")
+    print("\n" + header + "\n" + table)
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(header + "\n" + table + "\n\n")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,11 @@
 Entry point for the Python version of Suno-API.
 Sets up FastAPI application, middleware, routers, and background services.
 """
+from uuid import uuid4
+
 import uvicorn
 from fastapi import FastAPI
+from starlette.datastructures import MutableHeaders
 
 from app.config import settings
 from app.logger import init_logger
@@ -12,8 +15,37 @@ from app.database import init_db, close_db
 from app.routers.ping import router as ping_router
 from app.routers.suno import router as suno_router
 from app.routers.chat import router as chat_router
+from app.routers.metrics import router as metrics_router
+from app.routers.media import router as media_router
 from app.services.account import start_account_keepalive
+from app.services.maintenance import start_maintenance, task_maintenance
+from app.services.media import media_store
 from app.services.tasks import start_task_worker
+from app.services.webhooks import webhook_dispatcher
+
+
+class RequestIDMiddleware:
+    """
+    Tag each request with request.state.request_id and an X-Request-ID header.
+    Plain ASGI rather than @app.middleware("http"), whose wrapped receive hides
+    client disconnects from request.is_disconnected().
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rid = uuid4().hex
+        scope.setdefault("state", {})["request_id"] = rid
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", rid)
+            await send(message)
+
+        await self.app(scope, receive, send_with_request_id)
 
 
 def create_app() -> FastAPI:
@@ -29,8 +61,13 @@ def create_app() -> FastAPI:
 
     # Include routers
     app.include_router(ping_router)
+    app.include_router(metrics_router)
     app.include_router(suno_router, prefix="/suno")
+    app.include_router(media_router, prefix="/suno")
     app.include_router(chat_router, prefix="/v1/chat")
+    if settings.pprof_enabled:
+        from app.routers.pprof import router as pprof_router
+        app.include_router(pprof_router, prefix="/debug/pprof")
 
     # Startup and shutdown events
     # Middleware: CORS
@@ -43,28 +80,38 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     # Middleware: Request ID
-    from uuid import uuid4
-    @app.middleware("http")
-    async def add_request_id(request, call_next):
-        rid = uuid4().hex
-        request.state.request_id = rid
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = rid
-        return response
+    app.add_middleware(RequestIDMiddleware)
 
     @app.on_event("startup")
     async def on_startup():
         init_db()
+        # Cache client API keys before serving requests
+        from app.services.api_keys import api_key_store
+        api_key_store.load()
         # Load templates
         from app.utils.templates import load_templates
         load_templates()
+        # One pooled OpenAI client shared by all chat requests
+        from app.utils.openai_client import init_openai_client
+        init_openai_client()
         # Start background services
         start_account_keepalive()
         start_task_worker()
+        webhook_dispatcher.start()
+        start_maintenance()
+        if settings.media_enabled:
+            media_store.start()
 
     @app.on_event("shutdown")
     async def on_shutdown():
-        close_db()
+        from app.utils.http_client import close_http_clients
+        from app.utils.openai_client import close_openai_client
+        task_maintenance.stop()
+        await webhook_dispatcher.stop()
+        await media_store.stop()
+        await close_http_clients()
+        await close_openai_client()
+        await close_db()
 
     return app
 
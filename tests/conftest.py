@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.database import Base
+
+
+@pytest.fixture
+def memory_db(monkeypatch, tmp_path):
+    """
+    Throwaway SQLite database patched in as SessionLocal (and AsyncSessionLocal
+    on the request path) for the service modules.
+    """
+    from app.models import task, webhook, api_key, media, idempotency, tool_call  # noqa: F401
+    path = tmp_path / "test.db"
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        poolclass=NullPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # NullPool: no connections outlive the event loop that opened them
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    async_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    monkeypatch.setattr("app.services.suno_service.AsyncSessionLocal", async_factory)
+    monkeypatch.setattr("app.services.idempotency.AsyncSessionLocal", async_factory)
+    monkeypatch.setattr("app.services.tool_cache.AsyncSessionLocal", async_factory)
+    monkeypatch.setattr("app.services.suno_service.SessionLocal", factory)
+    monkeypatch.setattr("app.services.poller.SessionLocal", factory)
+    monkeypatch.setattr("app.services.tasks.SessionLocal", factory)
+    monkeypatch.setattr("app.services.webhooks.SessionLocal", factory)
+    monkeypatch.setattr("app.services.api_keys.SessionLocal", factory)
+    monkeypatch.setattr("app.services.maintenance.SessionLocal", factory)
+    monkeypatch.setattr("app.services.media.SessionLocal", factory)
+    from app.services.cache import task_cache
+    from app.services.idempotency import idempotency_store
+    from app.services.tool_cache import tool_call_cache
+    for cache in (task_cache, idempotency_store, tool_call_cache):
+        cache.clear()
+    yield factory
+    for cache in (task_cache, idempotency_store, tool_call_cache):
+        cache.clear()
+    engine.dispose()
@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.services.account import AccountService, decode_jwt_exp
+from app.utils import http_client
+
+
+def make_jwt(exp: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"header.{payload}.sig"
+
+
+def test_decode_jwt_exp():
+    assert decode_jwt_exp(make_jwt(1234)) == 1234
+    assert decode_jwt_exp("not-a-jwt") == 0.0
+
+
+@pytest.fixture
+def account():
+    svc = AccountService()
+    svc.session_id = "sid"
+    svc.cookie = "__client=abc"
+    return svc
+
+
+async def test_concurrent_401s_share_one_refresh(account, monkeypatch):
+    calls = {"exchange": 0}
+    fresh = make_jwt(time.time() + 3600)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "sessions" in request.url.path:
+            calls["exchange"] += 1
+            return httpx.Response(200, json={"jwt": fresh})
+        if request.headers["authorization"] != f"Bearer {fresh}":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"ok": True})
+
+    monkeypatch.setattr(http_client, "async_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    # Valid-looking but rejected token, so each caller hits a 401 first
+    account.jwt = make_jwt(time.time() + 3600)
+    account.jwt_expires_at = time.time() + 3600
+
+    results = await asyncio.gather(*[
+        account.request_async("GET", "https://suno.test/api/feed/") for _ in range(10)
+    ])
+    assert all(r.json() == {"ok": True} for r in results)
+    assert calls["exchange"] == 1
+    assert account.jwt == fresh
+
+
+async def test_expiring_token_refreshed_before_request(account, monkeypatch):
+    calls = {"exchange": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "sessions" in request.url.path:
+            calls["exchange"] += 1
+            return httpx.Response(200, json={"jwt": make_jwt(time.time() + 60)})
+        return httpx.Response(200, json={})
+
+    monkeypatch.setattr(http_client, "async_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    account.jwt = make_jwt(time.time() + 2)
+    account.jwt_expires_at = time.time() + 2
+
+    await account.request_async("GET", "https://suno.test/api/feed/")
+    await account.request_async("GET", "https://suno.test/api/feed/")
+    assert calls["exchange"] == 1
+
+
+def test_pool_prefers_credits_then_fewest_inflight():
+    from app.services.account import AccountPool, NoAccountAvailable
+    a, b, c = AccountService("a", "ck"), AccountService("b", "ck"), AccountService("c", "ck")
+    for acc, credits in ((a, 500), (b, 500), (c, 5)):
+        acc.credits_left = credits
+        acc.credits_updated = time.time()
+    pool = AccountPool([a, b, c])
+
+    first = pool.acquire()
+    pool.assign("t1", first)
+    second = pool.acquire()
+    assert {first.name, second.name} == {"a", "b"}
+    # c is below ACCOUNT_MIN_CREDITS and never picked
+    pool.release(second)
+    pool.finish("t1")
+    assert a.inflight == 0 and b.inflight == 0
+
+    a.disabled_until = b.disabled_until = time.time() + 60
+    with pytest.raises(NoAccountAvailable):
+        pool.acquire()
+
+
+async def test_loop_refresh_waits_for_thread_refresh(account, monkeypatch):
+    calls = {"sync": 0, "async": 0}
+    fresh = make_jwt(time.time() + 3600)
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_update_token():
+        calls["sync"] += 1
+        entered.set()
+        release.wait(5)
+        account.jwt, account.jwt_expires_at = fresh, time.time() + 3600
+
+    async def update_token_async():
+        calls["async"] += 1
+
+    monkeypatch.setattr(account, "update_token", slow_update_token)
+    monkeypatch.setattr(account, "update_token_async", update_token_async)
+    stale = account.jwt
+    # Keep-alive thread starts an exchange, then a 401 on the loop asks for another
+    keepalive = threading.Thread(target=account.refresh_token, args=(stale,))
+    keepalive.start()
+    entered.wait(5)
+    loop_refresh = asyncio.ensure_future(account.refresh_token_async(stale))
+    await asyncio.sleep(0.05)
+    assert not loop_refresh.done()
+    release.set()
+    await loop_refresh
+    keepalive.join()
+    # The loop saw the thread's new token and did not exchange again
+    assert calls == {"sync": 1, "async": 0} and account.jwt == fresh
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.config import settings
+from app.routers import chat
+from app.services.api_keys import ApiKeyStore, api_key_store, create_api_key, rate_limiter, stream_quota, task_quota
+from app.services.suno_service import suno_service
+from app.utils.auth import StreamSlotResponse
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def api_key(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, 'secret_token', '')
+    token = create_api_key('client-a', rate_per_minute=60, burst=2, max_concurrent=1)
+    api_key_store.load()
+    yield token
+    api_key_store._keys = {}
+    api_key_store._loaded_at = None
+    rate_limiter._buckets.clear()
+    task_quota.cancel('client-a')
+    stream_quota._counts.clear()
+
+
+def fetch_none(headers):
+    return client.post('/suno/fetch', json={'ids': [], 'action': 'MUSIC'}, headers=headers)
+
+
+def test_unknown_key_rejected(api_key):
+    response = fetch_none({'Authorization': 'Bearer nope'})
+    assert response.status_code == 401
+
+
+def test_api_keys_get_403_from_admin_endpoints(api_key, monkeypatch):
+    headers = {'Authorization': f'Bearer {api_key}'}
+    for path in ('/suno/account', '/suno/tasks'):
+        assert client.get(path, headers=headers).status_code == 403
+    monkeypatch.setattr(settings, 'secret_token', 'admin')
+    rate_limiter._buckets.clear()
+    assert client.get('/suno/account', headers=headers).status_code == 403
+    assert client.get('/suno/queue', headers={'Authorization': 'Bearer admin'}).status_code == 200
+
+
+def test_non_ascii_token_is_rejected_not_an_error(monkeypatch):
+    monkeypatch.setattr(settings, 'secret_token', 'admin')
+    headers = {'Authorization': 'Bearer pässwörd'.encode()}
+    assert fetch_none(headers).status_code == 401
+
+
+def test_rate_limit_returns_429_with_retry_after(api_key):
+    headers = {'Authorization': f'Bearer {api_key}'}
+    assert fetch_none(headers).status_code == 200
+    assert fetch_none(headers).status_code == 200
+    response = fetch_none(headers)
+    assert response.status_code == 429
+    assert int(response.headers['retry-after']) >= 1
+
+
+def test_concurrent_task_quota(api_key, monkeypatch):
+    async def fake_submit_song(params):
+        return 'quota-task'
+    monkeypatch.setattr(suno_service, 'submit_song', fake_submit_song)
+    headers = {'Authorization': f'Bearer {api_key}'}
+    assert client.post('/suno/submit/music', json={'prompt': 'a'}, headers=headers).status_code == 200
+    response = client.post('/suno/submit/music', json={'prompt': 'b'}, headers=headers)
+    assert response.status_code == 429
+    # Finishing the task frees the slot
+    task_quota.finish('quota-task')
+    assert task_quota.count('client-a') == 0
+
+
+def test_open_stream_cap_per_key(api_key, monkeypatch):
+    monkeypatch.setattr(settings, 'stream_max_per_key', 1)
+    async def fake_fetch_by_id(task_id):
+        return {'task_id': task_id, 'status': 'SUCCESS', 'data': []}
+    async def fake_watch_task(task_id, timeout):
+        yield await fake_fetch_by_id(task_id)
+    monkeypatch.setattr(suno_service, 'fetch_by_id', fake_fetch_by_id)
+    monkeypatch.setattr(suno_service, 'watch_task', fake_watch_task)
+    headers = {'Authorization': f'Bearer {api_key}'}
+    assert stream_quota.reserve('client-a', 1)
+    response = client.get('/suno/stream/t1', headers=headers)
+    assert response.status_code == 429
+    stream_quota.cancel('client-a')
+    response = client.get('/suno/stream/t1', headers=headers)
+    assert response.status_code == 200 and 'SUCCESS' in response.text
+    # The slot is given back once the stream ends
+    assert stream_quota.count('client-a') == 0
+
+
+async def test_stale_keys_reload_once_for_concurrent_requests(monkeypatch):
+    store = ApiKeyStore()
+    store._loaded_at = 0
+    loads = []
+
+    def slow_load():
+        loads.append(1)
+        time.sleep(0.05)
+        store._loaded_at = time.time()
+
+    monkeypatch.setattr(store, 'load', slow_load)
+    await asyncio.gather(*(store.reload_if_stale() for _ in range(5)))
+    assert len(loads) == 1
+    await store.reload_if_stale()
+    assert len(loads) == 1
+
+
+async def test_stream_slot_released_when_response_start_fails():
+    async def events():
+        yield {'data': 'never sent'}
+
+    async def receive():
+        await asyncio.sleep(10)
+        return {'type': 'http.disconnect'}
+
+    async def failing_send(message):
+        raise OSError('connection reset')
+
+    assert stream_quota.reserve('client-b', 1)
+    response = StreamSlotResponse(events(), 'client-b')
+    with pytest.raises(BaseException):
+        await response({'type': 'http', 'method': 'GET', 'path': '/'}, receive, failing_send)
+    assert stream_quota.counts().get('client-b', 0) == 0
+
+
+def test_chat_submits_count_against_task_quota(api_key, monkeypatch):
+    async def fake_create(**kwargs):
+        call = SimpleNamespace(arguments='{"prompt": "cats", "tags": "pop"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(function_call=call))])
+
+    async def fake_submit_song(params):
+        return 'chat-quota-task'
+
+    async def fake_watch_task(task_id, timeout):
+        yield {'task_id': task_id, 'status': 'SUCCESS', 'data': []}
+
+    monkeypatch.setattr(chat, 'create_chat_completion', fake_create)
+    monkeypatch.setattr(suno_service, 'submit_song', fake_submit_song)
+    monkeypatch.setattr(suno_service, 'watch_task', fake_watch_task)
+    headers = {'Authorization': f'Bearer {api_key}'}
+    body = {'model': 'chirp-v3-5', 'temperature': None, 'top_p': None,
+            'messages': [{'role': 'user', 'content': 'a song about cats'}]}
+
+    assert task_quota.reserve('client-a', 1)
+    assert client.post('/v1/chat/completions', json=body, headers=headers).status_code == 429
+    task_quota.cancel('client-a')
+    assert client.post('/v1/chat/completions', json=body, headers=headers).status_code == 200
+    # The slot stays with the submitted song until it finishes
+    assert task_quota.count('client-a') == 1
+    task_quota.finish('chat-quota-task')
+    assert task_quota.count('client-a') == 0
+
+
+def test_failed_startup_load_fails_closed_and_retries(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, 'secret_token', '')
+    store = ApiKeyStore()
+    monkeypatch.setattr('app.utils.auth.api_key_store', store)
+
+    class BrokenSession:
+        def query(self, *args):
+            raise RuntimeError('database is locked')
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr('app.services.api_keys.SessionLocal', BrokenSession)
+    store.load()
+    # Unknown whether keys exist: neither open nor 401
+    assert fetch_none({}).status_code == 503
+    assert not store.is_stale()
+    store._failed_at -= 5
+    assert store.is_stale()
+
+    monkeypatch.setattr('app.services.api_keys.SessionLocal', memory_db)
+    token = create_api_key('client-c')
+    store._failed_at -= 5
+    assert fetch_none({}).status_code == 401
+    assert fetch_none({'Authorization': f'Bearer {token}'}).status_code == 200
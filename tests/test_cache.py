@@ -0,0 +1,49 @@
+import time
+
+from app.models.task import Task
+from app.services.cache import TTLCache, task_cache
+from app.services.suno_service import SunoService
+
+
+def test_ttl_cache_evicts_lru_and_expired():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+async def test_fetch_by_id_reads_through_cache(memory_db):
+    db = memory_db()
+    db.add(Task(task_id="t1", action="MUSIC", status="SUCCESS", submit_time=int(time.time()), data=[]))
+    db.commit()
+    db.close()
+
+    assert (await SunoService.fetch_by_id("t1"))["status"] == "SUCCESS"
+    # Second read is served from the cache, even if the row disappears
+    db = memory_db()
+    db.query(Task).delete()
+    db.commit()
+    db.close()
+    assert (await SunoService.fetch_by_id("t1"))["status"] == "SUCCESS"
+    assert task_cache.stats()["hits"] >= 1
+
+
+async def test_fetch_tasks_merges_cache_and_db(memory_db):
+    db = memory_db()
+    db.add_all([
+        Task(task_id="m1", action="MUSIC", status="SUCCESS", submit_time=1),
+        Task(task_id="l1", action="LYRICS", status="SUCCESS", submit_time=1),
+    ])
+    db.commit()
+    db.close()
+
+    await SunoService.fetch_by_id("m1")
+    result = await SunoService.fetch_tasks(["l1", "m1", "missing"], "")
+    assert [t["task_id"] for t in result] == ["l1", "m1"]
+    assert [t["task_id"] for t in await SunoService.fetch_tasks(["l1", "m1"], "MUSIC")] == ["m1"]
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from main import app
+from app.config import settings
+from app.routers import chat
+from app.services.suno_service import suno_service
+from app.services.tool_cache import tool_call_cache
+
+BODY = {
+    "model": "chirp-v3-5", "temperature": None, "top_p": None,
+    "messages": [{"role": "user", "content": "a song about cats"}],
+}
+
+
+def completion(arguments: str):
+    call = SimpleNamespace(arguments=arguments)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(function_call=call))])
+
+
+def stub_song(monkeypatch):
+    async def fake_submit_song(params):
+        return "chat-task"
+
+    async def fake_watch_task(task_id, timeout):
+        yield {"task_id": task_id, "status": "SUCCESS", "data": []}
+
+    monkeypatch.setattr(suno_service, "submit_song", fake_submit_song)
+    monkeypatch.setattr(suno_service, "watch_task", fake_watch_task)
+    monkeypatch.setattr(settings, "secret_token", "")
+
+
+async def test_tool_calls_do_not_block_the_event_loop(memory_db, monkeypatch):
+    stub_song(monkeypatch)
+    calls = []
+
+    async def fake_create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.2)
+        return completion(json.dumps({"prompt": "cats", "tags": "pop"}))
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.post("/v1/chat/completions", json=BODY) for _ in range(5)))
+        elapsed = time.perf_counter() - started
+    assert all(r.status_code == 200 and r.json()["object"] == "chat.completion" for r in responses)
+    assert len(calls) == 5 and calls[0]["functions"] == chat.FUNCTIONS
+    # Five 0.2s round trips overlapped instead of running back to back
+    assert elapsed < 0.6
+
+
+async def test_invalid_function_arguments_are_reported(memory_db, monkeypatch):
+    stub_song(monkeypatch)
+
+    async def fake_create(**kwargs):
+        return completion("not json")
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/v1/chat/completions", json=BODY)
+    assert "Invalid function arguments" in response.json()["choices"][0]["message"]["content"]
+
+
+async def test_disconnect_stops_waiting_but_keeps_the_task(memory_db, monkeypatch):
+    stub_song(monkeypatch)
+    monkeypatch.setattr(chat, "DISCONNECT_CHECK_INTERVAL", 0.01)
+    submitted, watching = [], asyncio.Event()
+    closed = asyncio.Event()
+
+    async def fake_create(**kwargs):
+        return completion(json.dumps({"prompt": "cats", "tags": "pop"}))
+
+    async def fake_submit_song(params):
+        submitted.append(params)
+        return "chat-task"
+
+    async def endless_watch(task_id, timeout):
+        watching.set()
+        try:
+            yield {"task_id": task_id, "status": "IN_PROGRESS"}
+            await asyncio.sleep(3600)
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create)
+    monkeypatch.setattr(suno_service, "submit_song", fake_submit_song)
+    monkeypatch.setattr(suno_service, "watch_task", endless_watch)
+
+    body = json.dumps(BODY).encode()
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await watching.wait()
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/v1/chat/completions", "raw_path": b"/v1/chat/completions",
+        "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1234), "server": ("test", 80),
+    }
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    assert closed.is_set() and len(submitted) == 1
+    assert sent[0]["status"] == 499
+
+
+async def test_until_disconnected_cancels_the_wait(monkeypatch):
+    monkeypatch.setattr(chat, "DISCONNECT_CHECK_INTERVAL", 0.01)
+    cancelled = asyncio.Event()
+
+    class GoneRequest:
+        async def is_disconnected(self):
+            return True
+
+    async def wait_forever():
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    assert await chat.until_disconnected(GoneRequest(), wait_forever()) == (False, None)
+    assert cancelled.is_set()
+
+
+async def test_repeated_conversations_reuse_tool_call(memory_db, monkeypatch):
+    stub_song(monkeypatch)
+    monkeypatch.setattr(settings, "tool_cache_db", True)
+    calls = []
+
+    async def fake_create(**kwargs):
+        calls.append(kwargs)
+        return completion(json.dumps({"prompt": "cats", "tags": "pop"}))
+
+    monkeypatch.setattr(chat, "create_chat_completion", fake_create)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for _ in range(3):
+            assert (await client.post("/v1/chat/completions", json=BODY)).status_code == 200
+        assert len(calls) == 1
+        # A different conversation is a miss
+        other = {**BODY, "messages": [{"role": "user", "content": "a song about dogs"}]}
+        await client.post("/v1/chat/completions", json=other)
+        assert len(calls) == 2
+
+        # Persisted entries survive a cleared memory cache
+        tool_call_cache.clear()
+        await client.post("/v1/chat/completions", json=BODY)
+        assert len(calls) == 2
+    assert tool_call_cache.stats()["hits"] == 3
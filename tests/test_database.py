@@ -0,0 +1,19 @@
+from sqlalchemy import create_engine, event, text
+
+from app.database import _set_sqlite_pragmas, async_database_url
+
+
+def test_async_database_url_picks_async_driver():
+    assert async_database_url("sqlite:///./api.db") == "sqlite+aiosqlite:///./api.db"
+    assert async_database_url("postgresql://u:p@db/suno") == "postgresql+asyncpg://u:p@db/suno"
+    assert async_database_url("postgresql+asyncpg://u:p@db/suno") == "postgresql+asyncpg://u:p@db/suno"
+
+
+def test_sqlite_pragmas_enable_wal(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+    engine.dispose()
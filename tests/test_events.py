@@ -0,0 +1,37 @@
+import asyncio
+import threading
+import time
+
+from app.models.task import Task
+from app.services.events import TaskEventBus, task_events
+from app.services.suno_service import SunoService
+
+
+async def test_publish_from_thread_reaches_subscriber():
+    bus = TaskEventBus()
+    seen = []
+    bus.add_listener(seen.append)
+    async with bus.subscribe("t1") as sub:
+        thread = threading.Thread(target=bus.publish, args=({"task_id": "t1", "status": "SUCCESS"},))
+        thread.start()
+        event = await sub.get(timeout=1)
+        thread.join()
+    assert event["status"] == "SUCCESS"
+    assert seen == [event]
+    assert bus.subscriber_count() == 0
+
+
+async def test_watch_task_stops_on_terminal_event(memory_db):
+    db = memory_db()
+    db.add(Task(task_id="w1", action="MUSIC", status="PROCESSING", submit_time=int(time.time()), data=[]))
+    db.commit()
+    db.close()
+
+    async def finish_later():
+        await asyncio.sleep(0.05)
+        task_events.publish({"task_id": "w1", "status": "SUCCESS", "data": []})
+
+    publisher = asyncio.create_task(finish_later())
+    states = [task["status"] async for task in SunoService.watch_task("w1", timeout=5)]
+    await publisher
+    assert states == ["PROCESSING", "SUCCESS"]
@@ -0,0 +1,31 @@
+import httpx
+import pytest
+
+from app.utils import http_client
+
+
+@pytest.fixture
+def mock_async_client(monkeypatch):
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen['headers'] = request.headers
+        if request.url.path == '/fail':
+            return httpx.Response(500)
+        return httpx.Response(200, json={'ok': True})
+
+    mock = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_client, 'async_client', mock)
+    yield seen
+
+
+async def test_do_request_async_merges_headers(mock_async_client):
+    resp = await http_client.do_request_async('GET', 'https://suno.test/ok', headers={'Authorization': 'Bearer x'})
+    assert resp.json() == {'ok': True}
+    assert mock_async_client['headers']['authorization'] == 'Bearer x'
+    assert mock_async_client['headers']['origin'] == 'https://suno.com'
+
+
+async def test_do_request_async_raises_on_error(mock_async_client):
+    with pytest.raises(httpx.HTTPStatusError):
+        await http_client.do_request_async('GET', 'https://suno.test/fail')
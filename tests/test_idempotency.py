@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from app.services.idempotency import IdempotencyConflict, IdempotencyStore, request_hash
+
+
+async def test_concurrent_duplicates_share_one_submit(memory_db):
+    store = IdempotencyStore()
+    calls = 0
+
+    async def submit():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "task-1"
+
+    results = await asyncio.gather(*(store.submit("k", "h", 60, submit) for _ in range(5)))
+    assert calls == 1
+    assert sorted(results) == [("task-1", False)] + [("task-1", True)] * 4
+    # Survives a restart through the database
+    assert await IdempotencyStore().submit("k", "h", 60, submit) == ("task-1", True)
+    with pytest.raises(IdempotencyConflict):
+        await IdempotencyStore().submit("k", "other", 60, submit)
+
+
+async def test_waiters_get_first_error_and_failures_are_not_stored(memory_db):
+    store = IdempotencyStore()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(store.submit("k", "h", 60, failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def working():
+        return "task-2"
+
+    assert await store.submit("k", "h", 60, working) == ("task-2", False)
+
+
+def test_request_hash_normalizes_body():
+    assert request_hash({"prompt": " hi ", "tags": None, "mv": ""}) == request_hash({"prompt": "hi"})
+    assert request_hash({"prompt": "hi"}) != request_hash({"prompt": "hi", "tags": "pop"})
+
+
+async def test_failed_key_save_still_returns_task(memory_db, monkeypatch):
+    store = IdempotencyStore()
+
+    async def broken_save(*args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(store, "_save", broken_save)
+
+    async def submit():
+        return "task-3"
+
+    assert await store.submit("k", "h", 60, submit) == ("task-3", False)
+    # Still replayed from memory
+    assert await store.submit("k", "h", 60, submit) == ("task-3", True)
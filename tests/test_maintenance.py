@@ -0,0 +1,118 @@
+import gzip
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from app.config import settings
+from app.models.task import Task
+from app.services import maintenance as module
+from app.services.maintenance import TaskMaintenance, compact_data
+
+
+def test_compact_data_keeps_served_fields():
+    clips = [{"id": "c1", "status": "complete", "audio_url": "a", "reaction": {"x": 1},
+              "metadata": {"tags": "pop", "duration": 120, "history": [1, 2, 3]}}]
+    assert compact_data("MUSIC", clips) == [
+        {"id": "c1", "status": "complete", "audio_url": "a", "metadata": {"tags": "pop", "duration": 120}}
+    ]
+    assert compact_data("LYRICS", {"id": "l1", "text": "la", "extra": 1}) == {"id": "l1", "text": "la"}
+
+
+def test_purge_archives_expired_tasks_in_batches(memory_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "task_retention_days", 1)
+    monkeypatch.setattr(settings, "task_archive_dir", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "maintenance_batch_size", 2)
+    old = int(time.time()) - 3 * 86400
+    db = memory_db()
+    db.add_all([Task(task_id=f"old{i}", action="MUSIC", status="SUCCESS", submit_time=old, data=[]) for i in range(3)])
+    db.add(Task(task_id="old-running", action="MUSIC", status="PROCESSING", submit_time=old, data=[]))
+    db.add(Task(task_id="new", action="MUSIC", status="SUCCESS", submit_time=int(time.time()), data=[]))
+    db.commit()
+    db.close()
+
+    report = TaskMaintenance().purge_expired()
+    assert report["rows_removed"] == 3 and report["rows_archived"] == 3
+    db = memory_db()
+    assert sorted(t.task_id for t in db.query(Task).all()) == ["new", "old-running"]
+    db.close()
+    archive = next((tmp_path / "archive").iterdir())
+    with gzip.open(archive, "rt") as f:
+        assert [json.loads(line)["task_id"] for line in f] == ["old0", "old1", "old2"]
+
+
+def test_compact_finished_reports_bytes(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, "task_compact_after", 60)
+    db = memory_db()
+    db.add(Task(task_id="done", action="MUSIC", status="SUCCESS", submit_time=1, finish_time=int(time.time()) - 120,
+                data=[{"id": "c1", "status": "complete", "big": "x" * 1000}]))
+    db.commit()
+    db.close()
+
+    maintenance = TaskMaintenance()
+    report = maintenance.compact_finished()
+    assert report["rows_compacted"] == 1 and report["bytes_reclaimed"] > 1000
+    assert maintenance.compact_finished()["rows_compacted"] == 0
+    db = memory_db()
+    assert db.query(Task).first().data == [{"id": "c1", "status": "complete"}]
+    db.close()
+
+
+def test_compact_finished_picks_up_tasks_finishing_out_of_order(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, "task_compact_after", 60)
+    now = int(time.time())
+    big = [{"id": "c1", "status": "complete", "big": "x" * 1000}]
+    db = memory_db()
+    db.add(Task(task_id="slow", action="MUSIC", status="PROCESSING", submit_time=1, data=big))
+    db.add(Task(task_id="fast", action="MUSIC", status="SUCCESS", submit_time=2, finish_time=now - 120, data=big))
+    db.commit()
+    db.close()
+
+    maintenance = TaskMaintenance()
+    assert maintenance.compact_finished()["rows_compacted"] == 1
+    # The older row finishes after a newer one was compacted
+    db = memory_db()
+    slow = db.query(Task).filter_by(task_id="slow").one()
+    slow.status, slow.finish_time = "SUCCESS", now - 90
+    db.commit()
+    db.close()
+    assert maintenance.compact_finished()["rows_compacted"] == 1
+
+
+def test_busy_vacuum_is_recorded_and_retried(monkeypatch, tmp_path):
+    monkeypatch.setattr(module, "engine", create_engine(f"sqlite:///{tmp_path / 'v.db'}"))
+    monkeypatch.setattr(module.clip_poller, "inflight_count", lambda: 1)
+    monkeypatch.setattr(module, "VACUUM_RETRY_INTERVAL", 0)
+    monkeypatch.setattr(settings, "maintenance_vacuum_hour", datetime.now().hour)
+    jobs = []
+
+    class FakeScheduler:
+        def add_job(self, func, trigger, **kwargs):
+            jobs.append((trigger, kwargs["id"]))
+
+    maintenance = TaskMaintenance()
+    maintenance._scheduler = FakeScheduler()
+    maintenance.run_vacuum()
+    report = maintenance.stats()["vacuum"]
+    assert report["skipped"] and not report["vacuumed"] and report["skipped_total"] == 1
+    assert jobs == [("date", "task-vacuum-retry")]
+
+
+def test_compacted_rows_are_not_rescanned_after_restart(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, "task_compact_after", 60)
+    db = memory_db()
+    db.add(Task(task_id="done", action="MUSIC", status="SUCCESS", submit_time=1, finish_time=int(time.time()) - 120,
+                data=[{"id": "c1", "status": "complete"}]))
+    db.commit()
+    db.close()
+
+    TaskMaintenance().compact_finished()
+    db = memory_db()
+    assert db.query(Task).one().compacted is True
+    db.close()
+    scanned = []
+    monkeypatch.setattr(module, "compact_data", lambda action, data: scanned.append(action) or data)
+    # A fresh instance (as after a restart) skips rows already compacted
+    TaskMaintenance().compact_finished()
+    assert scanned == []
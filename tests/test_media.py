@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.models.media import MediaAsset
+from app.routers import media as media_router
+from app.services.media import MediaStore
+
+FILES = {
+    "/c1.mp3": b"same-audio" * 1000,
+    "/c2.mp3": b"same-audio" * 1000,
+    "/c3.mp3": b"other-audio" * 1000,
+}
+
+
+def make_store(monkeypatch, tmp_path) -> MediaStore:
+    monkeypatch.setattr(settings, "media_dir", str(tmp_path / "media"))
+    monkeypatch.setattr(settings, "media_base_url", "")
+    os.makedirs(tmp_path / "media" / "tmp")
+    store = MediaStore()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = FILES.get(request.url.path)
+        if body is None:
+            return httpx.Response(404)
+        return httpx.Response(200, content=body, headers={"content-type": "audio/mpeg"})
+
+    store._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    store._semaphore = asyncio.Semaphore(2)
+    return store
+
+
+async def test_downloads_are_stored_once_per_content(memory_db, monkeypatch, tmp_path):
+    store = make_store(monkeypatch, tmp_path)
+    for clip in ("c1", "c2", "c3"):
+        await store._download(clip, "audio", f"https://cdn.example.com/{clip}.mp3")
+
+    files = [f for d in (tmp_path / "media").iterdir() if d.name != "tmp" for f in d.iterdir()]
+    assert len(files) == 2
+    assert not list((tmp_path / "media" / "tmp").iterdir())
+    assert store.stats()["assets"] == 3 and store.stats()["bytes"] == len(FILES["/c1.mp3"]) + len(FILES["/c3.mp3"])
+    db = memory_db()
+    assert db.query(MediaAsset).count() == 3
+    db.close()
+
+    task = {"task_id": "t", "action": "MUSIC", "data": [
+        {"id": "c1", "audio_url": "https://cdn.example.com/c1.mp3", "image_url": "https://cdn.example.com/c1.png"},
+    ]}
+    localized = store.localize(task)
+    assert localized["data"][0]["audio_url"] == "/suno/media/c1?kind=audio"
+    assert localized["data"][0]["image_url"] == "https://cdn.example.com/c1.png"
+    assert task["data"][0]["audio_url"] == "https://cdn.example.com/c1.mp3"
+
+    reloaded = MediaStore()
+    reloaded._load()
+    assert reloaded.stats()["assets"] == 3
+
+
+async def test_evicts_least_recently_served(memory_db, monkeypatch, tmp_path):
+    store = make_store(monkeypatch, tmp_path)
+    await store._download("c1", "audio", "https://cdn.example.com/c1.mp3")
+    await store._download("c3", "audio", "https://cdn.example.com/c3.mp3")
+    old_sha = store.lookup("c1", "audio")["sha256"]
+    store._last_access[old_sha] = 0
+    monkeypatch.setattr(settings, "media_max_bytes", len(FILES["/c3.mp3"]))
+
+    assert await store.evict() == [old_sha]
+    assert store.lookup("c1", "audio") is None and store.lookup("c3", "audio") is not None
+    assert not os.path.exists(store.path_for(old_sha))
+    db = memory_db()
+    assert [row.clip_id for row in db.query(MediaAsset).all()] == ["c3"]
+    db.close()
+
+
+def test_serves_ranges_and_etag(memory_db, monkeypatch, tmp_path):
+    store = make_store(monkeypatch, tmp_path)
+    asyncio.run(store._download("c1", "audio", "https://cdn.example.com/c1.mp3"))
+    monkeypatch.setattr(media_router, "media_store", store)
+    app = FastAPI()
+    app.include_router(media_router.router, prefix="/suno")
+    client = TestClient(app)
+
+    response = client.get("/suno/media/c1?kind=audio")
+    assert response.status_code == 200 and response.content == FILES["/c1.mp3"]
+    etag = response.headers["etag"]
+    assert etag == f'"{store.lookup("c1", "audio")["sha256"]}"'
+    partial = client.get("/suno/media/c1", headers={"Range": "bytes=0-9"})
+    assert partial.status_code == 206 and partial.content == b"same-audio"
+    assert client.get("/suno/media/c1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/suno/media/c1?kind=video").status_code == 404
@@ -0,0 +1,36 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.utils.metrics import Counter, Histogram
+
+
+def test_counter_sums_thread_shards():
+    counter = Counter("test_total", "Test counter.", ("kind",))
+    threads = [threading.Thread(target=lambda: [counter.inc("a") for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.samples() == [("test_total", '{kind="a"}', 4000)]
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test histogram.", ("op",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, "get")
+    text = "\n".join(histogram.render())
+    assert 'test_seconds_bucket{op="get",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{op="get",le="1"} 2' in text
+    assert 'test_seconds_bucket{op="get",le="+Inf"} 3' in text
+    assert 'test_seconds_count{op="get"} 3' in text
+
+
+def test_metrics_endpoint():
+    from main import app
+    settings.secret_token = ''
+    response = TestClient(app).get('/metrics')
+    assert response.status_code == 200
+    assert "# TYPE suno_task_queue_depth gauge" in response.text
+    assert "suno_task_queue_depth 0" in response.text
@@ -0,0 +1,60 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.models.task import Task
+from app.services.account import account_pool
+from app.services.poller import ClipPoller
+from app.services.suno_service import SunoService
+from app.services.tasks import task_queue
+from app.utils import http_client
+from bench.fake_suno import FakeSunoConfig, create_app
+
+
+async def test_submit_poll_persist_against_fake_upstream(memory_db, monkeypatch):
+    fake = create_app(FakeSunoConfig(stages="complete:0"))
+    monkeypatch.setattr(http_client, "client", TestClient(fake, base_url="http://fake"))
+    monkeypatch.setattr(http_client, "async_client",
+                        httpx.AsyncClient(transport=httpx.ASGITransport(app=fake), base_url="http://fake"))
+    monkeypatch.setattr(settings, "base_url", "http://fake")
+    monkeypatch.setattr(settings, "exchange_token_url", "http://fake/v1/client/sessions/{}/tokens")
+    account = account_pool.primary
+    monkeypatch.setattr(account, "session_id", "sess")
+    monkeypatch.setattr(account, "cookie", "__client=x")
+    monkeypatch.setattr(account, "jwt", "")
+
+    task_id = await SunoService.submit_song({"prompt": "hello", "tags": "pop"})
+    assert task_queue.get_nowait()[0] == task_id
+
+    poller = ClipPoller()
+    poller.track(task_id)
+    poller.tick()
+
+    db = memory_db()
+    task = db.query(Task).filter_by(task_id=task_id).first()
+    db.close()
+    assert task.status == "SUCCESS"
+    assert [clip["status"] for clip in task.data] == ["complete", "complete"]
+    assert account.jwt
+
+
+async def test_failed_insert_releases_account_slot(memory_db, monkeypatch):
+    class FakeResponse:
+        def json(self):
+            return {"id": "lyrics-x"}
+
+    account = account_pool.primary
+
+    async def fake_request(method, url, **kwargs):
+        return FakeResponse()
+
+    async def broken_insert(task):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(account, "request_async", fake_request)
+    monkeypatch.setattr(SunoService, "_insert_task", staticmethod(broken_insert))
+    before = account.inflight
+    with pytest.raises(RuntimeError):
+        await SunoService.submit_lyrics({"prompt": "rain"})
+    assert account.inflight == before
@@ -0,0 +1,97 @@
+import time
+
+from app.models.task import Task
+from app.services.account import account_pool
+from app.services.poller import ClipPoller
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def add_task(factory, task_id, clip_ids):
+    db = factory()
+    db.add(Task(task_id=task_id, action="MUSIC", status="NOT_START", submit_time=int(time.time()),
+                data=[{"id": cid, "status": "submitted"} for cid in clip_ids]))
+    db.commit()
+    db.close()
+
+
+def get_task(factory, task_id):
+    db = factory()
+    try:
+        return db.query(Task).filter_by(task_id=task_id).first().to_dict()
+    finally:
+        db.close()
+
+
+def test_tick_batches_all_clips_into_one_feed_call(memory_db, monkeypatch):
+    statuses = {"a1": "complete", "a2": "complete", "b1": "streaming", "b2": "queued"}
+    calls = []
+
+    def fake_request(method, url, **kwargs):
+        calls.append(url)
+        ids = url.split("ids=", 1)[1].split(",")
+        return FakeResponse([{"id": cid, "status": statuses[cid]} for cid in ids])
+
+    monkeypatch.setattr(account_pool.primary, "request", fake_request)
+    add_task(memory_db, "task-a", ["a1", "a2"])
+    add_task(memory_db, "task-b", ["b1", "b2"])
+
+    done = []
+    poller = ClipPoller()
+    poller.track("task-a", on_done=done.append)
+    poller.track("task-b", on_done=done.append)
+    poller.tick()
+
+    assert len(calls) == 1
+    assert get_task(memory_db, "task-a")["status"] == "SUCCESS"
+    assert get_task(memory_db, "task-b")["status"] == "PROCESSING"
+    assert done == ["task-a"]
+    assert poller.inflight_count() == 1
+
+
+def test_tick_marks_error_clips_as_failure(memory_db, monkeypatch):
+    monkeypatch.setattr(account_pool.primary, "request",
+                        lambda method, url, **kw: FakeResponse([{"id": "c1", "status": "error"}]))
+    add_task(memory_db, "task-c", ["c1"])
+
+    poller = ClipPoller()
+    poller.track("task-c")
+    poller.tick()
+
+    task = get_task(memory_db, "task-c")
+    assert task["status"] == "FAILURE"
+    assert poller.inflight_count() == 0
+
+
+def test_tick_skips_unchanged_and_buffers_progress(memory_db, monkeypatch):
+    from app.config import settings
+
+    clip = {"id": "d1", "status": "streaming", "title": "draft"}
+    monkeypatch.setattr(account_pool.primary, "request", lambda method, url, **kw: FakeResponse([dict(clip)]))
+    monkeypatch.setattr(settings, "poll_write_interval", 60)
+    add_task(memory_db, "task-d", ["d1"])
+
+    poller = ClipPoller()
+    poller.track("task-d")
+    poller.tick()
+    assert get_task(memory_db, "task-d")["status"] == "PROCESSING"
+
+    # Same upstream payload: nothing to write
+    poller._inflight["task-d"]["next_poll"] = 0
+    poller.tick()
+    assert poller._pending == {}
+
+    # A real change is buffered until the write interval or a forced flush
+    clip["title"] = "final"
+    poller._inflight["task-d"]["next_poll"] = 0
+    poller.tick()
+    assert "task-d" in poller._pending
+    assert get_task(memory_db, "task-d")["data"][0]["title"] == "draft"
+    poller.flush(force=True)
+    assert get_task(memory_db, "task-d")["data"][0]["title"] == "final"
@@ -0,0 +1,23 @@
+from app.config import settings
+from app.services.polling import PollingPolicy, aggregate_status
+
+
+def test_aggregate_status_prefers_most_advanced_pending():
+    assert aggregate_status(["complete", "streaming"]) == "streaming"
+    assert aggregate_status(["queued", "submitted"]) == "queued"
+    assert aggregate_status(["complete", "complete"]) == "complete"
+    assert aggregate_status([]) == "waiting"
+
+
+def test_next_interval_by_status_and_age(monkeypatch):
+    monkeypatch.setattr(settings, "poll_jitter", 0.0)
+    policy = PollingPolicy()
+    assert policy.next_interval("streaming", 300) == settings.poll_min_interval
+    # Every status starts at the minimum interval
+    assert policy.next_interval("queued", 0) == settings.poll_min_interval
+    assert policy.next_interval("waiting", 0) == settings.poll_min_interval
+    assert policy.next_interval("queued", settings.poll_backoff_age) == settings.poll_interval
+    assert policy.next_interval("waiting", settings.poll_backoff_age) == settings.poll_interval * 2
+    # Old tasks back off but never exceed the cap
+    assert policy.next_interval("queued", 10_000) == settings.poll_max_interval
+    assert policy.stats()["queued"]["count"] == 3
@@ -0,0 +1,43 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.routers.pprof import router
+from app.utils import profiler
+
+app = FastAPI()
+app.include_router(router, prefix="/debug/pprof")
+client = TestClient(app)
+
+
+def test_pprof_requires_secret_token(monkeypatch):
+    monkeypatch.setattr(settings, "secret_token", "")
+    assert client.get("/debug/pprof/threads").status_code == 403
+    monkeypatch.setattr(settings, "secret_token", "s3cret")
+    assert client.get("/debug/pprof/threads").status_code == 401
+    response = client.get("/debug/pprof/threads", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert 'Thread "MainThread"' in response.text
+
+
+def test_sample_stacks_sees_busy_thread():
+    stop = threading.Event()
+
+    def spin_here():
+        while not stop.is_set():
+            time.sleep(0.001)
+
+    worker = threading.Thread(target=spin_here, name="spinner")
+    worker.start()
+    try:
+        samples = profiler.sample_stacks(0.1, 0.005)
+    finally:
+        stop.set()
+        worker.join()
+    collapsed = profiler.to_collapsed(samples)
+    assert any(line.startswith("spinner;") and "spin_here" in line for line in collapsed.splitlines())
+    speedscope = profiler.to_speedscope(samples, 0.1, 0.005)
+    assert "spinner" in [p["name"] for p in speedscope["profiles"]]
@@ -7,14 +7,22 @@ from app.services.suno_service import suno_service
 from app.config import settings
 
 @pytest.fixture(autouse=True)
-def stub_suno_service(monkeypatch):
+def stub_suno_service(memory_db, monkeypatch):
     # Disable secret-token auth for tests
     settings.secret_token = ''
     # Stub SunoService methods for testing
-    monkeypatch.setattr(suno_service, 'submit_song', lambda params: 'test-music-id')
-    monkeypatch.setattr(suno_service, 'submit_lyrics', lambda params: 'test-lyrics-id')
-    monkeypatch.setattr(suno_service, 'fetch_by_id', lambda tid: {'task_id': tid, 'status': 'SUCCESS', 'data': {}})
-    monkeypatch.setattr(suno_service, 'fetch_tasks', lambda ids, action: [{'task_id': t, 'status': 'SUCCESS', 'data': {}} for t in ids])
+    async def fake_submit_song(params):
+        return 'test-music-id'
+    async def fake_submit_lyrics(params):
+        return 'test-lyrics-id'
+    monkeypatch.setattr(suno_service, 'submit_song', fake_submit_song)
+    monkeypatch.setattr(suno_service, 'submit_lyrics', fake_submit_lyrics)
+    async def fake_fetch_by_id(tid):
+        return {'task_id': tid, 'status': 'SUCCESS', 'data': {}}
+    async def fake_fetch_tasks(ids, action):
+        return [{'task_id': t, 'status': 'SUCCESS', 'data': {}} for t in ids]
+    monkeypatch.setattr(suno_service, 'fetch_by_id', fake_fetch_by_id)
+    monkeypatch.setattr(suno_service, 'fetch_tasks', fake_fetch_tasks)
     monkeypatch.setattr(suno_service, 'get_account_info', lambda: {
         'session_id': 'sid', 'cookie': 'ck', 'jwt': 'jwt',
         'last_update': 123, 'credits_left': 10, 'monthly_limit': 100,
@@ -38,6 +46,16 @@ def test_submit_lyrics():
     assert response.status_code == 200
     assert response.json()['data'] == 'test-lyrics-id'
 
+def test_submit_lyrics_wait(monkeypatch):
+    async def fake_wait_for_task(task_id, timeout):
+        return {'task_id': task_id, 'status': 'SUCCESS', 'data': {'text': 'la la'}}
+    monkeypatch.setattr(suno_service, 'wait_for_task', fake_wait_for_task)
+    response = client.post('/suno/submit/lyrics?wait=true', json={'prompt': 'lyrics'})
+    assert response.status_code == 200
+    data = response.json()['data']
+    assert data['task_id'] == 'test-lyrics-id'
+    assert data['status'] == 'SUCCESS'
+
 def test_fetch_by_id():
     tid = 'abc123'
     response = client.get(f'/suno/fetch/{tid}')
@@ -56,4 +74,71 @@ def test_get_account():
     response = client.get('/suno/account')
     assert response.status_code == 200
     info = response.json()['data']
-    assert info['session_id'] == 'sid'
\ No newline at end of file
+    assert info['session_id'] == 'sid'
+def test_submit_music_replays_idempotency_key(monkeypatch):
+    calls = []
+    async def counting_submit_song(params):
+        calls.append(params)
+        return f'music-{len(calls)}'
+    monkeypatch.setattr(suno_service, 'submit_song', counting_submit_song)
+    headers = {'Idempotency-Key': 'retry-1'}
+    first = client.post('/suno/submit/music', json={'prompt': 'hi'}, headers=headers)
+    second = client.post('/suno/submit/music', json={'prompt': ' hi '}, headers=headers)
+    assert first.json()['data'] == second.json()['data'] == 'music-1'
+    assert second.headers['idempotent-replayed'] == 'true' and len(calls) == 1
+    conflict = client.post('/suno/submit/music', json={'prompt': 'other'}, headers=headers)
+    assert conflict.status_code == 422
+    # Without a key, only identical bodies inside IDEMPOTENCY_HASH_TTL are merged
+    assert client.post('/suno/submit/music', json={'prompt': 'other'}).json()['data'] == 'music-2'
+    assert client.post('/suno/submit/music', json={'prompt': 'other'}).json()['data'] == 'music-2'
+    monkeypatch.setattr(settings, 'idempotency_hash_ttl', 0)
+    assert client.post('/suno/submit/music', json={'prompt': 'other'}).json()['data'] == 'music-3'
+
+def test_unkeyed_lyrics_submits_are_not_merged(monkeypatch):
+    calls = []
+    async def counting_submit_lyrics(params):
+        calls.append(params)
+        return f'lyrics-{len(calls)}'
+    monkeypatch.setattr(suno_service, 'submit_lyrics', counting_submit_lyrics)
+    assert client.post('/suno/submit/lyrics', json={'prompt': 'rain'}).json()['data'] == 'lyrics-1'
+    assert client.post('/suno/submit/lyrics', json={'prompt': 'rain'}).json()['data'] == 'lyrics-2'
+
+def test_submit_music_queue_full(monkeypatch):
+    from app.services.tasks import TaskQueueFull
+    async def full_submit_song(params):
+        raise TaskQueueFull(7)
+    monkeypatch.setattr(suno_service, 'submit_song', full_submit_song)
+    response = client.post('/suno/submit/music', json={'prompt': 'hello'})
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '7'
+
+def test_get_queue():
+    response = client.get('/suno/queue')
+    assert response.status_code == 200
+    stats = response.json()['data']
+    assert stats['depth'] == 0
+    assert set(stats['inflight']) == {'MUSIC', 'LYRICS'}
+
+def test_list_tasks_pages_with_cursor(memory_db):
+    from app.models.task import Task
+    db = memory_db()
+    db.add_all([
+        Task(task_id=f't{i}', action='MUSIC' if i % 2 else 'LYRICS', status='SUCCESS', submit_time=100 + i // 2, data=[])
+        for i in range(5)
+    ])
+    db.commit()
+    db.close()
+
+    response = client.get('/suno/tasks', params={'limit': 2})
+    page = response.json()['data']
+    assert [t['task_id'] for t in page['items']] == ['t4', 't3']
+    assert 'data' not in page['items'][0]
+    response = client.get('/suno/tasks', params={'limit': 2, 'cursor': page['next_cursor'], 'include_data': True})
+    page = response.json()['data']
+    assert [t['task_id'] for t in page['items']] == ['t2', 't1']
+    assert page['items'][0]['data'] == []
+
+    response = client.get('/suno/tasks', params={'action': 'MUSIC', 'since': 101})
+    page = response.json()['data']
+    assert [t['task_id'] for t in page['items']] == ['t3'] and page['next_cursor'] is None
+    assert client.get('/suno/tasks', params={'cursor': '!!'}).status_code == 400
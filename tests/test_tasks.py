@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models.task import Task
+from app.services import tasks
+
+
+def drain_queue():
+    items = []
+    while not tasks.task_queue.empty():
+        items.append(tasks.task_queue.get_nowait()[:2])
+        tasks.task_queue.task_done()
+    return items
+
+
+def test_recover_tasks_requeues_fresh_and_fails_stale(memory_db):
+    now = int(time.time())
+    db = memory_db()
+    db.add_all([
+        Task(task_id="fresh-music", action="MUSIC", status="PROCESSING", submit_time=now - 10),
+        Task(task_id="fresh-lyrics", action="LYRICS", status="NOT_START", submit_time=now - 5),
+        Task(task_id="stale", action="MUSIC", status="NOT_START", submit_time=now - 100000),
+        Task(task_id="done", action="MUSIC", status="SUCCESS", submit_time=now - 10),
+    ])
+    db.commit()
+    db.close()
+
+    drain_queue()
+    tasks.recover_tasks()
+
+    assert drain_queue() == [("fresh-music", "MUSIC"), ("fresh-lyrics", "LYRICS")]
+    db = memory_db()
+    stale = db.query(Task).filter_by(task_id="stale").one()
+    assert stale.status == "FAILURE"
+    assert stale.finish_time >= now
+    assert db.query(Task).filter_by(task_id="done").one().status == "SUCCESS"
+    db.close()
+
+
+def test_busy_lyrics_slots_do_not_block_music(monkeypatch):
+    release = threading.Event()
+    started, tracked = [], []
+
+    def slow_lyrics(task_id):
+        started.append(task_id)
+        release.wait(5)
+
+    monkeypatch.setattr(tasks.suno_service, "loop_fetch_lyrics", slow_lyrics)
+    monkeypatch.setattr(tasks.clip_poller, "track", lambda task_id, on_done=None: tracked.append(task_id))
+    monkeypatch.setitem(tasks.action_slots, "LYRICS", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(tasks, "_lyrics_pool", ThreadPoolExecutor(max_workers=1))
+
+    now = time.time()
+    tasks._park("lyrics-1", "LYRICS", now)
+    tasks._park("lyrics-2", "LYRICS", now)
+    tasks._park("music-1", "MUSIC", now)
+    # The second lyrics task waits for a slot without holding up the song
+    assert tracked == ["music-1"]
+    assert list(tasks._parked["LYRICS"]) == [("lyrics-2", now)]
+
+    release.set()
+    deadline = time.time() + 5
+    while len(started) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    tasks._lyrics_pool.shutdown(wait=True)
+    assert started == ["lyrics-1", "lyrics-2"] and not tasks._parked["LYRICS"]
+    tasks._release("MUSIC")
+
+
+def test_forced_add_task_bypasses_full_queue(monkeypatch):
+    tracked = []
+    monkeypatch.setattr(tasks.clip_poller, "track", lambda task_id, on_done=None: tracked.append(task_id))
+    monkeypatch.setattr(tasks, "task_queue", tasks.Queue(maxsize=1))
+    tasks.add_task("queued", "MUSIC")
+    with pytest.raises(tasks.TaskQueueFull):
+        tasks.add_task("rejected", "MUSIC")
+    # Already paid for upstream: polled even though the queue is full
+    tasks.add_task("paid", "MUSIC", force=True)
+    assert tracked == ["paid"]
+    tasks._release("MUSIC")
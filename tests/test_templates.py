@@ -0,0 +1,54 @@
+import os
+
+from app.config import settings
+from app.utils.templates import TemplateRegistry, render_chunks
+
+CLIP = {
+    "id": "c1", "title": "Song", "model_name": "chirp-v3-5", "audio_url": "a.mp3",
+    "video_url": "v.mp4", "image_url": "i.png", "metadata": {"prompt": "la la", "duration": 120, "tags": "pop"},
+}
+
+
+def test_bundled_chat_resp_renders_clips(monkeypatch):
+    monkeypatch.setattr(settings, "chat_template_dir", "./template")
+    registry = TemplateRegistry()
+    registry.reload(force=True)
+    text = registry.get("chat_resp").render(Data=[CLIP, {**CLIP, "id": "c2", "metadata": None}])
+    assert "Song" in text and "la la" in text and "c2" in text and "(a.mp3)" in text
+    assert registry.get("chat_stream_tick").render().strip() == "🎵"
+
+
+def test_render_chunks_matches_render(monkeypatch):
+    monkeypatch.setattr(settings, "chat_template_dir", "./template")
+    registry = TemplateRegistry()
+    registry.reload(force=True)
+    template = registry.get("chat_resp")
+    clips = [{**CLIP, "id": f"c{i}"} for i in range(50)]
+    chunks = list(render_chunks(template, min_size=256, Data=clips))
+    assert len(chunks) > 1 and "".join(chunks) == template.render(Data=clips)
+
+
+def test_reload_on_mtime_keeps_last_good_version(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "chat_template_dir", str(tmp_path / "tmpl"))
+    monkeypatch.setattr(settings, "chat_template_cache_dir", str(tmp_path / "cache"))
+    os.makedirs(tmp_path / "tmpl")
+    path = tmp_path / "tmpl" / "chat.yaml"
+    path.write_text("greet: 'Hello {{ name }}'\nbroken: '{% if %}'\n", encoding="utf-8")
+    registry = TemplateRegistry()
+    assert registry.reload(force=True)
+    assert registry.get("greet").render(name="Ann") == "Hello Ann"
+    # Compile errors are skipped, not fatal
+    assert registry.get("broken") is None
+    assert os.listdir(tmp_path / "cache")
+    assert not registry.reload()
+
+    path.write_text("greet: 'Hi {{ name }}'\n", encoding="utf-8")
+    os.utime(path, (1, 1))
+    assert registry.reload()
+    assert registry.get("greet").render(name="Ann") == "Hi Ann"
+
+    # An unparsable edit keeps serving the previous version
+    path.write_text("greet: [unclosed\n", encoding="utf-8")
+    os.utime(path, (2, 2))
+    assert registry.reload()
+    assert registry.get("greet").render(name="Ann") == "Hi Ann"
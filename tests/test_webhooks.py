@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import hmac
+import time
+
+import httpx
+from sqlalchemy.orm import Query
+
+from app.config import settings
+from app.models.task import Task
+from app.models.webhook import WebhookDelivery
+from app.services.account import account_pool
+from app.services.poller import ClipPoller
+from app.services.webhooks import WebhookDispatcher
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def test_finished_task_stages_delivery(memory_db, monkeypatch):
+    monkeypatch.setattr(account_pool.primary, "request",
+                        lambda method, url, **kw: FakeResponse([{"id": "c1", "status": "complete"}]))
+    db = memory_db()
+    db.add(Task(task_id="cb", action="MUSIC", status="NOT_START", submit_time=int(time.time()),
+                data=[{"id": "c1", "status": "queued"}], callback_url="https://hooks.test/done"))
+    db.commit()
+    db.close()
+
+    poller = ClipPoller()
+    poller.track("cb")
+    poller.tick()
+
+    db = memory_db()
+    delivery = db.query(WebhookDelivery).one()
+    assert delivery.url == "https://hooks.test/done"
+    assert delivery.payload["status"] == "SUCCESS"
+    db.close()
+
+
+async def test_dispatcher_signs_and_retries(memory_db, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_secret", "s3cret")
+    db = memory_db()
+    db.add(WebhookDelivery(task_id="t", url="https://hooks.test/ok", payload={"task_id": "t"},
+                           status="PENDING", attempts=0, next_attempt_at=0, created_at=0))
+    db.add(WebhookDelivery(task_id="t2", url="https://hooks.test/down", payload={"task_id": "t2"},
+                           status="PENDING", attempts=0, next_attempt_at=0, created_at=0))
+    db.commit()
+    db.close()
+
+    received = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/down":
+            return httpx.Response(502)
+        received["body"] = request.content
+        received["headers"] = request.headers
+        return httpx.Response(204)
+
+    dispatcher = WebhookDispatcher()
+    dispatcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    semaphore = asyncio.Semaphore(2)
+    for delivery in dispatcher._claim_due(10):
+        await dispatcher._deliver(delivery, semaphore)
+
+    timestamp = received["headers"]["x-webhook-timestamp"]
+    expected = hmac.new(b"s3cret", f"{timestamp}.".encode() + received["body"], hashlib.sha256).hexdigest()
+    assert received["headers"]["x-webhook-signature"] == f"sha256={expected}"
+
+    db = memory_db()
+    ok = db.query(WebhookDelivery).filter_by(task_id="t").one()
+    down = db.query(WebhookDelivery).filter_by(task_id="t2").one()
+    assert ok.status == "DELIVERED"
+    assert down.status == "PENDING" and down.attempts == 1 and down.next_attempt_at > time.time()
+    db.close()
+
+
+async def test_dispatcher_claims_only_free_senders(monkeypatch):
+    monkeypatch.setattr(settings, "webhook_concurrency", 1)
+    monkeypatch.setattr(settings, "webhook_poll_interval", 0.01)
+    limits = []
+    blocked = asyncio.Event()
+
+    def claim(limit):
+        limits.append(limit)
+        return [{"id": len(limits)}]
+
+    async def deliver(delivery, semaphore):
+        await blocked.wait()
+
+    dispatcher = WebhookDispatcher()
+    dispatcher._wakeup = asyncio.Event()
+    monkeypatch.setattr(dispatcher, "_claim_due", claim)
+    monkeypatch.setattr(dispatcher, "_deliver", deliver)
+    runner = asyncio.create_task(dispatcher.run())
+    await asyncio.sleep(0.1)
+    # The only sender is busy: nothing else is leased until it finishes
+    assert limits == [1]
+    blocked.set()
+    await asyncio.sleep(0.05)
+    runner.cancel()
+    assert limits[:2] == [1, 1]
+
+
+def test_claim_skips_rows_leased_by_another_dispatcher(memory_db, monkeypatch):
+    db = memory_db()
+    db.add_all([
+        WebhookDelivery(task_id=f"t{i}", url="https://hooks.test/ok", payload={}, status="PENDING",
+                        attempts=0, next_attempt_at=0, created_at=0)
+        for i in range(2)
+    ])
+    db.commit()
+    db.close()
+
+    original_all = Query.all
+
+    def racing_all(self):
+        rows = original_all(self)
+        # Another dispatcher leases the first row after our SELECT
+        other = memory_db()
+        other.query(WebhookDelivery).filter_by(task_id="t0").update({"next_attempt_at": int(time.time()) + 60})
+        other.commit()
+        other.close()
+        return rows
+
+    monkeypatch.setattr(Query, "all", racing_all)
+    claimed = WebhookDispatcher._claim_due(10)
+    assert [delivery["task_id"] for delivery in claimed] == ["t1"]